@@ -0,0 +1,103 @@
+import os
+import sys
+import json
+import bisect
+import time
+import threading
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from services.ohlcv import OHLCVFrame  # noqa: E402
+
+DEFAULT_FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "ohlcv_daily.json")
+
+# Approximate number of daily bars per Yahoo range
+RANGE_BARS = {"1d": 1, "5d": 5, "1mo": 21, "3mo": 63, "6mo": 126, "1y": 252, "2y": 504, "5y": 1260}
+
+
+def load_fixtures(path: str = DEFAULT_FIXTURES_PATH):
+    """Loads recorded OHLCV fixtures: symbol -> OHLCVFrame."""
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    return {
+        symbol: OHLCVFrame(symbol, series.get("interval", "1d"), series["timestamps"], series["open"], series["high"],
+                           series["low"], series["close"], series["volume"], adj_close=series.get("adj_close"))
+        for symbol, series in raw.items()
+    }
+
+
+def record_fixtures(symbols: list, path: str = DEFAULT_FIXTURES_PATH, range_: str = "6mo"):
+    """Records live daily OHLCV data from yfinance into a fixtures file (needs network access)."""
+    from services.data_api import ApiClient
+
+    client = ApiClient()
+    fixtures = {}
+    for symbol in symbols:
+        frame = client.get_chart(symbol, interval="1d", range_=range_)
+        if frame is None:
+            print(f"No data for {symbol}, skipping.")
+            continue
+        fixtures[symbol] = {
+            "interval": "1d", "timestamps": frame.timestamps.tolist(), "open": frame.open.tolist(), "high": frame.high.tolist(),
+            "low": frame.low.tolist(), "close": frame.close.tolist(), "volume": frame.volume.tolist(),
+        }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fixtures, f, separators=(",", ":"))
+
+
+class FakeApiClient:
+    def __init__(self, fixtures_path: str = DEFAULT_FIXTURES_PATH, latency: float = 0.15):
+        """
+        Drop-in ApiClient replacement that serves recorded OHLCV fixtures.
+        Args:
+            latency (float, optional): Simulated seconds per upstream call.
+        """
+        self.frames = load_fixtures(fixtures_path)
+        self.latency = latency
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def _upstream(self, kind: str):
+        with self._lock:
+            self.calls[kind] += 1
+        time.sleep(self.latency)
+
+    def get_chart(self, symbol: str, interval: str = "1d", range_: str = "1mo", start: str = None):
+        self._upstream("chart")
+        frame = self.frames.get(symbol.upper())
+        if frame is None:
+            return None
+        if start:
+            return frame[bisect.bisect_left(frame.dates(), start):]
+        return frame.tail(RANGE_BARS.get(range_, len(frame)))
+
+    def get_charts(self, symbols: list, interval: str = "1d", range_: str = "1mo", start: str = None):
+        self._upstream("charts")
+        frames = {}
+        for symbol in symbols:
+            frame = self.frames.get(symbol.upper())
+            if frame is not None:
+                frames[symbol] = frame[bisect.bisect_left(frame.dates(), start):] if start else frame.tail(RANGE_BARS.get(range_, len(frame)))
+        return frames
+
+    def get_quote(self, symbol: str):
+        self._upstream("quote")
+        frame = self.frames.get(symbol.upper())
+        if frame is None:
+            return None
+        return {"symbol": symbol, "price": frame.last_close(), "fetched_at": time.time()}
+
+    def get_quotes(self, symbols: list):
+        self._upstream("quotes")
+        now = time.time()
+        return {
+            symbol: {"symbol": symbol, "price": self.frames[symbol].last_close(), "fetched_at": now}
+            for symbol in symbols if symbol in self.frames
+        }
+
+    def call_api(self, endpoint: str, query: dict):
+        if endpoint == "YahooFinance/get_stock_chart":
+            frame = self.get_chart(query.get("symbol"), interval=query.get("interval", "1d"), range_=query.get("range", "1mo"))
+            return frame.to_chart_response() if frame is not None else None
+        raise ValueError(f"Unsupported endpoint: {endpoint}")
@@ -0,0 +1,170 @@
+import re
+import json
+import time
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SYMBOL_PATTERN = re.compile(r"\b[A-Z]{2,5}\b")
+KNOWN_NAMES = {"apple": "AAPL", "microsoft": "MSFT", "google": "GOOGL", "alphabet": "GOOGL", "meta": "META",
+               "tesla": "TSLA", "nvidia": "NVDA", "amazon": "AMZN"}
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class FakeOpenAIServer:
+    def __init__(self, latency: float = 0.3, tokens_per_second: float = 200.0, completion_tokens: int = 120, requests_per_minute: float = 0,
+                 host: str = "127.0.0.1", port: int = 0):
+        """
+        Local OpenAI-compatible HTTP server (POST /v1/chat/completions) for offline benchmarks.
+        Args:
+            latency (float, optional): Seconds before the first token (queueing + prefill).
+            tokens_per_second (float, optional): Generation rate after the first token.
+            completion_tokens (int, optional): Tokens generated for text (non-JSON) completions.
+            requests_per_minute (float, optional): Request quota, replenished continuously like the real API's;
+                requests above it get a 429 with Retry-After. 0 disables.
+        """
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.requests_per_minute = requests_per_minute
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._quota = float(requests_per_minute)
+        self._quota_at = time.monotonic()
+        self._server = _Server((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, kind: str):
+        with self._lock:
+            self.calls[kind] += 1
+
+    def over_quota(self):
+        """Returns the Retry-After seconds if this request exceeds the per-minute quota, else None."""
+        if not self.requests_per_minute:
+            return None
+        rate = self.requests_per_minute / 60.0
+        now = time.monotonic()
+        with self._lock:
+            self._quota = min(self.requests_per_minute, self._quota + (now - self._quota_at) * rate)
+            self._quota_at = now
+            if self._quota < 1:
+                self.calls["rate_limited"] += 1
+                return (1 - self._quota) / rate
+            self._quota -= 1
+        return None
+
+    @staticmethod
+    def parse_response(user_prompt: str):
+        """Deterministic stand-in for the parse_query completion."""
+        lowered = user_prompt.lower()
+        symbol = next(iter(SYMBOL_PATTERN.findall(user_prompt)), None)
+        for name, known_symbol in KNOWN_NAMES.items():
+            if name in lowered:
+                symbol = known_symbol
+                break
+        if any(word in lowered for word in ("news", "announce", "filing")):
+            intent = "get_latest_announcements"
+        elif "price" in lowered and not any(word in lowered for word in ("why", "move", "reason")):
+            intent = "get_stock_price"
+        else:
+            intent = "get_stock_movement_reasons"
+        return {"company_name": symbol, "symbol": symbol, "intent": intent}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, payload, headers=None):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                # models.list, used by warm-up calls
+                if not self.path.endswith("/models"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+                server.count("models")
+                self._send_json(200, {"object": "list", "data": [{"id": "gpt-4.1-nano", "object": "model", "created": 0, "owned_by": "system"}]})
+
+            def do_POST(self):
+                if not self.path.endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                retry_after = server.over_quota()
+                if retry_after is not None:
+                    self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                                    headers={"Retry-After-Ms": str(int(retry_after * 1000))})
+                    return
+                messages = request.get("messages", [])
+                user_prompt = messages[-1]["content"] if messages else ""
+                prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+                is_json = (request.get("response_format") or {}).get("type") == "json_object"
+                stream = bool(request.get("stream"))
+
+                time.sleep(server.latency)
+                if is_json:
+                    server.count("json")
+                    content = json.dumps(server.parse_response(user_prompt))
+                    tokens = [content]
+                else:
+                    server.count("stream" if stream else "text")
+                    tokens = [f"token{i} " for i in range(server.completion_tokens)]
+
+                created = int(time.time())
+                usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)}
+                if not stream:
+                    time.sleep(len(tokens) / server.tokens_per_second)
+                    self._send_json(200, {
+                        "id": "chatcmpl-fake", "object": "chat.completion", "created": created, "model": request.get("model"),
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+                        "usage": usage,
+                    })
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for token in tokens:
+                    chunk = {
+                        "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": request.get("model"),
+                        "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    time.sleep(1.0 / server.tokens_per_second)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+        return Handler
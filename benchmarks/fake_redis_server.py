@@ -0,0 +1,155 @@
+import time
+import fnmatch
+import threading
+import socketserver
+from collections import Counter
+
+# The one script the shared cache client runs (compare-and-delete of a lock), see services/shared_cache.py
+UNLOCK_SCRIPT_PREFIX = "if redis.call('get', KEYS[1]) == ARGV[1]"
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 1024
+
+
+class FakeRedisServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        """
+        Local Redis-protocol (RESP2) server for offline tests of the shared cache's Redis backend. Implements the
+        commands the client uses: PING, AUTH, SELECT, GET, SET (EX/PX/NX/XX), DEL, SCAN (MATCH), FLUSHDB, DBSIZE and
+        EVAL of the lock release script. Keys expire like in Redis; all databases share one keyspace.
+        """
+        self.calls = Counter()
+        self._data = {}  # key -> (value, expires_at or None)
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-redis", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _live(self, key, now):
+        item = self._data.get(key)
+        if item is not None and item[1] is not None and item[1] <= now:
+            del self._data[key]
+            return None
+        return item
+
+    def execute(self, args):
+        """Runs one command (a list of bytes arguments). Returns the reply value; exceptions become error replies."""
+        command = args[0].decode().upper()
+        self.calls[command] += 1
+        now = time.time()
+        with self._lock:
+            if command == "PING":
+                return "PONG"
+            if command in ("AUTH", "SELECT"):
+                return "OK"
+            if command == "GET":
+                item = self._live(args[1], now)
+                return item[0] if item else None
+            if command == "SET":
+                key, value, options = args[1], args[2], [arg.decode().upper() for arg in args[3:]]
+                expires_at = None
+                if "PX" in options:
+                    expires_at = now + int(options[options.index("PX") + 1]) / 1000
+                elif "EX" in options:
+                    expires_at = now + int(options[options.index("EX") + 1])
+                exists = self._live(key, now) is not None
+                if ("NX" in options and exists) or ("XX" in options and not exists):
+                    return None
+                self._data[key] = (value, expires_at)
+                return "OK"
+            if command == "DEL":
+                return sum(1 for key in args[1:] if self._live(key, now) is not None and self._data.pop(key))
+            if command == "SCAN":
+                options = [arg.decode() for arg in args[2:]]
+                pattern = options[options.index("MATCH") + 1] if "MATCH" in options else "*"
+                keys = [key for key in list(self._data) if self._live(key, now) and fnmatch.fnmatchcase(key.decode(), pattern)]
+                return [b"0", keys]
+            if command == "EVAL":
+                if not args[1].decode().startswith(UNLOCK_SCRIPT_PREFIX):
+                    raise ValueError("ERR only the lock release script is supported")
+                key, token = args[3], args[4]
+                item = self._live(key, now)
+                if item and item[0] == token:
+                    del self._data[key]
+                    return 1
+                return 0
+            if command == "FLUSHDB":
+                self._data.clear()
+                return "OK"
+            if command == "DBSIZE":
+                return sum(1 for key in list(self._data) if self._live(key, now))
+        raise ValueError(f"ERR unknown command '{command}'")
+
+    @staticmethod
+    def encode(reply):
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, str):
+            return f"+{reply}\r\n".encode()
+        if isinstance(reply, int):
+            return f":{reply}\r\n".encode()
+        if isinstance(reply, bytes):
+            return b"$%d\r\n%s\r\n" % (len(reply), reply)
+        return b"*%d\r\n" % len(reply) + b"".join(FakeRedisServer.encode(item) for item in reply)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def read_command(self):
+                line = self.rfile.readline()
+                if not line:
+                    return None
+                if not line.startswith(b"*"):
+                    return line.split()  # Inline command (e.g. "PING" from a terminal)
+                args = []
+                for _ in range(int(line[1:])):
+                    length = int(self.rfile.readline()[1:])
+                    args.append(self.rfile.read(length + 2)[:-2])
+                return args
+
+            def handle(self):
+                while True:
+                    args = self.read_command()
+                    if args is None:
+                        return
+                    if not args:
+                        continue
+                    try:
+                        reply = server.encode(server.execute(args))
+                    except Exception as e:
+                        message = str(e) if str(e).startswith("ERR") else f"ERR {e}"
+                        reply = f"-{message}\r\n".encode()
+                    self.wfile.write(reply)
+                    self.wfile.flush()
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Local Redis-protocol stand-in for the shared cache.")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+    fake = FakeRedisServer(port=args.port).start()
+    print(f"Serving on {fake.url} (Ctrl+C to stop)")
+    try:
+        fake._thread.join()
+    except KeyboardInterrupt:
+        fake.stop()
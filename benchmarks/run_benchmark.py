@@ -0,0 +1,232 @@
+"""
+Offline end-to-end benchmark for /ask.
+
+Runs the Flask app against a fake OpenAI-compatible server and a fake market-data client serving
+recorded OHLCV fixtures, drives a mixed workload at a given concurrency and reports latency
+percentiles, throughput and upstream call counts.
+
+    python benchmarks/run_benchmark.py --requests 200 --concurrency 16
+    python benchmarks/run_benchmark.py --asgi --requests 1000 --concurrency 300   # async serving mode (src/asgi.py)
+    python benchmarks/run_benchmark.py --redis   # shared cache on the local Redis stand-in (fake_redis_server.py)
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARKS_DIR), "src"))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+BENCH_DIR = tempfile.mkdtemp(prefix="bench-")
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline-benchmark")
+os.environ.setdefault("PRICE_STORE_PATH", os.path.join(BENCH_DIR, "prices.sqlite3"))
+# A fresh shared cache per run, so results are not served from an earlier run's entries
+os.environ.setdefault("SHARED_CACHE_URL", "sqlite://" + os.path.join(BENCH_DIR, "shared_cache.sqlite3"))
+os.environ.setdefault("WARM_UP_ON_START", "off")
+
+from werkzeug.serving import make_server  # noqa: E402
+
+import main  # noqa: E402
+from services.openai_service import OpenAIService  # noqa: E402
+from services.yahoo_finance_service import YahooFinanceService  # noqa: E402
+from services.response_cache import ResponseCache  # noqa: E402
+from services.shared_cache import RedisSharedCache, default_shared_cache  # noqa: E402
+from services.price_store import PriceStore  # noqa: E402
+from fake_openai_server import FakeOpenAIServer  # noqa: E402
+from fake_api_client import FakeApiClient  # noqa: E402
+from fake_redis_server import FakeRedisServer  # noqa: E402
+
+QUERY_TEMPLATES = {
+    "get_stock_price": [
+        "What is the latest stock price for {name}?",
+        "price of {symbol}",
+    ],
+    "get_latest_announcements": [
+        "What are the latest related announcements for {name}?",
+        "Any recent news about {symbol}?",
+    ],
+    "get_stock_movement_reasons": [
+        "What are the reasons for {name}'s stock price movements in the last 2 weeks?",
+        "Why did {symbol} move this month?",
+    ],
+    # Phrasings the local parser leaves to the LLM
+    "llm_parse": [
+        "How has {name} been doing lately?",
+        "Give me the story on {symbol} shares",
+    ],
+}
+NAMES = {"AAPL": "Apple", "MSFT": "Microsoft", "GOOGL": "Google", "META": "Meta", "TSLA": "Tesla", "NVDA": "Nvidia", "AMZN": "Amazon"}
+
+
+def percentile(sorted_values: list, pct: float):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def build_workload(count: int, mix: dict, symbols: list, seed: int):
+    rng = random.Random(seed)
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    workload = []
+    for _ in range(count):
+        kind = rng.choices(kinds, weights)[0]
+        symbol = rng.choice(symbols)
+        template = rng.choice(QUERY_TEMPLATES[kind])
+        workload.append((kind, template.format(symbol=symbol, name=NAMES.get(symbol, symbol))))
+    return workload
+
+
+def serve_wsgi():
+    """Serves the Flask app on a threaded dev server. Returns (port, shutdown)."""
+    server = make_server("127.0.0.1", 0, main.create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_port, server.shutdown
+
+
+def serve_asgi():
+    """Serves the async app (src/asgi.py) with hypercorn on its own event loop. Returns (port, shutdown)."""
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+    import asgi
+
+    # hypercorn only reports an ephemeral port in its log, so pick a free one up front
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.backlog = 1024
+
+    loop = asyncio.new_event_loop()
+    stop = asyncio.Event()
+
+    threading.Thread(target=loop.run_until_complete, args=(serve(asgi.app, config, shutdown_trigger=stop.wait),), daemon=True).start()
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return port, lambda: loop.call_soon_threadsafe(stop.set)
+
+
+def run(args):
+    fake_openai = FakeOpenAIServer(latency=args.openai_latency, tokens_per_second=args.tokens_per_second,
+                                   completion_tokens=args.completion_tokens, requests_per_minute=args.openai_rpm).start()
+    fake_yahoo = FakeApiClient(latency=args.yahoo_latency)
+    fake_redis = FakeRedisServer().start() if args.redis else None
+    shared = RedisSharedCache(fake_redis.url) if fake_redis else default_shared_cache()
+
+    if args.no_cache:
+        cache = ResponseCache(ttls={"default": 0, "parse": 0, "announcement_summary": 0, "movement_analysis": 0})
+    else:
+        cache = ResponseCache(shared=shared)
+    main.init_services(
+        yahoo_service=YahooFinanceService(client=fake_yahoo, price_store=PriceStore(os.environ["PRICE_STORE_PATH"]), shared_cache=shared),
+        openai_service_instance=OpenAIService(api_key="sk-offline-benchmark", base_url=fake_openai.base_url, cache=cache),
+    )
+
+    port, shutdown = serve_asgi() if args.asgi else serve_wsgi()
+    url = f"http://127.0.0.1:{port}{'/ask/stream' if args.stream else '/ask'}"
+
+    mix = dict(zip(QUERY_TEMPLATES, args.mix))
+    workload = build_workload(args.requests, mix, sorted(fake_yahoo.frames), args.seed)
+
+    def send(item):
+        kind, query = item
+        body = urllib.parse.urlencode({"query": query}).encode("utf-8")
+        started = time.perf_counter()
+        first_byte = None
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, data=body), timeout=120) as response:
+                response.read(1)
+                first_byte = time.perf_counter() - started
+                response.read()
+                ok = response.status == 200
+        except Exception:
+            ok = False
+        return kind, ok, time.perf_counter() - started, first_byte
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(send, workload))
+    elapsed = time.perf_counter() - started
+
+    shutdown()
+    fake_openai.stop()
+    if fake_redis:
+        fake_redis.stop()
+
+    by_kind = defaultdict(list)
+    for kind, ok, latency, _ in results:
+        if ok:
+            by_kind[kind].append(latency)
+            by_kind["all"].append(latency)
+
+    report = {
+        "requests": len(results),
+        "errors": sum(1 for _, ok, _, _ in results if not ok),
+        "concurrency": args.concurrency,
+        "server": "asgi" if args.asgi else "wsgi",
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {},
+        "upstream_calls": {"openai": dict(fake_openai.calls), "yahoo": dict(fake_yahoo.calls)},
+        "parse": main.local_parser.stats(),
+        "openai_cache": main.openai_service.cache.stats(),
+        "shared_cache": dict(shared.stats(), redis_commands=dict(fake_redis.calls)) if fake_redis else shared.stats(),
+        "rate_limiter": main.openai_service.rate_limiter.stats() if main.openai_service.rate_limiter else None,
+    }
+    if args.stream:
+        first_bytes = sorted(fb for _, ok, _, fb in results if ok and fb is not None)
+        report["time_to_first_byte_ms"] = {f"p{p}": round(percentile(first_bytes, p) * 1000, 1) for p in (50, 95, 99)}
+    for kind, latencies in sorted(by_kind.items()):
+        latencies.sort()
+        report["latency_ms"][kind] = {f"p{p}": round(percentile(latencies, p) * 1000, 1) for p in (50, 95, 99)}
+        report["latency_ms"][kind]["count"] = len(latencies)
+    return report
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Offline /ask benchmark against fake OpenAI and Yahoo backends.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", type=float, nargs=4, default=[0.3, 0.3, 0.3, 0.1],
+                        metavar=("PRICE", "ANNOUNCEMENTS", "MOVEMENT", "LLM_PARSE"), help="Relative workload weights.")
+    parser.add_argument("--openai-latency", type=float, default=0.3, help="Fake OpenAI seconds to first token.")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Fake OpenAI generation rate.")
+    parser.add_argument("--completion-tokens", type=int, default=120, help="Fake OpenAI tokens per text completion.")
+    parser.add_argument("--openai-rpm", type=float, default=0, help="Fake OpenAI requests-per-minute quota (429 above it); 0 disables.")
+    parser.add_argument("--yahoo-latency", type=float, default=0.15, help="Fake market-data seconds per call.")
+    parser.add_argument("--stream", action="store_true", help="Benchmark /ask/stream instead of /ask.")
+    parser.add_argument("--asgi", action="store_true", help="Serve the async app (src/asgi.py) with hypercorn.")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the OpenAI response cache.")
+    parser.add_argument("--redis", action="store_true", help="Use the Redis shared cache backend, on a local Redis stand-in.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Also write the report to this file.")
+    args = parser.parse_args()
+
+    report = run(args)
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
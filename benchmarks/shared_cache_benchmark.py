@@ -0,0 +1,128 @@
+"""
+Multi-worker benchmark for the shared cache: upstream calls and latency when several worker processes answer
+the same questions.
+
+Starts --workers processes (like gunicorn workers), each with its own copy of the app, the fake market-data
+client and the services, and sends every worker the same set of questions in a different order, against one
+local fake OpenAI server. It runs once per shared cache backend:
+
+    memory  process-local only (each worker fetches and asks the model for itself)
+    sqlite  one SQLite file for all workers (the default, SHARED_CACHE_URL="sqlite:")
+    redis   the Redis backend, on a local Redis stand-in (fake_redis_server.py)
+
+    python benchmarks/shared_cache_benchmark.py --workers 4
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+import multiprocessing
+from collections import Counter
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), "src")
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from fake_openai_server import FakeOpenAIServer  # noqa: E402
+from fake_redis_server import FakeRedisServer  # noqa: E402
+
+QUESTIONS = [
+    "What is the latest stock price for {symbol}?",
+    "What are the latest related announcements for {symbol}?",
+    "What are the reasons for {symbol}'s stock price movements in the last 2 weeks?",
+]
+SYMBOLS = ["AAPL", "MSFT", "GOOGL", "META", "TSLA", "NVDA", "AMZN"]
+
+
+def worker(env, queries, yahoo_latency, seed, results):
+    """Runs in a fresh worker process: builds the app and answers the queries one after another."""
+    os.environ.update(env)
+    sys.path.insert(0, SRC_DIR)
+    import main
+    from fake_api_client import FakeApiClient
+    from services.price_store import PriceStore
+    from services.openai_service import OpenAIService
+    from services.yahoo_finance_service import YahooFinanceService
+
+    fake_yahoo = FakeApiClient(latency=yahoo_latency)
+    main.init_services(
+        yahoo_service=YahooFinanceService(client=fake_yahoo, price_store=PriceStore(env["PRICE_STORE_PATH"])),
+        openai_service_instance=OpenAIService(api_key="sk-offline-benchmark", base_url=env["OPENAI_BASE_URL"]),
+    )
+    client = main.create_app(warm="off").test_client()
+    queries = list(queries)
+    random.Random(seed).shuffle(queries)
+
+    latencies, errors = [], 0
+    for query in queries:
+        started = time.perf_counter()
+        response = client.post("/ask", data={"query": query})
+        latencies.append(time.perf_counter() - started)
+        errors += response.status_code != 200
+    results.put({"latencies": latencies, "errors": errors, "yahoo": dict(fake_yahoo.calls)})
+
+
+def run_scenario(backend, args, fake_openai):
+    workdir = tempfile.mkdtemp(prefix=f"shared-{backend}-")
+    fake_redis = FakeRedisServer().start() if backend == "redis" else None
+    urls = {"memory": "memory", "sqlite": "sqlite://" + os.path.join(workdir, "shared_cache.sqlite3")}
+    env = {"OPENAI_API_KEY": "sk-offline-benchmark", "OPENAI_BASE_URL": fake_openai.base_url,
+           "PRICE_STORE_PATH": os.path.join(workdir, "prices.sqlite3"), "SHARED_CACHE_URL": fake_redis.url if fake_redis else urls[backend],
+           "WARM_UP_ON_START": "off", "WATCHLIST": ""}
+    queries = [question.format(symbol=symbol) for symbol in SYMBOLS[:args.symbols] for question in QUESTIONS]
+
+    openai_before = sum(fake_openai.calls.values())
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(env, queries, args.yahoo_latency, seed, results)) for seed in range(args.workers)]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    outcomes = [results.get(timeout=600) for _ in processes]
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.join()
+    if fake_redis:
+        fake_redis.stop()
+
+    latencies = sorted(latency for outcome in outcomes for latency in outcome["latencies"])
+    yahoo = Counter()
+    for outcome in outcomes:
+        yahoo.update(outcome["yahoo"])
+    return {
+        "requests": len(latencies),
+        "errors": sum(outcome["errors"] for outcome in outcomes),
+        "elapsed_s": round(elapsed, 3),
+        "latency_ms": {"p50": round(statistics.median(latencies) * 1000, 1), "mean": round(statistics.mean(latencies) * 1000, 1)},
+        "upstream_calls": {"openai": sum(fake_openai.calls.values()) - openai_before, "yahoo": dict(yahoo)},
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Shared cache benchmark: several workers answering the same questions.")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes per scenario.")
+    parser.add_argument("--symbols", type=int, default=4, help="Companies asked about (3 questions each).")
+    parser.add_argument("--backends", nargs="+", default=["memory", "sqlite", "redis"], choices=["memory", "sqlite", "redis"])
+    parser.add_argument("--openai-latency", type=float, default=0.3, help="Fake OpenAI seconds to first token.")
+    parser.add_argument("--yahoo-latency", type=float, default=0.15, help="Fake market-data seconds per call.")
+    parser.add_argument("--json", help="Also write the report to this file.")
+    args = parser.parse_args()
+
+    fake_openai = FakeOpenAIServer(latency=args.openai_latency, tokens_per_second=2000.0, completion_tokens=40).start()
+    report = {"workers": args.workers, "symbols": args.symbols}
+    for backend in args.backends:
+        report[backend] = run_scenario(backend, args, fake_openai)
+    fake_openai.stop()
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
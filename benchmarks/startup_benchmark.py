@@ -0,0 +1,100 @@
+"""
+Cold start benchmark: import time, app creation and first-request latency of a fresh worker process.
+
+Each run starts a new Python process that imports src/main.py, creates the app and sends two /ask requests
+through the Flask test client, against a local fake OpenAI server. It runs once with warm-up off (services are
+built by the first request) and once with WARM_UP_ON_START=startup (built before the app is returned).
+
+    python benchmarks/startup_benchmark.py --runs 5
+
+--src points the benchmark at another checkout, e.g. to compare with an earlier commit:
+
+    git worktree add /tmp/before <commit> && python benchmarks/startup_benchmark.py --src /tmp/before/src
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from fake_openai_server import FakeOpenAIServer  # noqa: E402
+
+# Runs in the worker process; trees without create_app (module-level app) are measured the same way
+CHILD = r"""
+import json, os, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+app = main.create_app() if hasattr(main, "create_app") else main.app
+created = time.perf_counter()
+result = {"import_s": imported - started, "create_app_s": created - imported, "statuses": []}
+client = app.test_client()
+for label in ("first_request_s", "second_request_s"):
+    request_started = time.perf_counter()
+    response = client.post("/ask", data={"query": sys.argv[1]})
+    result[label] = time.perf_counter() - request_started
+    result["statuses"].append(response.status_code)
+result["modules"] = sorted(name for name in ("yfinance", "pandas", "openai", "sqlalchemy") if name in sys.modules)
+print("STARTUP_RESULT " + json.dumps(result))
+"""
+
+
+def run_once(src, query, env):
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", CHILD, query], cwd=src, env=env, capture_output=True, text=True, timeout=300)
+    process_s = time.perf_counter() - started
+    for line in completed.stdout.splitlines():
+        if line.startswith("STARTUP_RESULT "):
+            result = json.loads(line[len("STARTUP_RESULT "):])
+            result["process_s"] = process_s
+            return result
+    raise RuntimeError(f"Worker process failed:\n{completed.stderr[-2000:]}")
+
+
+def summarize(results):
+    summary = {key: round(statistics.median(result[key] for result in results) * 1000, 1)
+               for key in ("process_s", "import_s", "create_app_s", "first_request_s", "second_request_s")}
+    summary = {key.replace("_s", "_ms"): value for key, value in summary.items()}
+    summary["statuses"] = results[-1]["statuses"]
+    summary["heavy_modules_loaded"] = results[-1]["modules"]
+    return summary
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Worker cold start benchmark (import, app creation, first request).")
+    parser.add_argument("--src", default=os.path.join(os.path.dirname(BENCHMARKS_DIR), "src"), help="The src directory to measure.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per scenario (medians are reported).")
+    parser.add_argument("--query", default="What are the latest announcements for Apple?")
+    parser.add_argument("--openai-latency", type=float, default=0.05, help="Fake OpenAI seconds to first token.")
+    parser.add_argument("--json", help="Also write the report to this file.")
+    args = parser.parse_args()
+
+    fake_openai = FakeOpenAIServer(latency=args.openai_latency, tokens_per_second=2000.0, completion_tokens=40).start()
+    env = dict(os.environ, OPENAI_API_KEY="sk-offline-benchmark", OPENAI_BASE_URL=fake_openai.base_url,
+               PRICE_STORE_PATH=os.path.join(tempfile.mkdtemp(prefix="startup-"), "prices.sqlite3"),
+               # Offline: no market data warm-up fetch, and no background jobs; no responses cached by earlier runs
+               WARM_UP_SYMBOL="", WATCHLIST="", SHARED_CACHE_URL="memory")
+    env.pop("OPENAI_CACHE_PATH", None)
+
+    report = {"src": os.path.abspath(args.src), "runs": args.runs, "query": args.query}
+    # Discarded run: fills the OS file cache, so every scenario starts equally warm on disk
+    run_once(args.src, args.query, dict(env, WARM_UP_ON_START="off"))
+    for scenario, warm in (("cold", "off"), ("warm_up_on_start", "startup")):
+        results = [run_once(args.src, args.query, dict(env, WARM_UP_ON_START=warm)) for _ in range(args.runs)]
+        report[scenario] = summarize(results)
+    fake_openai.stop()
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,192 @@
+import sys
+import os
+import time
+import asyncio
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from quart import Quart, Response, g, request, jsonify, render_template, make_response
+
+# The Flask app module owns the service instances and the request validation; this module only serves them asynchronously
+import main
+from services.metrics import REGISTRY, timed, start_request_timings, current_request_timings, server_timing_header
+
+# Async serving mode: OpenAI calls run on the pooled AsyncOpenAI client, so an in-flight LLM request does not tie
+# up a worker thread. Blocking yfinance/store reads run on the bounded DataFanout pool (DATA_FETCH_WORKERS).
+#   cd src && hypercorn asgi:app --bind 0.0.0.0:5001
+app = Quart(__name__, static_folder='static', template_folder='static')
+
+async def warm_up():
+    """main.warm_up, plus the async OpenAI client's pool (which belongs to the serving event loop)."""
+    await asyncio.get_running_loop().run_in_executor(None, main.warm_up)
+    if main.openai_service:
+        await main.openai_service.awarm_up(main.WARM_UP_CONNECTIONS)
+
+@app.before_serving
+async def start_services():
+    """Starts the background jobs and warms up the services as set by WARM_UP_ON_START (see main.create_app)."""
+    main.start_background_jobs()
+    warm = os.getenv("WARM_UP_ON_START", "background")
+    if warm == "startup":
+        await warm_up()
+    elif warm == "background":
+        app.add_background_task(warm_up)
+
+@app.before_request
+async def start_timing():
+    g.request_started = time.perf_counter()
+    start_request_timings()
+
+@app.after_request
+async def add_server_timing(response):
+    """Reports per-stage timings in the Server-Timing header and records the request duration."""
+    total = time.perf_counter() - g.get("request_started", time.perf_counter())
+    response.headers["Server-Timing"] = server_timing_header(current_request_timings() + [("total", total)])
+    REGISTRY.observe("http_request_duration_seconds", total,
+                     {"endpoint": request.endpoint or "unknown", "status": response.status_code},
+                     help="HTTP request duration (for streamed responses, until the headers are sent).")
+    return response
+
+@app.route('/metrics')
+async def metrics():
+    """Prometheus text-format metrics."""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/')
+async def index():
+    response = await make_response(await render_template('index.html', api_key_error=main.OPENAI_API_KEY_ERROR))
+    if not main.session_store.valid_id(request.cookies.get(main.SESSION_COOKIE)):
+        response.set_cookie(main.SESSION_COOKIE, main.session_store.new_id(), httponly=True, samesite='Lax')
+    return response
+
+@app.route('/session', methods=['POST'])
+async def new_session():
+    """Async variant of main.new_session."""
+    session_id = main.session_store.new_id()
+    response = jsonify({"session_id": session_id})
+    response.set_cookie(main.SESSION_COOKIE, session_id, httponly=True, samesite='Lax')
+    return response
+
+async def resolve_query(user_query, session=None):
+    """Async variant of main.resolve_query. Returns (query_info, error) where error is (payload, status)."""
+    error = main.check_query(user_query)
+    if error:
+        return None, error
+
+    parsed_info, parsed_by = main.parse_locally(user_query, session)
+    speculation = None
+    if parsed_info is None:
+        subject = session.subject if session is not None else None
+        speculation = main.start_speculation(user_query, subject)
+        with timed("parse.llm"):
+            parsed_info = await main.openai_service.aparse_query(user_query, context=subject)
+        parsed_by = "openai"
+    query_info, error = main.validate_parsed_query(user_query, parsed_info, parsed_by)
+    main.settle_speculation(speculation, query_info)
+    main.remember_query(session, query_info)
+    return query_info, error
+
+async def _aiter_once(text):
+    yield text
+
+async def _recorded_stream(query_info, chunks):
+    """Async variant of main.recorded_stream."""
+    parts = []
+    async for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    main.record_turn(query_info, "".join(parts))
+
+async def answer_query(query_info, stream=False):
+    """
+    Async variant of main.answer_query.
+    Returns (response_data, degraded_sources). With stream=True, response_data is an async iterator of text chunks.
+    """
+    company_symbol = query_info["symbol"]
+    intent = query_info["intent"]
+    openai_service = main.openai_service
+    history = main.session_history(query_info)
+
+    response_data = ""
+    degraded_sources = []
+
+    precomputed = main.precomputed_answer(query_info)
+    if precomputed is not None:
+        response_data = precomputed
+
+    elif intent == 'get_stock_price':
+        quote = await main.data_fanout.run(main.prefetched(query_info, "quote", lambda: main.yf_service.get_latest_quote(company_symbol)))
+        response_data = main.format_quote_answer(company_symbol, quote)
+
+    elif intent == 'get_latest_announcements':
+        with timed("fetch"):
+            data, degraded_sources = await main.data_fanout.agather(main.data_sources_for(query_info))
+            # BM25 search (and a symbol's first index build) is CPU work: keep it off the event loop
+            await main.data_fanout.run(main.add_news, query_info, data, degraded_sources)
+        with timed("analysis"):
+            response_data = await openai_service.agenerate_announcement_summary(company_symbol, data["announcements"], data["news"], stream=stream, history=history)
+
+    elif intent == 'get_stock_movement_reasons':
+        with timed("fetch"):
+            data, degraded_sources = await main.data_fanout.agather(main.data_sources_for(query_info))
+            await main.data_fanout.run(main.add_news, query_info, data, degraded_sources)
+        with timed("analysis"):
+            response_data = await openai_service.aanalyze_stock_movement_reasons(company_symbol, data["price_history"], data["announcements"], data["news"], stream=stream, history=history)
+
+    elif intent == 'compare_stocks':
+        with timed("fetch"):
+            data, degraded_sources = await main.data_fanout.agather(main.data_sources_for(query_info))
+        with timed("analysis"):
+            response_data = await openai_service.acompare_stocks(data["price_histories"], data["announcements"], stream=stream, history=history)
+
+    else:
+        response_data = main.UNSUPPORTED_INTENT_ANSWER
+
+    main.finish_speculation(query_info)
+    if not stream:
+        main.record_turn(query_info, response_data)
+        return response_data, degraded_sources
+    if isinstance(response_data, str):
+        response_data = _aiter_once(response_data)
+    if query_info.get("session") is not None:
+        response_data = _recorded_stream(query_info, response_data)
+    return response_data, degraded_sources
+
+@app.route('/ask', methods=['POST'])
+async def ask_assistant():
+    form = await request.form
+    query_info, error = await resolve_query(form.get('query'), main.session_for(form, request.headers, request.cookies))
+    if error:
+        return jsonify(error[0]), error[1]
+
+    response_data, degraded_sources = await answer_query(query_info)
+
+    result = {'response': response_data, 'parsed_by': query_info["parsed_by"]}
+    if degraded_sources:
+        result['degraded_sources'] = degraded_sources
+    return jsonify(result)
+
+@app.route('/ask/stream', methods=['POST'])
+async def ask_assistant_stream():
+    """Streaming variant of /ask: answer text is sent as Server-Sent Events while it is generated."""
+    form = await request.form
+    query_info, error = await resolve_query(form.get('query'), main.session_for(form, request.headers, request.cookies))
+    if error:
+        return jsonify(error[0]), error[1]
+
+    async def generate():
+        yield main.sse_event({'parsed_by': query_info["parsed_by"]}, event='meta')
+        try:
+            response_data, degraded_sources = await answer_query(query_info, stream=True)
+            if degraded_sources:
+                yield main.sse_event({'degraded_sources': degraded_sources}, event='meta')
+            async for chunk in response_data:
+                yield main.sse_event({'token': chunk})
+        except Exception as e:
+            print(f"Error while streaming response: {e}")
+            yield main.sse_event({'error': f"Error while generating the response: {e}"}, event='error')
+        yield main.sse_event({}, event='done')
+
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5001)
@@ -0,0 +1,157 @@
+"""
+Bulk query runner: answers every query in a JSONL file through the same parse -> fetch -> analyze pipeline as /ask.
+
+    python bulk.py queries.jsonl --output results.jsonl --workers 8
+
+Each input line is a JSON object with a "query" (or "body") field and an optional "id" (or "request_id").
+Results are appended to the output JSONL as they complete; the output doubles as the checkpoint, so re-running
+the same command after an interruption skips the queries already answered. Queries that failed (errors, or an
+OpenAI error instead of an answer) go to <output>.errors.jsonl instead and are retried by the next run.
+"""
+import sys
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import main
+from services.openai_service import OpenAIService
+
+def read_queries(path):
+    """Yields (query_id, query) for each JSONL line with a query; ids default to the line number."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            query = record.get("query") or record.get("body")
+            if not query:
+                print(f"Line {line_number}: no query, skipping.")
+                continue
+            yield str(record.get("id") or record.get("request_id") or f"line-{line_number}"), query
+
+def errors_path_for(output):
+    return f"{os.path.splitext(output)[0]}.errors.jsonl"
+
+def load_checkpoint(path):
+    """
+    Returns the ids already answered in the output file (records with an error, written by earlier versions, are
+    retried). A partially written last line (from an interruption) is cut off so that appending continues on a clean line.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    valid_bytes = 0
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                if "error" not in record:
+                    done.add(record["id"])
+            except (ValueError, KeyError):
+                break
+            valid_bytes += len(line)
+    if valid_bytes < os.path.getsize(path):
+        with open(path, "r+b") as f:
+            f.truncate(valid_bytes)
+    return done
+
+def parse_one(query_id, query):
+    started = time.perf_counter()
+    query_info, error = main.resolve_query(query)
+    return query_id, query, query_info, error, time.perf_counter() - started
+
+def answer_one(query_id, query, query_info, parse_seconds, quotes):
+    """Answers a parsed query; price queries use the batch-fetched quotes."""
+    started = time.perf_counter()
+    result = {"id": query_id, "query": query, "symbol": query_info["symbol"], "symbols": query_info["symbols"], "intent": query_info["intent"],
+              "parsed_by": query_info["parsed_by"]}
+    try:
+        if query_info["intent"] == 'get_stock_price':
+            result["response"] = main.format_quote_answer(query_info["symbol"], quotes.get(query_info["symbol"].upper()))
+        else:
+            response_data, degraded_sources = main.answer_query(query_info)
+            result["response"] = response_data
+            if isinstance(response_data, str) and OpenAIService.is_error_response(response_data):
+                result["error"] = response_data
+            if degraded_sources:
+                result["degraded_sources"] = degraded_sources
+    except Exception as e:
+        print(f"Error answering {query_id}: {e}")
+        result["error"] = str(e)
+    finally:
+        main.finish_speculation(query_info)
+    result["elapsed_ms"] = round((parse_seconds + time.perf_counter() - started) * 1000, 1)
+    return result
+
+def run_batch(batch, pool, out, errors):
+    """
+    Parses a batch, prefetches its market data in bulk, then answers and writes each query as it completes:
+    answers to out (the checkpoint), failures to errors.
+    """
+    parsed = list(pool.map(lambda item: parse_one(*item), batch))
+
+    answerable = []
+    for query_id, query, query_info, error, parse_seconds in parsed:
+        if error:
+            write_result(errors, {"id": query_id, "query": query, "error": error[0].get("error"), "status": error[1]})
+        else:
+            answerable.append((query_id, query, query_info, parse_seconds))
+
+    # One multi-symbol download for every price history / quote this batch needs
+    by_intent = {}
+    for _, _, query_info, _ in answerable:
+        by_intent.setdefault(query_info["intent"], set()).update(query_info["symbols"])
+    history_symbols = by_intent.get('get_stock_movement_reasons', set()) | by_intent.get('compare_stocks', set())
+    if history_symbols:
+        main.yf_service.sync_price_histories(sorted(history_symbols), days=main.MOVEMENT_LOOKBACK_DAYS)
+    quotes = main.yf_service.get_latest_quotes(sorted(by_intent['get_stock_price'])) if by_intent.get('get_stock_price') else {}
+
+    futures = [pool.submit(answer_one, query_id, query, query_info, parse_seconds, quotes)
+               for query_id, query, query_info, parse_seconds in answerable]
+    for future in as_completed(futures):
+        result = future.result()
+        write_result(errors if "error" in result else out, result)
+
+def write_result(out, result):
+    out.write(json.dumps(result) + "\n")
+    out.flush()
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Answer every query in a JSONL file (resumable).")
+    parser.add_argument("input", help="JSONL file with one {\"id\", \"query\"} object per line.")
+    parser.add_argument("--output", "-o", help="Results JSONL, also the checkpoint (default: <input>.results.jsonl).")
+    parser.add_argument("--workers", type=int, default=8, help="Queries processed concurrently.")
+    parser.add_argument("--batch-size", type=int, default=100, help="Queries whose market data is fetched together.")
+    args = parser.parse_args()
+
+    output = args.output or f"{os.path.splitext(args.input)[0]}.results.jsonl"
+    done = load_checkpoint(output)
+    pending = [(query_id, query) for query_id, query in read_queries(args.input) if query_id not in done]
+    print(f"{len(done)} queries already answered, {len(pending)} to go -> {output}")
+
+    started = time.perf_counter()
+    completed = 0
+    # The errors file lists the failures of the latest run only: they are all retried
+    errors_path = errors_path_for(output)
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="bulk") as pool, \
+            open(output, "a", encoding="utf-8") as out, open(errors_path, "w", encoding="utf-8") as errors:
+        try:
+            for i in range(0, len(pending), args.batch_size):
+                batch = pending[i:i + args.batch_size]
+                run_batch(batch, pool, out, errors)
+                completed += len(batch)
+                print(f"{completed}/{len(pending)} done ({time.perf_counter() - started:.1f}s)")
+        except KeyboardInterrupt:
+            pool.shutdown(wait=False, cancel_futures=True)
+            print(f"Interrupted; re-run the same command to resume from {output}.")
+            return 130
+        failed = errors.tell() > 0
+    if failed:
+        print(f"Some queries failed (see {errors_path}); re-run the same command to retry them.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
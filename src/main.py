@@ -1,110 +1,691 @@
 import sys
 import os
+import json
+import time
+import threading
+from datetime import datetime
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))  # DON'T CHANGE THIS !!!
 
-from flask import Flask, request, jsonify, render_template
+from dotenv import load_dotenv
+from flask import Flask, Response, g, request, jsonify, render_template, make_response
+from werkzeug.local import LocalProxy
 
-# Services are in a 'services' subdirectory within 'src'
-from services.yahoo_finance_service import YahooFinanceService
-from services.openai_service import OpenAIService
+# Services are in a 'services' subdirectory within 'src'. The Yahoo Finance and OpenAI services (and the yfinance,
+# pandas and openai packages behind them) are only imported when first used: see the lazy services below.
+from services.lazy import LazyService
+from services.query_parser import LocalQueryParser, MAX_COMPARE_SYMBOLS
+from services.fanout import DataFanout
+from services.speculation import SpeculativePrefetch
+from services.session_store import SessionStore
+from services.insight_cache import InsightCache, InsightWarmer
+from services.news_store import NewsStore, move_window
+from services.price_analytics import analyze_price_moves
+from services.market_calendar import MARKET_TIMEZONE, completed_daily_bars_cutoff
+from services.rate_limiter import PRIORITIES
+from services.prompt_builder import count_tokens
+from services.metrics import REGISTRY, timed, record_error, start_request_timings, current_request_timings, server_timing_header
 
-# Initialize Flask App
-app = Flask(__name__, static_folder='static', template_folder='static')
+load_dotenv()
 
-# Initialize YAHOO API Services
-yf_service = YahooFinanceService()
+def _build_yf_service():
+    from services.yahoo_finance_service import YahooFinanceService
+    return YahooFinanceService()
 
-# Initialize OPENAI API Service
-openai_service = None
+def _build_openai_service():
+    global OPENAI_API_KEY_ERROR
+    from services.openai_service import OpenAIService
+    try:
+        return OpenAIService()
+    except Exception as e:
+        OPENAI_API_KEY_ERROR = f"Error initializing OpenAI API: {e}. Please check your API key."
+        print(OPENAI_API_KEY_ERROR)
+        return None
+
+# Shared services, built on first use (or by warm_up). The proxies forward to the instances, so they are used like
+# the services themselves; init_services replaces them.
+lazy_yf_service = LazyService(_build_yf_service)
+lazy_openai_service = LazyService(_build_openai_service)
+# Local news corpus (BM25 retrieval of the few articles most relevant to a question)
+lazy_news_store = LazyService(NewsStore)
+yf_service = LocalProxy(lazy_yf_service.get)
+openai_service = LocalProxy(lazy_openai_service.get)
+news_store = LocalProxy(lazy_news_store.get)
+
+# Keep quotes for hot symbols in memory (comma-separated WATCHLIST, refreshed every QUOTE_REFRESH_SECONDS)
+WATCHLIST = [symbol.strip().upper() for symbol in os.getenv("WATCHLIST", "").split(",") if symbol.strip()]
+
+# Articles passed to the model per question, and how far back (days before the newest article) "latest news" looks
+NEWS_TOP_K = int(os.getenv("NEWS_TOP_K", "5"))
+NEWS_LOOKBACK_DAYS = int(os.getenv("NEWS_LOOKBACK_DAYS", "14"))
+
+# Initialize concurrent data fan-out (price history and announcements are fetched in parallel)
+data_fanout = DataFanout(
+    max_workers=int(os.getenv("DATA_FETCH_WORKERS", "8")),
+    default_timeout=float(os.getenv("DATA_FETCH_TIMEOUT", "10")),
+)
+
+# Trading days of price history analysed for movement questions (analytics keep the prompt small for long windows)
+MOVEMENT_LOOKBACK_DAYS = int(os.getenv("MOVEMENT_LOOKBACK_DAYS", "14"))
+
+# Fetches started for the symbols a query seems to mention while OpenAI parses it (SPECULATION_MAX_SYMBOLS=0 disables)
+SPECULATIVE_SOURCES = {
+    'get_stock_price': ['quote'],
+    'get_latest_announcements': ['announcements'],
+    'get_stock_movement_reasons': ['price_history', 'announcements'],
+}
+speculative_prefetch = SpeculativePrefetch(data_fanout.submit, {
+    "quote": lambda symbol: yf_service.get_latest_quote(symbol),
+    "price_history": lambda symbol: yf_service.get_price_frame(symbol, days=MOVEMENT_LOOKBACK_DAYS),
+    "announcements": lambda symbol: yf_service.get_latest_announcements(symbol),
+}, max_symbols=int(os.getenv("SPECULATION_MAX_SYMBOLS", "2")))
+
+# Latest significant developments per symbol included in comparison prompts
+COMPARE_ANNOUNCEMENTS_PER_SYMBOL = int(os.getenv("COMPARE_ANNOUNCEMENTS_PER_SYMBOL", "3"))
+
+# Initialize local query parser (fast path in front of OpenAI parse_query)
+local_parser = LocalQueryParser()
+
+# Per-session conversation context: follow-ups ("why did it move?") are resolved against the session's last company
+# without OpenAI, reuse the data fetched for it (SESSION_DATA_TTL_SECONDS), and are answered with the last
+# SESSION_HISTORY_TURNS turns as history. Session ids are issued by the server (the UI's cookie, or POST /session for
+# API clients, which send it back as a session_id field / X-Session-ID header) and signed with SESSION_SECRET.
+SESSION_COOKIE = "analyst_session"
+session_store = SessionStore(
+    secret=os.getenv("SESSION_SECRET"),
+    max_sessions=int(os.getenv("SESSION_MAX", "1000")),
+    idle_seconds=float(os.getenv("SESSION_IDLE_SECONDS", "1800")),
+    max_turns=int(os.getenv("SESSION_HISTORY_TURNS", "3")),
+    data_ttl_seconds=float(os.getenv("SESSION_DATA_TTL_SECONDS", "300")),
+)
+
+def configured_workers(argv=None):
+    """Worker processes the server was started with: gunicorn/hypercorn -w/--workers, else WEB_CONCURRENCY, else 1."""
+    args = list(sys.argv[1:] if argv is None else argv)
+    for i, arg in enumerate(args):
+        if arg in ("-w", "--workers"):
+            value = args[i + 1] if i + 1 < len(args) else ""
+        elif arg.startswith("--workers="):
+            value = arg.split("=", 1)[1]
+        elif arg.startswith("-w") and arg[2:].isdigit():
+            value = arg[2:]
+        else:
+            continue
+        return int(value) if value.isdigit() else 1
+    value = os.getenv("WEB_CONCURRENCY", "")
+    return int(value) if value.isdigit() else 1
+
+def session_secret_warning(argv=None):
+    """A warning if session ids are signed with a per-process key while several worker processes serve requests."""
+    workers = configured_workers(argv)
+    if os.getenv("SESSION_SECRET") or workers <= 1:
+        return None
+    return (f"SESSION_SECRET is not set and {workers} workers are configured: each worker signs session ids with its own "
+            "key and rejects the ids issued by the others. Set the same SESSION_SECRET for all workers.")
+
+SESSION_SECRET_WARNING = session_secret_warning()
+if SESSION_SECRET_WARNING:
+    print(f"Warning: {SESSION_SECRET_WARNING}")
+
+# OpenAI API Service availability (the service itself is built on first use)
 OPENAI_API_KEY_ERROR = None
+if not os.getenv("OPENAI_API_KEY"):
+    OPENAI_API_KEY_ERROR = "OPENAI_API_KEY environment variable not set. Please set the key in .ENV"
+    print(f"Warning: {OPENAI_API_KEY_ERROR}")
 
-try:
-    if not os.getenv("OPENAI_API_KEY"):
-        OPENAI_API_KEY_ERROR = "OPENAI_API_KEY environment variable not set. Please set the key in .ENV"
-        print(f"Warning: {OPENAI_API_KEY_ERROR}")
-    openai_service = OpenAIService() 
+def init_services(yahoo_service=None, openai_service_instance=None, news_store_instance=None):
+    """Replaces the shared services, e.g. to run the app against local fake backends (see benchmarks/)."""
+    global OPENAI_API_KEY_ERROR
+    if yahoo_service is not None:
+        lazy_yf_service.set(yahoo_service)
+        if insight_warmer is not None:
+            yahoo_service.announcement_store.add_listener(insight_warmer.notify_changed)
+    if openai_service_instance is not None:
+        lazy_openai_service.set(openai_service_instance)
+        OPENAI_API_KEY_ERROR = None
+    if news_store_instance is not None:
+        lazy_news_store.set(news_store_instance)
+        if insight_warmer is not None:
+            news_store_instance.add_listener(insight_warmer.notify_changed)
 
-except Exception as e:
-    OPENAI_API_KEY_ERROR = f"Error initializing OpenAI API: {e}. Please check your API key."
-    print(OPENAI_API_KEY_ERROR)
+def search_company_news(company_symbol, query="", price_history=None):
+    """
+    The NEWS_TOP_K local news articles most relevant to a question. For movement questions (price_history given),
+    only articles from the analysed period are considered, and those around the days with significant moves rank higher.
+    """
+    if price_history is None:
+        return news_store.search(company_symbol, query, lookback_days=NEWS_LOOKBACK_DAYS, k=NEWS_TOP_K)
+    since, until, move_dates = move_window(analyze_price_moves(price_history))
+    if until is None:
+        return []
+    return news_store.search(company_symbol, query, since=since, until=until, move_dates=move_dates, k=NEWS_TOP_K, movement=True)
 
-# Helper to get web search results (simulated here, will use actual tool in post MVP development)
-def search_web_for_company_news(company_name_or_symbol, time_period_prompt="last 2 weeks"):
-    """Use Search API to get company latest news."""
-    
-    print(f"[Placeholder] Searching web for: {company_name_or_symbol} news {time_period_prompt}")
-    # Simulate some news findings for now for MVP
-    return [
-        {"title": f"News about {company_name_or_symbol} 1", "snippet": f"Details about {company_name_or_symbol} event A..."},
-        {"title": f"Market reacts to {company_name_or_symbol} update", "snippet": f"Analysts discuss {company_name_or_symbol}"}
+# Answers precomputed in the background for WATCHLIST symbols, served without fetching or calling OpenAI to generic
+# questions outside a conversation. Checked every INSIGHT_WARM_SECONDS (0 disables) and recomputed when the content
+# hash of their inputs changes; movement analyses use completed daily bars only, so the forming bar does not count.
+INSIGHT_KINDS = {'get_latest_announcements': 'announcement_summary', 'get_stock_movement_reasons': 'movement_analysis'}
+INSIGHT_WARM_SECONDS = float(os.getenv("INSIGHT_WARM_SECONDS", "300"))
+insight_cache = InsightCache(max_age_seconds=2 * INSIGHT_WARM_SECONDS)
+insight_warmer = None
+
+def load_insight_inputs(kind, symbol):
+    """
+    Fetches the same data as a live query, up to the last market close; None if any source is degraded (nothing is
+    precomputed from partial data).
+    """
+    intent = next(intent for intent, intent_kind in INSIGHT_KINDS.items() if intent_kind == kind)
+    query_info = {"intent": intent, "symbol": symbol, "symbols": [symbol], "query": ""}
+    data, degraded_sources = data_fanout.gather(data_sources_for(query_info))
+    if data.get("price_history") is not None:
+        data["price_history"] = data["price_history"].before(completed_daily_bars_cutoff())
+    add_news(query_info, data, degraded_sources)
+    return None if degraded_sources else data
+
+def compute_insight(kind, symbol, data):
+    if not openai_service or not openai_service.client:
+        return None
+    if kind == 'announcement_summary':
+        response = openai_service.generate_announcement_summary(symbol, data["announcements"], data["news"])
+    else:
+        response = openai_service.analyze_stock_movement_reasons(symbol, data["price_history"], data["announcements"], data["news"])
+    return None if openai_service.is_error_response(response) else response
+
+def start_insight_warmer(watchlist, interval_seconds):
+    """Starts precomputing answers for the watchlist; new announcements for a watched symbol trigger a recompute."""
+    global insight_warmer
+    if insight_warmer is not None:
+        insight_warmer.stop()
+    insight_warmer = InsightWarmer(insight_cache, watchlist, list(INSIGHT_KINDS.values()), load_insight_inputs, compute_insight,
+                                   interval_seconds=interval_seconds)
+    yf_service.announcement_store.add_listener(insight_warmer.notify_changed)
+    news_store.add_listener(insight_warmer.notify_changed)
+    insight_warmer.start()
+
+def precomputed_answer(query_info):
+    """
+    Returns the precomputed answer for a watchlist query, or None. Only generic questions (see
+    LocalQueryParser.is_generic) without conversation history get it; the rest are answered live.
+    """
+    kind = INSIGHT_KINDS.get(query_info["intent"])
+    if kind is None or not query_info["symbol"] or session_history(query_info):
+        return None
+    if not local_parser.is_generic(query_info.get("query")):
+        return None
+    return insight_cache.get(kind, query_info["symbol"])
+
+def collect_service_metrics():
+    """Scrape-time metrics from counters the services keep themselves (caches, parser, coalescing)."""
+    parse_stats = local_parser.stats()
+    session_stats = session_store.stats()
+    families = [
+        ("query_parse_total", "counter", "Parsed queries by path (local fast path, session follow-up or OpenAI).",
+         [({"path": "local"}, parse_stats["hits"]), ({"path": "session"}, session_stats["follow_ups"]),
+          ({"path": "openai"}, parse_stats["misses"] - session_stats["follow_ups"])]),
+        ("sessions_active", "gauge", "Conversation sessions held in memory.", [({}, session_stats["sessions"])]),
+        ("session_events_total", "counter", "Sessions created/evicted, and follow-up data reused from the session or fetched.",
+         [({"event": event}, session_stats[event]) for event in ("created", "evicted", "data_hits", "data_misses")]),
     ]
+    # Services nobody has used yet are not built just to report on them
+    flights = [("yahoo", yf_service.flight.stats())] if lazy_yf_service.initialized else []
+    if lazy_openai_service.initialized and openai_service:
+        cache_stats = openai_service.cache.stats()
+        families.append(("openai_cache_events_total", "counter", "OpenAI response cache events.",
+                         [({"event": event}, cache_stats[event]) for event in ("hits", "shared_hits", "misses", "evictions")]))
+        families.append(("openai_cache_entries", "gauge", "Entries in the in-memory OpenAI response cache.",
+                         [({}, cache_stats["entries"])]))
+        flights.append(("openai", openai_service.flight.stats()))
+        flights.append(("openai_async", openai_service.async_flight.stats()))
+        if openai_service.rate_limiter is not None:
+            limiter_stats = openai_service.rate_limiter.stats()
+            families.append(("openai_queue_depth", "gauge", "OpenAI calls waiting for rate limit capacity, by priority (0 runs first).",
+                             [({"priority": priority}, limiter_stats["queue_depth"].get(priority, 0)) for priority in sorted(set(PRIORITIES.values()))]))
+            families.append(("openai_queue_timeouts_total", "counter", "OpenAI calls that gave up waiting for rate limit capacity.",
+                             [({}, limiter_stats["timeouts"])]))
+            families.append(("openai_rate_scale", "gauge", "Adaptive multiplier on the configured OpenAI rate limits (cut on 429s).",
+                             [({}, limiter_stats["scale"])]))
+    shared_caches = {}
+    if lazy_yf_service.initialized:
+        shared_caches[id(yf_service.shared_cache)] = yf_service.shared_cache
+    if lazy_openai_service.initialized and openai_service and openai_service.cache.shared is not None:
+        shared_caches[id(openai_service.cache.shared)] = openai_service.cache.shared
+    shared_totals = {}
+    for cache in shared_caches.values():
+        for event, count in cache.stats().items():
+            shared_totals[(cache.backend, event)] = shared_totals.get((cache.backend, event), 0) + count
+    if shared_totals:
+        families.append(("shared_cache_events_total", "counter", "Cross-worker cache lookups, writes, waits for another worker's fetch, and backend errors.",
+                         [({"backend": backend, "event": event}, count) for (backend, event), count in sorted(shared_totals.items())]))
+    insight_stats = insight_cache.stats()
+    families.append(("insight_cache_events_total", "counter", "Precomputed answer lookups and invalidations.",
+                     [({"event": event}, insight_stats[event]) for event in ("hits", "misses", "invalidations")]))
+    families.append(("insight_cache_entries", "gauge", "Precomputed answers held for watchlist symbols.",
+                     [({}, insight_stats["entries"])]))
+    speculation_stats = speculative_prefetch.stats()
+    families.append(("speculation_total", "counter", "Queries whose data was fetched while OpenAI parsed them, by whether the parse confirmed the guess.",
+                     [({"outcome": "hit"}, speculation_stats["hits"]), ({"outcome": "miss"}, speculation_stats["speculations"] - speculation_stats["hits"])]))
+    families.append(("speculative_fetches_total", "counter", "Speculative data fetches by outcome (wasted: ran but unused; cancelled: dropped before running).",
+                     [({"outcome": outcome}, speculation_stats[f"fetches_{outcome}"]) for outcome in ("started", "used", "wasted", "cancelled")]))
+    families.append(("upstream_calls_total", "counter", "Upstream calls executed, or coalesced into an identical in-flight call.",
+                     [({"service": service, "outcome": outcome}, stats[outcome]) for service, stats in flights for outcome in ("executed", "coalesced")]))
+    return families
+
+# Connections opened to OpenAI by warm_up, and the symbol whose quote warms up the market data client (empty: skipped)
+WARM_UP_CONNECTIONS = int(os.getenv("WARM_UP_CONNECTIONS", "4"))
+WARM_UP_SYMBOL = os.getenv("WARM_UP_SYMBOL", WATCHLIST[0] if WATCHLIST else "SPY")
+
+_background_jobs_started = False
+_background_jobs_lock = threading.Lock()
+
+def start_background_jobs():
+    """Registers the metrics collector and starts the WATCHLIST jobs (quote refresher, insight warmer), once per process."""
+    global _background_jobs_started
+    with _background_jobs_lock:
+        if _background_jobs_started:
+            return
+        _background_jobs_started = True
+    REGISTRY.register_collector(collect_service_metrics)
+    if WATCHLIST:
+        yf_service.start_quote_refresher(WATCHLIST, refresh_seconds=float(os.getenv("QUOTE_REFRESH_SECONDS", "15")))
+        if INSIGHT_WARM_SECONDS > 0:
+            start_insight_warmer(WATCHLIST, INSIGHT_WARM_SECONDS)
+
+def warm_up():
+    """
+    Warm-up hook: builds the shared services and fills their connection pools ahead of the first request, so it
+    does not pay for imports, data loading and TCP/TLS handshakes. Failures are printed, not raised.
+    Returns the seconds spent per step.
+    """
+    def warm_openai():
+        if openai_service:
+            openai_service.warm_up(WARM_UP_CONNECTIONS)
+
+    timings = {}
+    for step, fn in (
+        ("openai", warm_openai),
+        ("yahoo", lambda: WARM_UP_SYMBOL and yf_service.warm_up(WARM_UP_SYMBOL)),
+        ("news", lambda: news_store.index(WATCHLIST)),
+        ("tokenizer", lambda: count_tokens("warm-up")),
+    ):
+        started = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            print(f"Warm-up step '{step}' failed: {e}")
+        timings[step] = round(time.perf_counter() - started, 3)
+    print(f"Warm-up done: {timings}")
+    return timings
+
+def create_app(warm=None):
+    """
+    App factory (e.g. `flask --app main run`, or `gunicorn "main:create_app()"`).
+    Args:
+        warm (str, optional): When to run warm_up: "startup" (before returning), "background" (in a thread, so the
+            server accepts requests right away) or "off". Defaults to WARM_UP_ON_START, else "background".
+    """
+    app = Flask(__name__, static_folder='static', template_folder='static')
+    app.before_request(start_timing)
+    app.after_request(add_server_timing)
+    app.add_url_rule('/metrics', view_func=metrics)
+    app.add_url_rule('/', view_func=index)
+    app.add_url_rule('/session', view_func=new_session, methods=['POST'])
+    app.add_url_rule('/ask', view_func=ask_assistant, methods=['POST'])
+    app.add_url_rule('/ask/stream', view_func=ask_assistant_stream, methods=['POST'])
+
+    start_background_jobs()
+    warm = warm or os.getenv("WARM_UP_ON_START", "background")
+    if warm == "startup":
+        warm_up()
+    elif warm == "background":
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    return app
+
+def start_timing():
+    g.request_started = time.perf_counter()
+    start_request_timings()
+
+def add_server_timing(response):
+    """Reports per-stage timings in the Server-Timing header and records the request duration."""
+    total = time.perf_counter() - g.get("request_started", time.perf_counter())
+    response.headers["Server-Timing"] = server_timing_header(current_request_timings() + [("total", total)])
+    REGISTRY.observe("http_request_duration_seconds", total,
+                     {"endpoint": request.endpoint or "unknown", "status": response.status_code},
+                     help="HTTP request duration (for streamed responses, until the headers are sent).")
+    return response
+
+def metrics():
+    """Prometheus text-format metrics."""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
-@app.route('/')
 def index():
-    return render_template('index.html', api_key_error=OPENAI_API_KEY_ERROR) # Pass OpenAI error
+    response = make_response(render_template('index.html', api_key_error=OPENAI_API_KEY_ERROR)) # Pass OpenAI error
+    if not session_store.valid_id(request.cookies.get(SESSION_COOKIE)):
+        # The page's questions form one conversation (see session_for)
+        response.set_cookie(SESSION_COOKIE, session_store.new_id(), httponly=True, samesite='Lax')
+    return response
 
-@app.route('/ask', methods=['POST'])
-def ask_assistant():
+def new_session():
+    """Starts a conversation for an API client, which passes the returned session_id with its questions."""
+    session_id = session_store.new_id()
+    response = jsonify({"session_id": session_id})
+    response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite='Lax')
+    return response
+
+def session_for(form, headers, cookies):
+    """
+    The conversation a request belongs to: a session_id form field or X-Session-ID header, else the UI's cookie.
+    Only ids issued by this server are accepted. Returns the SessionContext, or None for requests without a valid
+    id (each query then stands alone).
+    """
+    session_id = form.get('session_id') or headers.get('X-Session-ID') or cookies.get(SESSION_COOKIE)
+    if not session_store.valid_id(session_id):
+        return None
+    return session_store.get(session_id)
+
+def check_query(user_query):
+    """Returns an error as (payload, status) if the query cannot be served, else None."""
     if not openai_service or not openai_service.client: # Check if openai_service and its client are initialized
-        return jsonify({"error": f"OpenAI Service is not available. {OPENAI_API_KEY_ERROR if OPENAI_API_KEY_ERROR else 'Unknown initialization error.'}"}), 500
-        
-    user_query = request.form.get('query')
+        return {"error": f"OpenAI Service is not available. {OPENAI_API_KEY_ERROR if OPENAI_API_KEY_ERROR else 'Unknown initialization error.'}"}, 500
+
     if not user_query:
-        return jsonify({'error': 'No query provided'}), 400
+        return {'error': 'No query provided'}, 400
+    return None
 
-    # 1. Parse Query using OpenAI
-    company_symbol = None
-    intent = None
-    
-    # Use OpenAI to parse company and query intent of the user
-    parsed_info = openai_service.parse_query(user_query)
+def validate_parsed_query(user_query, parsed_info, parsed_by):
+    """
+    Checks the parsed company/intent of a query.
+    Returns (query_info, error) where error is (payload, status); exactly one of them is None.
+    """
     company_name = parsed_info.get("company_name")
     company_symbol = parsed_info.get("symbol")
     intent = parsed_info.get("intent")
+    symbols = list(dict.fromkeys(symbol.upper() for symbol in parsed_info.get("symbols") or [] if symbol))
 
     if not company_symbol and company_name:
         print(f"OpenAI identified company: {company_name}, but no symbol. Attempting to proceed if intent is general.")
 
     if not intent:
-        return jsonify({'error': 'Could not understand the intent of your query. Please try rephrasing.'}), 400
+        return None, ({'error': 'Could not understand the intent of your query. Please try rephrasing.'}, 400)
     
+    if intent == 'compare_stocks':
+        if len(symbols) < 2:
+            return None, ({'error': 'Please name at least two stock symbols to compare, e.g. "compare AAPL and MSFT".'}, 400)
+        if len(symbols) > MAX_COMPARE_SYMBOLS:
+            return None, ({'error': f'Please compare at most {MAX_COMPARE_SYMBOLS} stocks at a time.'}, 400)
+        company_symbol = symbols[0]
+
     # Ensure symbol is present for most intents.
     if intent in ['get_stock_price', 'get_latest_announcements', 'get_stock_movement_reasons'] and not company_symbol:
-         return jsonify({'error': f'Could not identify a stock symbol for "{company_name if company_name else user_query}". Please specify a known symbol like AAPL, MSFT, etc.'}), 400
+         return None, ({'error': f'Could not identify a stock symbol for "{company_name if company_name else user_query}". Please specify a known symbol like AAPL, MSFT, etc.'}, 400)
+
+    if not symbols and company_symbol:
+        symbols = [company_symbol]
+    return {"company_name": company_name, "symbol": company_symbol, "symbols": symbols, "intent": intent, "parsed_by": parsed_by,
+            "query": user_query}, None
+
+def parse_locally(user_query, session=None):
+    """
+    Local parse of a query: the fast path, then (in a session) follow-up resolution against the session's last company.
+    Returns (parsed_info, parsed_by), or (None, None) if the query needs the LLM.
+    """
+    with timed("parse.local"):
+        parsed_info = local_parser.parse(user_query)
+        if parsed_info is not None:
+            return parsed_info, "local"
+        if session is not None and session.subject:
+            parsed_info = local_parser.parse_follow_up(user_query, session.subject)
+            if parsed_info is not None:
+                session_store.record_follow_up()
+                return parsed_info, "session"
+    return None, None
+
+def remember_query(session, query_info):
+    """Makes a resolved query's company the session's subject, and attaches the session to it (for data reuse and history)."""
+    if session is None or not query_info:
+        return
+    if query_info["symbol"]:
+        session.remember(query_info)
+    query_info["session"] = session
+
+def resolve_query(user_query, session=None):
+    """
+    Parses and validates a user query (local fast path first, then session follow-ups, OpenAI for ambiguous queries).
+    Returns (query_info, error) where error is (payload, status); exactly one of them is None.
+    """
+    error = check_query(user_query)
+    if error:
+        return None, error
+
+    # 1. Parse Query (local fast path first, OpenAI for ambiguous queries)
+    parsed_info, parsed_by = parse_locally(user_query, session)
+    speculation = None
+    if parsed_info is None:
+        subject = session.subject if session is not None else None
+        # Start fetching for the likely symbols while OpenAI parses company and query intent of the user
+        speculation = start_speculation(user_query, subject)
+        with timed("parse.llm"):
+            parsed_info = openai_service.parse_query(user_query, context=subject)
+        parsed_by = "openai"
+    query_info, error = validate_parsed_query(user_query, parsed_info, parsed_by)
+    settle_speculation(speculation, query_info)
+    remember_query(session, query_info)
+    return query_info, error
+
+def start_speculation(user_query, subject=None):
+    """
+    Starts the data fetches for the symbols and intent a query seems to have (symbols of the session's subject if it
+    names none). Returns a Speculation, or None.
+    """
+    if speculative_prefetch.max_symbols <= 0:
+        return None
+    symbols, intent = local_parser.candidates(user_query)
+    if not symbols and subject:
+        symbols = subject.get("symbols") or []
+    # Unclear intent: a quote, history and announcements are all likely
+    return speculative_prefetch.start(symbols, SPECULATIVE_SOURCES.get(intent))
+
+def settle_speculation(speculation, query_info):
+    """Keeps the speculative fetches the parsed query needs (in query_info["prefetch"]) and drops the others."""
+    if speculation is None:
+        return
+    needed = set()
+    if query_info and query_info["symbol"]:
+        needed = {(name, query_info["symbol"].upper()) for name in SPECULATIVE_SOURCES.get(query_info["intent"], [])}
+    speculation.confirm(needed)
+    if query_info:
+        query_info["prefetch"] = speculation
+
+def prefetched(query_info, name, fetch):
+    """Returns fetch, or a wait for its speculative result if one was started for this query."""
+    speculation = query_info.get("prefetch")
+    future = speculation.take(name, query_info["symbol"]) if speculation else None
+    if future is None:
+        return fetch
+
+    def speculative_result():
+        # This usually runs on a fan-out worker: a speculative fetch still queued on the same pool is run here
+        # instead of waited for (workers waiting on tasks queued behind them can deadlock a full pool)
+        if future.cancel():
+            return fetch()
+        return future.result(timeout=data_fanout.default_timeout)
+
+    return speculative_result
+
+def finish_speculation(query_info):
+    """Releases the query's speculative fetches once it is answered (unused ones count as wasted)."""
+    speculation = query_info.pop("prefetch", None)
+    if speculation:
+        speculation.close()
+
+def session_reused(query_info, name, fetch):
+    """Returns fetch, or in a session, a wrapper that reuses the data an earlier question of the session fetched."""
+    session = query_info.get("session")
+    return session.cached(name, query_info["symbols"], fetch) if session is not None else fetch
+
+def session_history(query_info):
+    """The session's earlier turns (chat messages) to answer a query with, or None outside a session."""
+    session = query_info.get("session")
+    return session.history() if session is not None else None
+
+def record_turn(query_info, answer):
+    """Adds an answered question to its session's history (error messages are left out)."""
+    session = query_info.get("session")
+    if session is not None and not openai_service.is_error_response(answer):
+        session.add_turn(query_info["query"], answer)
+
+def recorded_stream(query_info, chunks):
+    """Passes a streamed answer through, adding it to the session's history once it is complete."""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    record_turn(query_info, "".join(parts))
+
+def format_quote_answer(company_symbol, quote):
+    if quote is None:
+        return f"Could not retrieve the latest stock price for {company_symbol}."
+    as_of = datetime.fromtimestamp(quote["fetched_at"], MARKET_TIMEZONE).strftime("%H:%M:%S %Z")
+    return f"The latest stock price for {company_symbol} is ${quote['price']:.2f} (as of {as_of})."
+
+def data_sources_for(query_info):
+    """The data fetched concurrently for a query's intent, as DataFanout sources (name -> (callable, fallback))."""
+    intent = query_info["intent"]
+    company_symbol = query_info["symbol"]
+    if intent == 'compare_stocks':
+        symbols = query_info["symbols"]
+        return {
+            # One batched download for every symbol's history
+            "price_histories": (session_reused(query_info, "price_histories", lambda: yf_service.get_price_frames(symbols, days=MOVEMENT_LOOKBACK_DAYS)), {}),
+            "announcements": (session_reused(query_info, "announcements", lambda: {
+                symbol: yf_service.get_latest_announcements(symbol, limit=COMPARE_ANNOUNCEMENTS_PER_SYMBOL) for symbol in symbols}), {}),
+        }
+    announcements = session_reused(query_info, "announcements",
+                                   prefetched(query_info, "announcements", lambda: yf_service.get_latest_announcements(company_symbol)))
+    if intent == 'get_latest_announcements':
+        return {
+            "announcements": (announcements, {}),
+        }
+    return {
+        "price_history": (session_reused(query_info, "price_history",
+                                         prefetched(query_info, "price_history", lambda: yf_service.get_price_frame(company_symbol, days=MOVEMENT_LOOKBACK_DAYS))), None),
+        "announcements": (announcements, {}),
+    }
+
+def add_news(query_info, data, degraded_sources):
+    """
+    Adds the relevant news articles to fetched query data. Runs after the fan-out: for movement questions the
+    retrieval depends on the days with significant moves in the fetched price history.
+    """
+    if query_info["intent"] not in ('get_latest_announcements', 'get_stock_movement_reasons'):
+        return
+    try:
+        with timed("fetch.news"):
+            data["news"] = search_company_news(query_info["symbol"], query_info.get("query") or "", data.get("price_history")
+                                               if query_info["intent"] == 'get_stock_movement_reasons' else None)
+    except Exception as e:
+        record_error("fetch.news")
+        print(f"Data source 'news' unavailable ({type(e).__name__}: {e}). Continuing with partial data.")
+        data["news"] = []
+        degraded_sources.append("news")
+
+def fetch_query_data(query_info):
+    """Fetches everything a query's answer needs. Returns (data, degraded_sources) like DataFanout.gather."""
+    data, degraded_sources = data_fanout.gather(data_sources_for(query_info))
+    add_news(query_info, data, degraded_sources)
+    return data, degraded_sources
+
+UNSUPPORTED_INTENT_ANSWER = "I can help with finding the latest stock price, latest announcements, reasons for stock price movements, or comparing several stocks for US-listed companies."
+
+def answer_query(query_info, stream=False):
+    """
+    Fetches the data for a resolved query and produces the answer.
+    Returns (response_data, degraded_sources). With stream=True, response_data is an iterator of text chunks.
+    """
+    company_symbol = query_info["symbol"]
+    intent = query_info["intent"]
+    history = session_history(query_info)
 
     # 2. Process based on intent
     response_data = ""
+    degraded_sources = []
 
-    if intent == 'get_stock_price':
-        if not company_symbol: # Redundant check if above condition is strict, but good for clarity
-             return jsonify({'error': f'Could not identify a stock symbol for your query about stock price. Please specify a known symbol.'}), 400
-        price = yf_service.get_latest_stock_price(company_symbol)
-        if price is not None:
-            response_data = f"The latest stock price for {company_symbol} is ${price:.2f}."
-        else:
-            response_data = f"Could not retrieve the latest stock price for {company_symbol}."
+    precomputed = precomputed_answer(query_info)
+    if precomputed is not None:
+        response_data = precomputed
+
+    elif intent == 'get_stock_price':
+        quote = prefetched(query_info, "quote", lambda: yf_service.get_latest_quote(company_symbol))()
+        response_data = format_quote_answer(company_symbol, quote)
 
     elif intent == 'get_latest_announcements':
-        if not company_symbol:
-             return jsonify({'error': f'Could not identify a stock symbol for your query about announcements. Please specify a known symbol.'}), 400
-        announcements_data = yf_service.get_latest_announcements(company_symbol)
-        web_news = search_web_for_company_news(company_symbol, "latest") 
-        response_data = openai_service.generate_announcement_summary(company_symbol, announcements_data, web_news)
+        with timed("fetch"):
+            data, degraded_sources = fetch_query_data(query_info)
+        with timed("analysis"):
+            response_data = openai_service.generate_announcement_summary(company_symbol, data["announcements"], data["news"], stream=stream, history=history)
 
     elif intent == 'get_stock_movement_reasons':
-        if not company_symbol:
-             return jsonify({'error': f'Could not identify a stock symbol for your query about stock movements. Please specify a known symbol.'}), 400
-        price_history = yf_service.get_stock_price_history(company_symbol, days=14)
-        announcements_data = yf_service.get_latest_announcements(company_symbol)
-        web_news = search_web_for_company_news(company_symbol, "last 2 weeks") 
-        response_data = openai_service.analyze_stock_movement_reasons(company_symbol, price_history, announcements_data, web_news)
+        with timed("fetch"):
+            data, degraded_sources = fetch_query_data(query_info)
+        with timed("analysis"):
+            response_data = openai_service.analyze_stock_movement_reasons(company_symbol, data["price_history"], data["announcements"], data["news"],
+                                                                          stream=stream, history=history)
+
+    elif intent == 'compare_stocks':
+        with timed("fetch"):
+            data, degraded_sources = fetch_query_data(query_info)
+        with timed("analysis"):
+            response_data = openai_service.compare_stocks(data["price_histories"], data["announcements"], stream=stream, history=history)
 
     else:
-        response_data = "I can help with finding the latest stock price, latest announcements, or reasons for stock price movements for US-listed companies."
+        response_data = UNSUPPORTED_INTENT_ANSWER
+
+    finish_speculation(query_info)
+    if not stream:
+        record_turn(query_info, response_data)
+        return response_data, degraded_sources
+    if isinstance(response_data, str):
+        response_data = iter([response_data])
+    if query_info.get("session") is not None:
+        response_data = recorded_stream(query_info, response_data)
+    return response_data, degraded_sources
+
+def ask_assistant():
+    query_info, error = resolve_query(request.form.get('query'), session_for(request.form, request.headers, request.cookies))
+    if error:
+        return jsonify(error[0]), error[1]
+
+    response_data, degraded_sources = answer_query(query_info)
+
+    result = {'response': response_data, 'parsed_by': query_info["parsed_by"]}
+    if degraded_sources:
+        result['degraded_sources'] = degraded_sources
+    return jsonify(result)
+
+def sse_event(payload, event=None):
+    """Formats one Server-Sent Event with a JSON payload."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(payload)}\n\n"
+
+def ask_assistant_stream():
+    """Streaming variant of /ask: answer text is sent as Server-Sent Events while it is generated."""
+    query_info, error = resolve_query(request.form.get('query'), session_for(request.form, request.headers, request.cookies))
+    if error:
+        return jsonify(error[0]), error[1]
+
+    def generate():
+        yield sse_event({'parsed_by': query_info["parsed_by"]}, event='meta')
+        try:
+            response_data, degraded_sources = answer_query(query_info, stream=True)
+            if degraded_sources:
+                yield sse_event({'degraded_sources': degraded_sources}, event='meta')
+            for chunk in response_data:
+                yield sse_event({'token': chunk})
+        except Exception as e:
+            print(f"Error while streaming response: {e}")
+            yield sse_event({'error': f"Error while generating the response: {e}"}, event='error')
+        yield sse_event({}, event='done')
 
-    return jsonify({'response': response_data})
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 if __name__ == '__main__':
     # Port 5000 is default for Flask. Ensure it's not in use or choose another like 5001
-    app.run(host='0.0.0.0', port=5001, debug=True)
+    create_app().run(host='0.0.0.0', port=5001, debug=True)
 
@@ -0,0 +1,92 @@
+import os
+import glob
+import json
+import bisect
+import threading
+
+DEFAULT_ANNOUNCEMENTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "announcements")
+APPENDED_FILE_NAME = "appended.jsonl"
+
+CATEGORIES = ("significant_developments", "financial_results", "sec_filings")
+
+
+class AnnouncementStore:
+    def __init__(self, data_dir: str = None):
+        """
+        In-memory announcement/filing store, indexed by symbol and date.
+        Args:
+            data_dir (str, optional): Directory of *.jsonl files with one announcement per line. Each record needs
+                'symbol', 'category' and 'date' (YYYY-MM-DD). Defaults to ANNOUNCEMENTS_DATA_DIR or src/data/announcements.
+        """
+        self.data_dir = data_dir or os.getenv("ANNOUNCEMENTS_DATA_DIR", DEFAULT_ANNOUNCEMENTS_DIR)
+        # (symbol, category) -> list of (date, seq, record), kept sorted by date
+        self._index = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._listeners = []
+        self.load()
+
+    def load(self):
+        """(Re)loads every *.jsonl file in the data directory."""
+        with self._lock:
+            self._index = {}
+            for path in sorted(glob.glob(os.path.join(self.data_dir, "*.jsonl"))):
+                with open(path, "r", encoding="utf-8") as f:
+                    for line_number, line in enumerate(f, start=1):
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            self._insert(json.loads(line))
+                        except (ValueError, KeyError) as e:
+                            print(f"Skipping invalid announcement record {path}:{line_number}: {e}")
+
+    def _insert(self, record: dict):
+        key = (record["symbol"].upper(), record["category"])
+        self._seq += 1
+        bisect.insort(self._index.setdefault(key, []), (record["date"], self._seq, record))
+
+    def append(self, records: list, persist: bool = True):
+        """
+        Adds new announcements without reloading the store.
+        Args:
+            records (list): Announcement dicts (same shape as the data files).
+            persist (bool, optional): Also append them to the data directory so they survive restarts.
+        """
+        with self._lock:
+            for record in records:
+                self._insert(record)
+            if persist:
+                os.makedirs(self.data_dir, exist_ok=True)
+                with open(os.path.join(self.data_dir, APPENDED_FILE_NAME), "a", encoding="utf-8") as f:
+                    for record in records:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            listeners = list(self._listeners)
+        symbols = {record["symbol"].upper() for record in records}
+        for listener in listeners:
+            listener(symbols)
+
+    def add_listener(self, listener):
+        """Registers a callable invoked with the set of symbols after each append (e.g. to invalidate derived answers)."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def latest(self, symbol: str, category: str, limit: int = 10, since: str = None):
+        """
+        Returns the newest announcements for a symbol and category, newest first.
+        Args:
+            symbol (str): Ticker symbol.
+            category (str): One of CATEGORIES.
+            limit (int, optional): Maximum number of records.
+            since (str, optional): Only records dated on/after this YYYY-MM-DD date.
+        """
+        with self._lock:
+            entries = self._index.get((symbol.upper(), category), [])
+            start = bisect.bisect_left(entries, (since,)) if since else 0
+            selected = entries[max(start, len(entries) - limit):] if limit else entries[start:]
+            return [record for _, _, record in reversed(selected)]
+
+    def symbols(self):
+        """Returns the set of symbols with at least one announcement."""
+        with self._lock:
+            return {symbol for symbol, _ in self._index}
@@ -1,44 +1,98 @@
-import yfinance as yf
+import time
+
+from .ohlcv import OHLCVFrame
+
+_yf = None
+
+
+def _yfinance():
+    """yfinance (and pandas behind it) is imported on first use; it is the slowest import of the app."""
+    global _yf
+    if _yf is None:
+        import yfinance
+        _yf = yfinance
+    return _yf
 
 class ApiClient:
+    def get_chart(self, symbol: str, interval: str = '1d', range_: str = '1mo', start: str = None):
+        """
+        Fetches historical market data as a columnar OHLCVFrame (None if there is no data).
+        If start (YYYY-MM-DD) is given, bars from that date onwards are fetched instead of range_.
+        """
+        yf = _yfinance()
+        if start:
+            data = yf.Ticker(symbol).history(start=start, interval=interval)
+        else:
+            data = yf.Ticker(symbol).history(period=range_, interval=interval)
+        if data.empty:
+            return None
+        return OHLCVFrame.from_dataframe(symbol, interval, data)
+
+    def get_charts(self, symbols: list, interval: str = '1d', range_: str = '1mo', start: str = None):
+        """
+        Batch variant of get_chart: one multi-symbol download. Returns symbol -> OHLCVFrame (symbols without data are left out).
+        """
+        if not symbols:
+            return {}
+        yf = _yfinance()
+        # ignore_tz=False keeps the exchange-local index of Ticker.history, so timestamps match single-symbol fetches
+        options = {"start": start} if start else {"period": range_}
+        data = yf.download(list(symbols), interval=interval, group_by='ticker', auto_adjust=True, actions=False,
+                           ignore_tz=False, progress=False, threads=True, **options)
+        frames = {}
+        for symbol in symbols:
+            try:
+                history = data[symbol].dropna(how='all')
+            except KeyError:
+                continue
+            if not history.empty:
+                frames[symbol] = OHLCVFrame.from_dataframe(symbol, interval, history)
+        return frames
+
+    def get_quote(self, symbol: str):
+        """
+        Fetches only the latest price (a single daily bar plus chart metadata), not a day of 1m bars.
+        Returns {'symbol', 'price', 'fetched_at'} or None.
+        """
+        yf = _yfinance()
+        ticker = yf.Ticker(symbol)
+        data = ticker.history(period='1d', interval='1d')
+        if data.empty:
+            return None
+        price = (ticker.history_metadata or {}).get('regularMarketPrice')
+        if price is None:
+            price = data['Close'].iloc[-1]
+        return {"symbol": symbol, "price": float(price), "fetched_at": time.time()}
+
+    def get_quotes(self, symbols: list):
+        """Batch variant of get_quote: one upstream request for many symbols. Returns symbol -> quote."""
+        if not symbols:
+            return {}
+        yf = _yfinance()
+        data = yf.download(list(symbols), period='1d', interval='1d', group_by='ticker', auto_adjust=True, progress=False, threads=True)
+        fetched_at = time.time()
+        quotes = {}
+        for symbol in symbols:
+            try:
+                close = data[symbol]['Close'].dropna()
+            except KeyError:
+                continue
+            if not close.empty:
+                quotes[symbol] = {"symbol": symbol, "price": float(close.iloc[-1]), "fetched_at": fetched_at}
+        return quotes
+
     def call_api(self, endpoint: str, query: dict):
         symbol = query.get('symbol')
         region = query.get('region', 'US')
         interval = query.get('interval', '1d')
         range_ = query.get('range', '1mo')
 
-        ticker = yf.Ticker(symbol)
-
         if endpoint == 'YahooFinance/get_stock_chart':
-            # Fetch historical market data
-            data = ticker.history(period=range_, interval=interval)
-            if data.empty:
+            # Fetch historical market data; the dict response is a compatibility view over the columnar frame
+            frame = self.get_chart(symbol, interval=interval, range_=range_)
+            if frame is None:
                 return None
-
-            # Prepare response similar to Yahoo Finance API structure
-            timestamps = [int(ts.timestamp()) for ts in data.index]
-            indicators = {
-                "quote": [{
-                    "open": data['Open'].tolist(),
-                    "high": data['High'].tolist(),
-                    "low": data['Low'].tolist(),
-                    "close": data['Close'].tolist(),
-                    "volume": data['Volume'].tolist()
-                }]
-            }
-
-            response = {
-                "chart": {
-                    "result": [{
-                        "meta": {
-                            "regularMarketPrice": data['Close'][-1]
-                        },
-                        "timestamp": timestamps,
-                        "indicators": indicators
-                    }]
-                }
-            }
-            return response
+            return frame.to_chart_response()
 
         elif endpoint == 'YahooFinance/get_stock_insights':
             # yfinance does not provide stock insights directly; hardcode this for MVP
@@ -0,0 +1,94 @@
+import time
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from .metrics import timed, record_error
+
+
+class DataFanout:
+    def __init__(self, max_workers: int = 8, default_timeout: float = 10.0):
+        """
+        Runs independent data fetches concurrently on a bounded thread pool.
+        Args:
+            max_workers (int, optional): Upper bound on concurrent fetches across all requests.
+            default_timeout (float, optional): Seconds to wait for a source that has no explicit timeout.
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="data-fanout")
+        self.default_timeout = default_timeout
+
+    @staticmethod
+    def _submit_in_context(name, fn):
+        # Run in a copy of the caller's context so per-request stage timings are recorded
+        context = contextvars.copy_context()
+
+        def run():
+            with timed(f"fetch.{name}"):
+                return fn()
+
+        return functools.partial(context.run, run)
+
+    def submit(self, name, fn):
+        """Starts one fetch on the pool (timed as fetch.<name>) and returns its Future."""
+        return self.executor.submit(self._submit_in_context(name, fn))
+
+    def gather(self, sources: dict, timeouts: dict = None):
+        """
+        Runs every source at once and waits for each up to its own timeout.
+        Args:
+            sources (dict): name -> (callable, fallback). The fallback is used if the call fails or times out.
+            timeouts (dict, optional): name -> seconds, measured from when the fan-out started.
+        Returns:
+            (results, degraded): results maps name -> value; degraded lists the sources that used their fallback.
+        """
+        timeouts = timeouts or {}
+        started = time.monotonic()
+        futures = {name: self.submit(name, fn) for name, (fn, _) in sources.items()}
+
+        results = {}
+        degraded = []
+        for name, future in futures.items():
+            remaining = started + timeouts.get(name, self.default_timeout) - time.monotonic()
+            try:
+                results[name] = future.result(timeout=max(0.0, remaining))
+            except Exception as e:
+                # Late results are dropped; the worker thread finishes in the background
+                future.cancel()
+                record_error(f"fetch.{name}")
+                print(f"Data source '{name}' unavailable ({type(e).__name__}: {e}). Continuing with partial data.")
+                results[name] = sources[name][1]
+                degraded.append(name)
+        return results, degraded
+
+    async def run(self, fn, *args, **kwargs):
+        """Awaits a blocking call (e.g. yfinance) on the bounded pool, in a copy of the caller's context."""
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, fn, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, call)
+
+    async def agather(self, sources: dict, timeouts: dict = None):
+        """
+        Async variant of gather for the async serving mode: the event loop stays free while the pool works.
+        Args and return value are the same as for gather().
+        """
+        timeouts = timeouts or {}
+        loop = asyncio.get_running_loop()
+
+        async def fetch(name, fn):
+            future = loop.run_in_executor(self.executor, self._submit_in_context(name, fn))
+            return await asyncio.wait_for(future, timeouts.get(name, self.default_timeout))
+
+        outcomes = await asyncio.gather(*(fetch(name, fn) for name, (fn, _) in sources.items()), return_exceptions=True)
+
+        results = {}
+        degraded = []
+        for name, outcome in zip(sources, outcomes):
+            if isinstance(outcome, Exception):
+                record_error(f"fetch.{name}")
+                print(f"Data source '{name}' unavailable ({type(outcome).__name__}: {outcome}). Continuing with partial data.")
+                results[name] = sources[name][1]
+                degraded.append(name)
+            else:
+                results[name] = outcome
+        return results, degraded
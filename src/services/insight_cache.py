@@ -0,0 +1,171 @@
+import json
+import time
+import hashlib
+import threading
+
+from .ohlcv import OHLCVFrame
+
+
+def content_hash(inputs):
+    """
+    Stable SHA-256 of an answer's inputs (nested dicts/lists, OHLCVFrames hashed by their column bytes),
+    so a precomputed answer can be checked against the current data.
+    """
+    digest = hashlib.sha256()
+
+    def feed(value):
+        if isinstance(value, OHLCVFrame):
+            digest.update(f"frame:{value.symbol}:{value.interval}:{len(value)}".encode("utf-8"))
+            for column in (value.timestamps, value.open, value.high, value.low, value.close, value.volume):
+                digest.update(column.tobytes())
+        elif isinstance(value, dict):
+            digest.update(b"{")
+            for key in sorted(value):
+                digest.update(f"{key}:".encode("utf-8"))
+                feed(value[key])
+            digest.update(b"}")
+        elif isinstance(value, (list, tuple)):
+            digest.update(b"[")
+            for item in value:
+                feed(item)
+            digest.update(b"]")
+        else:
+            digest.update(json.dumps(value, default=str).encode("utf-8"))
+            digest.update(b",")
+
+    feed(inputs)
+    return digest.hexdigest()
+
+
+class InsightCache:
+    def __init__(self, max_age_seconds: float = 900.0):
+        """
+        Precomputed answers (announcement summaries, movement analyses) keyed by (kind, symbol).
+        Args:
+            max_age_seconds (float, optional): Answers whose inputs were not re-verified within this time are not served.
+        """
+        self.max_age_seconds = max_age_seconds
+        self._entries = {}  # (kind, symbol) -> {'hash', 'response', 'computed_at', 'verified_at'}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, kind: str, symbol: str):
+        """Returns the precomputed answer, or None if there is none or it was not verified recently."""
+        with self._lock:
+            entry = self._entries.get((kind, symbol.upper()))
+            if entry is None or time.time() - entry["verified_at"] > self.max_age_seconds:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry["response"]
+
+    def put(self, kind: str, symbol: str, input_hash: str, response: str):
+        now = time.time()
+        with self._lock:
+            self._entries[(kind, symbol.upper())] = {"hash": input_hash, "response": response, "computed_at": now, "verified_at": now}
+
+    def verify(self, kind: str, symbol: str, input_hash: str):
+        """Marks the stored answer as still valid if its inputs are unchanged. Returns True if it was."""
+        with self._lock:
+            entry = self._entries.get((kind, symbol.upper()))
+            if entry is None or entry["hash"] != input_hash:
+                return False
+            entry["verified_at"] = time.time()
+            return True
+
+    def invalidate(self, symbol: str, kind: str = None):
+        """Drops the answers for a symbol (of one kind, or all kinds)."""
+        symbol = symbol.upper()
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == symbol and (kind is None or key[0] == kind)]:
+                del self._entries[key]
+                self.invalidations += 1
+
+    def stats(self):
+        """Returns entry count, hits, misses and invalidations."""
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "invalidations": self.invalidations}
+
+
+class InsightWarmer:
+    def __init__(self, cache: InsightCache, watchlist: list, kinds: list, load_inputs, compute, interval_seconds: float = 300.0):
+        """
+        Background scheduler that keeps the insight cache warm for a watchlist. Every interval (or right away when
+        woken, e.g. by new announcements) it loads each answer's inputs, and recomputes the answer only if their
+        content hash changed.
+        Args:
+            cache (InsightCache): Where answers are stored.
+            watchlist (list): Symbols to precompute.
+            kinds (list): Answer kinds to precompute per symbol.
+            load_inputs (callable): (kind, symbol) -> inputs, or None if they are unavailable right now.
+            compute (callable): (kind, symbol, inputs) -> answer text, or None on failure.
+            interval_seconds (float, optional): Seconds between checks.
+        """
+        self.cache = cache
+        self.watchlist = [symbol.upper() for symbol in watchlist]
+        self.kinds = list(kinds)
+        self.load_inputs = load_inputs
+        self.compute = compute
+        self.interval_seconds = interval_seconds
+        self.recomputed = 0
+        self.unchanged = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self):
+        """Checks every (kind, symbol) once, recomputing answers whose inputs changed."""
+        for symbol in self.watchlist:
+            for kind in self.kinds:
+                if self._stop.is_set():
+                    return
+                try:
+                    self._refresh_one(kind, symbol)
+                except Exception as e:
+                    print(f"Error precomputing {kind} for {symbol}: {e}")
+
+    def _refresh_one(self, kind: str, symbol: str):
+        inputs = self.load_inputs(kind, symbol)
+        if inputs is None:
+            return
+        input_hash = content_hash(inputs)
+        if self.cache.verify(kind, symbol, input_hash):
+            self.unchanged += 1
+            return
+        # Inputs changed: stop serving the old answer before the (slow) recompute
+        self.cache.invalidate(symbol, kind)
+        response = self.compute(kind, symbol, inputs)
+        if response:
+            self.cache.put(kind, symbol, input_hash, response)
+            self.recomputed += 1
+
+    def notify_changed(self, symbols):
+        """Invalidates the answers of symbols whose inputs changed (e.g. new announcements) and wakes the scheduler."""
+        watched = [symbol.upper() for symbol in symbols if symbol.upper() in self.watchlist]
+        for symbol in watched:
+            self.cache.invalidate(symbol)
+        if watched:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._wake.wait(self.interval_seconds)
+            self._wake.clear()
+
+    def start(self):
+        """Starts the background scheduler (no-op if already running or the watchlist is empty)."""
+        if self._thread or not self.watchlist:
+            return
+        self._thread = threading.Thread(target=self._run, name="insight-warmer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the background scheduler."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,34 @@
+import threading
+
+
+class LazyService:
+    def __init__(self, factory):
+        """
+        A shared service instance that is only built (by calling factory) when first used, so that importing
+        the app does not pay for heavy imports, connection pools or data loading up front.
+        Args:
+            factory (callable): Builds the instance; called at most once, even with concurrent first uses.
+        """
+        self.factory = factory
+        self._instance = None
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    @property
+    def initialized(self):
+        return self._initialized
+
+    def get(self):
+        """Returns the instance, building it on first use."""
+        if not self._initialized:
+            with self._lock:
+                if not self._initialized:
+                    self._instance = self.factory()
+                    self._initialized = True
+        return self._instance
+
+    def set(self, instance):
+        """Replaces the instance (e.g. with one bound to local fake backends)."""
+        with self._lock:
+            self._instance = instance
+            self._initialized = True
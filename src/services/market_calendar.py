@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+# Regular US equity session. Exchange holidays are not modelled.
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+MARKET_OPEN = (9, 30)
+MARKET_CLOSE = (16, 0)
+
+
+def _now(now: datetime = None):
+    return now.astimezone(MARKET_TIMEZONE) if now else datetime.now(MARKET_TIMEZONE)
+
+
+def _at(day: datetime, hour_minute: tuple):
+    return day.replace(hour=hour_minute[0], minute=hour_minute[1], second=0, microsecond=0)
+
+
+def is_market_open(now: datetime = None):
+    """True during the regular session on a weekday."""
+    now = _now(now)
+    return now.weekday() < 5 and _at(now, MARKET_OPEN) <= now < _at(now, MARKET_CLOSE)
+
+
+def next_market_close(now: datetime = None):
+    """The next weekday 16:00 ET strictly after now."""
+    now = _now(now)
+    close = _at(now, MARKET_CLOSE)
+    if close <= now:
+        close += timedelta(days=1)
+    while close.weekday() >= 5:  # Skip Saturday/Sunday
+        close += timedelta(days=1)
+    return close
+
+
+def previous_market_close(now: datetime = None):
+    """The most recent weekday 16:00 ET at or before now."""
+    now = _now(now)
+    close = _at(now, MARKET_CLOSE)
+    if close > now:
+        close -= timedelta(days=1)
+    while close.weekday() >= 5:
+        close -= timedelta(days=1)
+    return close
+
+
+def completed_daily_bars_cutoff(now: datetime = None):
+    """
+    Epoch seconds before which daily bars are final: midnight ET after the most recent close. A bar stamped later
+    is today's, still forming while the market is open.
+    """
+    close_day = previous_market_close(now)
+    return (close_day.replace(hour=0, minute=0) + timedelta(days=1)).timestamp()
+
+
+def seconds_until_next_daily_bar(now: datetime = None):
+    """Seconds until the next US market close, i.e. until a new daily price bar exists."""
+    return max(1.0, (next_market_close(now) - _now(now)).total_seconds())
@@ -0,0 +1,150 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Stage timings of the current request, reported in the Server-Timing header
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def _format_labels(labels: tuple):
+    if not labels:
+        return ""
+    escaped = (f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for key, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class MetricsRegistry:
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        """
+        Minimal in-process metrics registry (counters and histograms) rendered in Prometheus text format.
+        """
+        self.buckets = buckets
+        self._counters = {}    # name -> {labels: value}
+        self._histograms = {}  # name -> {labels: [bucket counts..., sum, count]}
+        self._help = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, labels: dict = None, help: str = None):
+        """Increments a counter."""
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+            if help:
+                self._help.setdefault(name, help)
+
+    def observe(self, name: str, value: float, labels: dict = None, help: str = None):
+        """Records one observation in a histogram."""
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+            if help:
+                self._help.setdefault(name, help)
+
+    def register_collector(self, collector):
+        """
+        Registers a callable evaluated at scrape time. It returns a list of
+        (name, type, help, [(labels_dict, value), ...]) tuples, e.g. for cache hit counters kept elsewhere.
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        """Returns all metrics in Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: {key: list(state) for key, state in series.items()} for name, series in self._histograms.items()}
+            collectors = list(self._collectors)
+            help_texts = dict(self._help)
+
+        for name, series in sorted(counters.items()):
+            if name in help_texts:
+                lines.append(f"# HELP {name} {help_texts[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+
+        for name, series in sorted(histograms.items()):
+            if name in help_texts:
+                lines.append(f"# HELP {name} {help_texts[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, state in sorted(series.items()):
+                for bound, count in zip(self.buckets, state):
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', bound),))} {count}")
+                lines.append(f"{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {state[-1]}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(state[-2])}")
+                lines.append(f"{name}_count{_format_labels(key)} {state[-1]}")
+
+        for collector in collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+                continue
+            for name, metric_type, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry used by the app and services
+REGISTRY = MetricsRegistry()
+
+
+def start_request_timings():
+    """Starts collecting stage timings for the current request (see server_timing_header)."""
+    return _request_timings.set([])
+
+
+def current_request_timings():
+    """Returns the stage timings [(stage, seconds), ...] recorded so far for the current request."""
+    return list(_request_timings.get() or [])
+
+
+def observe_stage(stage: str, seconds: float):
+    """Records a stage duration in the stage_duration_seconds histogram and the current request's timings."""
+    REGISTRY.observe("stage_duration_seconds", seconds, {"stage": stage}, help="Duration of pipeline stages.")
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage: str):
+    """Times a pipeline stage (see observe_stage)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def record_error(source: str):
+    """Counts an error from an upstream source or pipeline stage."""
+    REGISTRY.inc("errors_total", labels={"source": source}, help="Errors by source.")
+
+
+def server_timing_header(timings: list):
+    """Formats stage timings as a Server-Timing header value (durations in milliseconds)."""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings)
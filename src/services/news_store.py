@@ -0,0 +1,304 @@
+import os
+import re
+import glob
+import json
+import math
+import functools
+import threading
+from collections import Counter
+from datetime import date
+
+import numpy as np
+
+DEFAULT_NEWS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "news")
+APPENDED_FILE_NAME = "appended.jsonl"
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and are as at be but by did do does for from had has have how in is it its of on or over so than that the
+their this to was were what when which who why will with about after last latest news stock stocks share shares
+price prices week weeks day days month months today recent recently move moves moved movement movements
+""".split())
+
+# Generic market-moving vocabulary, weighted below the user's own words, so that movement questions without
+# specific terms ("why did TSLA move?") still prefer articles that explain a move
+MOVEMENT_TERMS = ("earnings", "guidance", "revenue", "forecast", "upgrade", "downgrade", "analyst", "target",
+                  "tariff", "lawsuit", "regulator", "deliveries", "sales", "outlook", "layoffs",
+                  "acquisition", "deal", "recall", "investigation", "rally", "plunge", "surge", "slump")
+MOVEMENT_TERM_WEIGHT = 0.3
+
+
+def _stem(token: str):
+    """Conservative suffix stripping (plurals, -ing, -ed), so that e.g. "tariffs" matches "tariff"."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    for suffix in ("ing", "ed"):
+        if len(token) > len(suffix) + 3 and token.endswith(suffix):
+            return token[:-len(suffix)]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+@functools.lru_cache(maxsize=1 << 20)
+def _term(token: str):
+    """Index term of a raw lowercase token ("" for stopwords and single characters)."""
+    return "" if len(token) < 2 or token in STOPWORDS else _stem(token)
+
+
+def tokenize(text: str):
+    """Lowercased, stemmed alphanumeric tokens without stopwords and single characters."""
+    return [term for term in map(_term, TOKEN_PATTERN.findall((text or "").lower())) if term]
+
+
+def _day(value):
+    """Day ordinal of a YYYY-MM-DD (or ISO datetime) string or a date."""
+    if isinstance(value, date):
+        return value.toordinal()
+    return date.fromisoformat(str(value)[:10]).toordinal()
+
+
+class _Segment:
+    """BM25 index over one symbol's articles. Doc ids follow date order, so a date range is a contiguous id range."""
+
+    def __init__(self, documents: list):
+        documents.sort(key=lambda document: document[0])
+        self.days = np.array([day for day, _, _ in documents], dtype=np.int32)
+        self.records = [record for _, record, _ in documents]
+
+        # Flat (term id, doc id) pairs, counted and grouped by term in one sort instead of per-term Python lists
+        vocabulary = {}
+        term_ids = []
+        lengths = np.zeros(len(documents), dtype=np.float32)
+        for doc_id, (_, _, tokens) in enumerate(documents):
+            lengths[doc_id] = len(tokens)
+            term_ids.extend([vocabulary.setdefault(token, len(vocabulary)) for token in tokens])
+        doc_ids = np.repeat(np.arange(len(documents), dtype=np.int64), lengths.astype(np.int64))
+        pairs, counts = np.unique(np.array(term_ids, dtype=np.int64) * max(len(documents), 1) + doc_ids, return_counts=True)
+        pair_terms = pairs // max(len(documents), 1)
+        self._doc_ids = (pairs % max(len(documents), 1)).astype(np.int32)
+        self._counts = counts.astype(np.float32)
+        bounds = np.flatnonzero(np.diff(pair_terms)) + 1
+        starts = np.concatenate(([0], bounds)).tolist() if len(pairs) else []
+        ends = np.concatenate((bounds, [len(pairs)])).tolist() if len(pairs) else []
+        terms = list(vocabulary)
+        # term -> (doc ids, term frequencies), as views into the flat arrays
+        self.postings = {terms[pair_terms[start]]: (self._doc_ids[start:end], self._counts[start:end])
+                         for start, end in zip(starts, ends)}
+        self.lengths = lengths
+        self.average_length = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+
+    def __len__(self):
+        return len(self.records)
+
+    def documents(self):
+        """The (day, record, tokens) list this segment was built from (token order aside), recovered from the postings."""
+        tokens = [[] for _ in self.records]
+        for token, (ids, counts) in self.postings.items():
+            for doc_id, count in zip(ids.tolist(), counts.tolist()):
+                tokens[doc_id].extend([token] * int(count))
+        return list(zip(self.days.tolist(), self.records, tokens))
+
+    def score(self, weighted_terms: dict, lo: int, hi: int, k1: float, b: float):
+        """BM25 scores of doc ids [lo, hi) for the weighted query terms."""
+        scores = np.zeros(hi - lo, dtype=np.float32)
+        total = len(self.records)
+        norms = k1 * (1 - b + b * self.lengths[lo:hi] / self.average_length)
+        for term, weight in weighted_terms.items():
+            entry = self.postings.get(term)
+            if entry is None:
+                continue
+            ids, counts = entry
+            start, end = np.searchsorted(ids, lo), np.searchsorted(ids, hi)
+            if start == end:
+                continue
+            idf = math.log(1 + (total - len(ids) + 0.5) / (len(ids) + 0.5))
+            local = ids[start:end] - lo
+            tf = counts[start:end]
+            scores[local] += weight * idf * tf * (k1 + 1) / (tf + norms[local])
+        return scores
+
+
+class NewsStore:
+    def __init__(self, data_dir: str = None, k1: float = 1.2, b: float = 0.75, snippet_chars: int = 400):
+        """
+        Local news corpus with a BM25 inverted index per symbol, searchable by relevance within a date range.
+        Articles are loaded from *.jsonl files; each symbol's index is built on its first search (and rebuilt after appends).
+        Args:
+            data_dir (str, optional): Directory of *.jsonl files with one article per line. Each record needs 'date'
+                (YYYY-MM-DD or ISO datetime), 'title', and 'symbol' or 'symbols'; 'snippet'/'body', 'source' and 'url' are optional.
+                Defaults to NEWS_DATA_DIR or src/data/news.
+            k1 (float, optional): BM25 term frequency saturation.
+            b (float, optional): BM25 document length normalization.
+            snippet_chars (int, optional): Article text kept per record for prompts (the full text is only indexed).
+        """
+        self.data_dir = data_dir or os.getenv("NEWS_DATA_DIR", DEFAULT_NEWS_DIR)
+        self.k1 = k1
+        self.b = b
+        self.snippet_chars = snippet_chars
+        # symbol -> list of (day, record, text) not indexed yet; symbol -> _Segment
+        self._pending = {}
+        self._segments = {}
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._listeners = []
+        self.articles = 0
+        self.searches = 0
+        self.load()
+
+    def load(self):
+        """(Re)loads every *.jsonl file in the data directory."""
+        with self._lock:
+            self._pending = {}
+            self._segments = {}
+            self.articles = 0
+            for path in sorted(glob.glob(os.path.join(self.data_dir, "*.jsonl"))):
+                with open(path, "r", encoding="utf-8") as f:
+                    for line_number, line in enumerate(f, start=1):
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            self._insert(json.loads(line))
+                        except (ValueError, KeyError, TypeError) as e:
+                            print(f"Skipping invalid news record {path}:{line_number}: {e}")
+
+    def _insert(self, article: dict):
+        symbols = article.get("symbols") or [article["symbol"]]
+        text = article.get("body") or article.get("snippet") or ""
+        record = {
+            "date": str(article["date"])[:10],
+            "title": article["title"],
+            "snippet": (article.get("snippet") or text)[:self.snippet_chars],
+            "source": article.get("source"),
+            "url": article.get("url"),
+        }
+        day = _day(record["date"])
+        for symbol in {symbol.upper() for symbol in symbols}:
+            self._pending.setdefault(symbol, []).append((day, record, text))
+        self.articles += 1
+        return symbols
+
+    def append(self, articles: list, persist: bool = True):
+        """
+        Adds new articles; the affected symbols are re-indexed on their next search.
+        Args:
+            articles (list): Article dicts (same shape as the data files).
+            persist (bool, optional): Also append them to the data directory so they survive restarts.
+        """
+        symbols = set()
+        with self._lock:
+            for article in articles:
+                symbols.update(symbol.upper() for symbol in self._insert(article))
+            if persist:
+                os.makedirs(self.data_dir, exist_ok=True)
+                with open(os.path.join(self.data_dir, APPENDED_FILE_NAME), "a", encoding="utf-8") as f:
+                    for article in articles:
+                        f.write(json.dumps(article, ensure_ascii=False) + "\n")
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(symbols)
+
+    def add_listener(self, listener):
+        """Registers a callable invoked with the set of symbols after each append (e.g. to invalidate derived answers)."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def _segment(self, symbol: str):
+        with self._lock:
+            if symbol not in self._pending:
+                return self._segments.get(symbol)
+        # Builds run outside the store lock, so searches of already indexed symbols are not held up by them
+        with self._build_lock:
+            with self._lock:
+                pending = self._pending.pop(symbol, None)
+                segment = self._segments.get(symbol)
+            if pending is None:
+                return segment
+            # Title words count twice: a headline match says more than a passing mention in the body
+            documents = [(day, record, tokenize(record["title"]) * 2 + tokenize(text)) for day, record, text in pending]
+            # Re-index with the new articles; appends are rare next to searches
+            segment = _Segment((segment.documents() if segment is not None else []) + documents)
+            with self._lock:
+                self._segments[symbol] = segment
+            return segment
+
+    def index(self, symbols: list = None):
+        """Builds the index of the given symbols (default: all) now instead of on their first search."""
+        with self._lock:
+            pending = list(self._pending)
+        for symbol in pending if symbols is None else [symbol.upper() for symbol in symbols]:
+            self._segment(symbol)
+
+    def search(self, symbol: str, query: str = "", since=None, until=None, lookback_days: int = None, move_dates: list = None,
+               k: int = 5, movement: bool = False, move_boost: float = 2.0, recency_weight: float = 0.5, half_life_days: float = 7.0):
+        """
+        Returns the k most relevant articles for a symbol, best first.
+        Args:
+            symbol (str): Ticker symbol.
+            query (str, optional): The user's question; its words are matched with BM25.
+            since, until (str or date, optional): Inclusive date range of articles considered.
+            lookback_days (int, optional): Without since, only the articles at most this many days older than the newest one
+                up to `until` (i.e. the latest news available) are considered.
+            move_dates (list, optional): Dates of significant price moves; articles from the day before to the day after
+                one score move_boost extra.
+            k (int, optional): Number of articles returned (articles with the same title count once).
+            movement (bool, optional): Also match generic market-moving terms (MOVEMENT_TERMS) at a lower weight.
+            recency_weight (float, optional): Bonus for the newest articles, halving every half_life_days.
+        """
+        segment = self._segment(symbol.upper())
+        with self._lock:
+            self.searches += 1
+        if segment is None or not len(segment) or k <= 0:
+            return []
+
+        lo = int(np.searchsorted(segment.days, _day(since), side="left")) if since else 0
+        hi = int(np.searchsorted(segment.days, _day(until), side="right")) if until else len(segment)
+        if not since and lookback_days and hi:
+            lo = int(np.searchsorted(segment.days, segment.days[hi - 1] - lookback_days, side="left"))
+        if lo >= hi:
+            return []
+
+        weighted_terms = {}
+        if movement:
+            weighted_terms.update((term, MOVEMENT_TERM_WEIGHT) for term in tokenize(" ".join(MOVEMENT_TERMS)))
+        weighted_terms.update((term, 1.0) for term in tokenize(query) if term != symbol.lower())
+        scores = segment.score(weighted_terms, lo, hi, self.k1, self.b)
+
+        days = segment.days[lo:hi]
+        if move_dates:
+            near_move = np.unique([_day(move_date) + offset for move_date in move_dates for offset in (-1, 0, 1)])
+            scores += move_boost * np.isin(days, near_move)
+        if recency_weight:
+            scores += recency_weight * np.exp2(-(int(days[-1]) - days) / half_life_days)
+
+        # Look past the top k only as far as needed to skip syndicated copies of the same headline
+        candidates = min(len(scores), k * 4)
+        order = np.argpartition(-scores, candidates - 1)[:candidates] if candidates < len(scores) else np.arange(len(scores))
+        order = order[np.argsort(-scores[order], kind="stable")]
+        results, seen_titles = [], set()
+        for index in order.tolist():
+            record = segment.records[lo + index]
+            title_key = record["title"].strip().lower()
+            if title_key in seen_titles:
+                continue
+            seen_titles.add(title_key)
+            results.append(record)
+            if len(results) == k:
+                break
+        return results
+
+    def stats(self):
+        """Returns article, indexed-symbol and search counts."""
+        with self._lock:
+            return {"articles": self.articles, "symbols": len(set(self._segments) | set(self._pending)),
+                    "indexed_symbols": len(self._segments), "searches": self.searches}
+
+
+def move_window(price_analysis: dict, lead_days: int = 1):
+    """(since, until, move_dates) for a movement question, from analyze_price_moves output (None if there is no history)."""
+    period = price_analysis.get("period")
+    if not period:
+        return None, None, []
+    since = date.fromordinal(_day(period["start"]) - lead_days)
+    return since, period["end"], [day["date"] for day in price_analysis.get("flagged_days", [])]
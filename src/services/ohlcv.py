@@ -0,0 +1,177 @@
+import json
+import struct
+from datetime import datetime, timezone
+
+import numpy as np
+
+from .market_calendar import MARKET_TIMEZONE
+
+FIELDS = ("open", "high", "low", "close", "adj_close", "volume")
+
+# Binary layout (to_bytes): header, then symbol/interval/meta JSON, zero padding to 8 bytes, then the columns as raw
+# little-endian arrays (int64 timestamps, float64 prices, int64 volume). adj_close is only stored when it differs from close.
+_HEADER = struct.Struct("<4sBBIHHI")  # magic, version, flags, rows, symbol bytes, interval bytes, meta bytes
+_MAGIC = b"OHLC"
+_VERSION = 2
+_HAS_ADJ_CLOSE = 1
+
+
+def market_dates(timestamps):
+    """Dates ('YYYY-MM-DD') of epoch-second timestamps in the exchange's time zone (market_calendar.MARKET_TIMEZONE)."""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    # UTC offsets only change on the hour (DST), so they are looked up once per distinct hour
+    hours, inverse = np.unique(timestamps // 3600, return_inverse=True)
+    offsets = np.array([MARKET_TIMEZONE.utcoffset(datetime.fromtimestamp(hour * 3600, timezone.utc)).total_seconds()
+                        for hour in hours.tolist()], dtype=np.int64)
+    local = timestamps + offsets[inverse.reshape(-1)] if hours.size else timestamps
+    return np.datetime_as_string(local.astype("datetime64[s]"), unit="D").tolist()
+
+
+def _volume_column(volume):
+    # Share counts: whole numbers, with missing values (NaN) as 0
+    volume = np.asarray(volume)
+    if volume.dtype == np.int64:
+        return volume
+    return np.rint(np.nan_to_num(volume.astype(float), nan=0.0, posinf=0.0, neginf=0.0)).astype(np.int64)
+
+
+class OHLCVFrame:
+    """
+    Columnar OHLCV series backed by NumPy arrays (oldest bar first).
+    Slicing returns views over the same buffers; dicts/strings are only built by the to_* helpers.
+    """
+    __slots__ = ("symbol", "interval", "timestamps", "open", "high", "low", "close", "adj_close", "volume", "meta")
+
+    def __init__(self, symbol: str, interval: str, timestamps, open_, high, low, close, volume, adj_close=None, meta: dict = None):
+        """
+        Args:
+            timestamps: Bar start times as epoch seconds (int64).
+            volume: Share volume, stored as int64 (missing values become 0).
+            adj_close (optional): Adjusted close; defaults to close when the source is already adjusted.
+            meta (dict, optional): Extra chart metadata, e.g. 'regularMarketPrice'.
+        """
+        self.symbol = symbol
+        self.interval = interval
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.open = np.asarray(open_, dtype=float)
+        self.high = np.asarray(high, dtype=float)
+        self.low = np.asarray(low, dtype=float)
+        self.close = np.asarray(close, dtype=float)
+        self.adj_close = self.close if adj_close is None else np.asarray(adj_close, dtype=float)
+        self.volume = _volume_column(volume)
+        self.meta = meta or {}
+
+    @classmethod
+    def from_dataframe(cls, symbol: str, interval: str, data):
+        """Wraps a yfinance history DataFrame without copying its columns where possible."""
+        adj_close = data["Adj Close"].to_numpy(dtype=float, copy=False) if "Adj Close" in data.columns else None
+        frame = cls(
+            symbol,
+            interval,
+            data.index.as_unit("s").asi8,
+            data["Open"].to_numpy(dtype=float, copy=False),
+            data["High"].to_numpy(dtype=float, copy=False),
+            data["Low"].to_numpy(dtype=float, copy=False),
+            data["Close"].to_numpy(dtype=float, copy=False),
+            data["Volume"].to_numpy(),
+            adj_close=adj_close,
+        )
+        if len(frame):
+            frame.meta["regularMarketPrice"] = frame.last_close()
+        return frame
+
+    def __len__(self):
+        return self.timestamps.shape[0]
+
+    def __getitem__(self, index):
+        """Slices every column at once (views, no copies)."""
+        if not isinstance(index, slice):
+            raise TypeError("OHLCVFrame only supports slicing")
+        return OHLCVFrame(
+            self.symbol, self.interval, self.timestamps[index], self.open[index], self.high[index], self.low[index],
+            self.close[index], self.volume[index], adj_close=self.adj_close[index], meta=self.meta,
+        )
+
+    def tail(self, n: int):
+        """Last n bars."""
+        return self[max(0, len(self) - n):]
+
+    def before(self, timestamp: float):
+        """Bars stamped before timestamp (epoch seconds), as a view."""
+        return self[:int(np.searchsorted(self.timestamps, timestamp))]
+
+    def last_close(self):
+        """Most recent non-NaN close, or None."""
+        finite = np.flatnonzero(np.isfinite(self.close))
+        return float(self.close[finite[-1]]) if finite.size else None
+
+    def dates(self):
+        """Bar dates as 'YYYY-MM-DD' strings, in the exchange's time zone (see market_dates)."""
+        return market_dates(self.timestamps)
+
+    def to_bytes(self):
+        """Compact binary encoding (about 48-56 bytes per bar), e.g. for a cache shared between worker processes."""
+        symbol = self.symbol.encode("utf-8")
+        interval = self.interval.encode("utf-8")
+        meta = json.dumps(self.meta, default=str).encode("utf-8") if self.meta else b""
+        has_adj_close = self.adj_close is not self.close and not np.array_equal(self.adj_close, self.close, equal_nan=True)
+        header = _HEADER.pack(_MAGIC, _VERSION, _HAS_ADJ_CLOSE if has_adj_close else 0, len(self), len(symbol), len(interval), len(meta))
+        head = header + symbol + interval + meta
+        columns = [self.open, self.high, self.low, self.close] + ([self.adj_close] if has_adj_close else [])
+        return b"".join([head, b"\0" * (-len(head) % 8), self.timestamps.astype("<i8").tobytes()]
+                        + [column.astype("<f8").tobytes() for column in columns] + [self.volume.astype("<i8").tobytes()])
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Decodes to_bytes output. The columns are read-only views over data (no copies)."""
+        magic, version, flags, rows, symbol_len, interval_len, meta_len = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("Not an encoded OHLCVFrame")
+        offset = _HEADER.size
+        symbol = bytes(data[offset:offset + symbol_len]).decode("utf-8")
+        offset += symbol_len
+        interval = bytes(data[offset:offset + interval_len]).decode("utf-8")
+        offset += interval_len
+        meta = json.loads(bytes(data[offset:offset + meta_len])) if meta_len else {}
+        offset += meta_len + (-(offset + meta_len) % 8)
+
+        def column(dtype):
+            nonlocal offset
+            values = np.frombuffer(data, dtype=dtype, count=rows, offset=offset)
+            offset += 8 * rows
+            return values
+
+        timestamps = column("<i8")
+        open_, high, low, close = column("<f8"), column("<f8"), column("<f8"), column("<f8")
+        adj_close = column("<f8") if flags & _HAS_ADJ_CLOSE else None
+        volume = column("<i8")
+        return cls(symbol, interval, timestamps, open_, high, low, close, volume, adj_close=adj_close, meta=meta)
+
+    def to_records(self):
+        """Compatibility view: list of per-bar dicts, as returned by get_stock_price_history."""
+        columns = [self.open.tolist(), self.high.tolist(), self.low.tolist(), self.close.tolist(), self.adj_close.tolist(), self.volume.tolist()]
+        return [
+            {"date": date, "open": o, "high": h, "low": l, "close": c, "adj_close": a, "volume": v}
+            for date, o, h, l, c, a, v in zip(self.dates(), *columns)
+        ]
+
+    def to_chart_response(self):
+        """Compatibility view shaped like the Yahoo Finance chart API response."""
+        return {
+            "chart": {
+                "result": [{
+                    "meta": dict(self.meta),
+                    "timestamp": self.timestamps.tolist(),
+                    "indicators": {
+                        "quote": [{
+                            "open": self.open.tolist(),
+                            "high": self.high.tolist(),
+                            "low": self.low.tolist(),
+                            "close": self.close.tolist(),
+                            "volume": self.volume.tolist()
+                        }],
+                        "adjclose": [{"adjclose": self.adj_close.tolist()}]
+                    }
+                }]
+            }
+        }
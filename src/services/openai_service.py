@@ -1,18 +1,105 @@
 import os
 import json
-from openai import OpenAI
+import time
+import asyncio
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from openai import OpenAI, AsyncOpenAI, APIStatusError, DefaultHttpxClient, DefaultAsyncHttpxClient
 from dotenv import load_dotenv
 
+from .response_cache import ResponseCache
+from .shared_cache import default_shared_cache
+from .price_analytics import analyze_price_moves, compare_price_moves
+from .single_flight import SingleFlight, AsyncSingleFlight
+from .metrics import REGISTRY, timed, observe_stage, record_error
+from .prompt_builder import PromptBuilder, compact_mapping, dedupe, count_tokens
+from .rate_limiter import RateLimiter, PRIORITIES, backoff_delay
+
 # Load environment variables from .env file
 load_dotenv()
 
+# System prompts contain no request-specific data, so every request of a kind shares the same prefix
+# (lets provider-side prompt caching apply). Data tables follow in the user prompt.
+DATA_FORMAT_NOTE = """
+The data is given as compact tables: each table starts with a header line, values are comma-separated,
+multiple flags are separated by '|', and *_pct values are percentages.
+"""
+
+MOVEMENT_SYSTEM_PROMPT = """
+You are an AI Investment Research Assistant. Your task is to analyze the provided data for a stock
+and explain its price movements over the period covered by the price summary.
+""" + DATA_FORMAT_NOTE + """
+Provide a concise analysis of the key reasons for the stock's price movements.
+Identify any significant price changes and correlate them with specific announcements, news, or market events if possible.
+Present the analysis in a clear, narrative format.
+"""
+
+ANNOUNCEMENT_SYSTEM_PROMPT = """
+You are an AI Investment Research Assistant. Your task is to summarize the latest announcements and relevant news for a stock.
+""" + DATA_FORMAT_NOTE + """
+Provide a concise summary of the most important and recent items. Focus on information relevant to an investment professional.
+Present the summary in a clear, narrative format.
+"""
+
+async def _aiter_once(text):
+    yield text
+
+def connection_pool_settings():
+    """
+    HTTP connection pool shared by all requests of a client (OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE,
+    OPENAI_KEEPALIVE_EXPIRY, OPENAI_TIMEOUT). Kept-alive connections skip the TCP/TLS handshake on every call.
+    """
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "200")),
+        max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE", "50")),
+        keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30")),
+    )
+    timeout = httpx.Timeout(float(os.getenv("OPENAI_TIMEOUT", "60")), connect=5.0)
+    return limits, timeout
+
+# Failed calls return user-facing messages instead of raising; these prefixes tell them apart from answers
+ERROR_RESPONSE_PREFIXES = ("OpenAI client not initialized", "Error communicating with OpenAI", "Could not ")
+
+# Expected completion size per kind of call, reserved in the tokens-per-minute bucket until the real usage is known
+EXPECTED_COMPLETION_TOKENS = {"parse": 60, "default": 400, "announcement_summary": 500, "movement_analysis": 600, "comparison": 700}
+
+def _retry_after(error):
+    """Seconds from the Retry-After(-ms) header of an API error response, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+def _is_retryable(error):
+    return isinstance(error, APIStatusError) and (error.status_code == 429 or error.status_code >= 500)
+
+COMPARISON_SYSTEM_PROMPT = """
+You are an AI Investment Research Assistant. Your task is to compare the price movements of several stocks
+over the period covered by the data.
+""" + DATA_FORMAT_NOTE + """
+relative_return_pct is the return relative to the equal-weighted average of the compared stocks.
+Provide a concise comparison: which stocks led or lagged and by how much, how closely they moved together,
+and the likely reasons for the differences (using the announcements where relevant).
+Only compare the symbols in the Performance table; for any listed under "No price data", say that their prices
+were unavailable instead of comparing them.
+Present the comparison in a clear, narrative format.
+"""
+
 class OpenAIService:
-    def __init__(self, api_key=None, model_name="gpt-4.1-nano"):
+    def __init__(self, api_key=None, model_name="gpt-4.1-nano", cache=None, base_url=None):
         """
         Initializes the OpenAI Service.
         Args:
             api_key (str, optional): OpenAI API key. If None, attempts to use OPENAI_API_KEY environment variable.
             model_name (str, optional): The OpenAI model to use (e.g. "gpt-4").
+            cache (ResponseCache, optional): Response cache. If None, one is built from OPENAI_CACHE_SIZE, in front of
+                the shared cache (SHARED_CACHE_URL), or of an SQLite file at OPENAI_CACHE_PATH if that is set.
+            base_url (str, optional): OpenAI-compatible API endpoint. If None, the SDK default (or OPENAI_BASE_URL) is used.
         """
         effective_api_key = api_key if api_key else os.getenv("OPENAI_API_KEY")
         
@@ -20,133 +107,563 @@ class OpenAIService:
             print("Warning: OPENAI_API_KEY not found in environment or passed directly. "
                   "OpenAI functionality will be limited or fail.")
             self.client = None
+            self.async_client = None
         else:
             try:
-                self.client = OpenAI(api_key=effective_api_key)
+                limits, timeout = connection_pool_settings()
+                # Retries are done here (rate limiter aware), not by the SDK
+                self.client = OpenAI(api_key=effective_api_key, base_url=base_url, max_retries=0,
+                                     http_client=DefaultHttpxClient(limits=limits, timeout=timeout))
+                # Used by the a* methods (async serving mode, see asgi.py); its pool belongs to the serving event loop
+                self.async_client = AsyncOpenAI(api_key=effective_api_key, base_url=base_url, max_retries=0,
+                                                http_client=DefaultAsyncHttpxClient(limits=limits, timeout=timeout))
             except Exception as e:
                 print(f"Error initializing OpenAI client: {e}")
                 self.client = None
+                self.async_client = None
         
         self.model_name = model_name
+        cache_path = os.getenv("OPENAI_CACHE_PATH")
+        self.cache = cache if cache is not None else ResponseCache(
+            max_entries=int(os.getenv("OPENAI_CACHE_SIZE", "512")),
+            db_path=cache_path,
+            shared=None if cache_path else default_shared_cache(),
+        )
+        # Concurrent identical (non-streaming) completions share one API call (see flight.stats())
+        self.flight = SingleFlight()
+        self.async_flight = AsyncSingleFlight()
+        self.prompt_builder = PromptBuilder(token_budget=int(os.getenv("PROMPT_TOKEN_BUDGET", "3000")),
+                                            measure_savings=os.getenv("PROMPT_SAVINGS_METRICS", "off") == "on")
+        # Client-side quota (OPENAI_RPM / OPENAI_TPM, 0 is unlimited) and retries of 429/5xx responses
+        requests_per_minute = float(os.getenv("OPENAI_RPM", "500"))
+        tokens_per_minute = float(os.getenv("OPENAI_TPM", "200000"))
+        self.rate_limiter = RateLimiter(
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+            max_wait=float(os.getenv("OPENAI_QUEUE_TIMEOUT", "30")),
+        ) if requests_per_minute > 0 or tokens_per_minute > 0 else None
+        self.max_retries = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
 
-    def _get_openai_response(self, system_prompt: str, user_prompt: str, is_json_response: bool = False):
+    def warm_up(self, connections: int = 4):
+        """
+        Opens up to `connections` pooled connections to the API ahead of the first request, so it skips the
+        TCP/TLS handshakes (one cheap models.list call per connection, run concurrently). Returns the calls that succeeded.
+        """
+        if not self.client or connections <= 0:
+            return 0
+
+        def ping(_):
+            try:
+                self.client.models.list()
+                return 1
+            except Exception as e:
+                print(f"OpenAI warm-up call failed: {e}")
+                return 0
+
+        with ThreadPoolExecutor(max_workers=connections, thread_name_prefix="openai-warm-up") as pool:
+            return sum(pool.map(ping, range(connections)))
+
+    async def awarm_up(self, connections: int = 4):
+        """Async variant of warm_up, for the async client's pool (call it on the serving event loop)."""
+        if not self.async_client or connections <= 0:
+            return 0
+        results = await asyncio.gather(*(self.async_client.models.list() for _ in range(connections)), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"OpenAI warm-up call failed: {result}")
+        return sum(1 for result in results if not isinstance(result, Exception))
+
+    @staticmethod
+    def is_error_response(text):
+        """True if a text returned by this service is an error message rather than an answer."""
+        return not text or text.startswith(ERROR_RESPONSE_PREFIXES)
+
+    def _completion_request(self, system_prompt: str, user_prompt: str, is_json_response: bool, history: list = None):
+        """
+        Returns (completion_params, cache_key) for a chat completion.
+        Messages go from most to least shared: the system prompt (same for every request of a kind), the session's
+        earlier turns (append-only), then this request's data, so consecutive requests share the longest possible
+        prefix for provider-side prompt caching.
+        """
+        messages = [{"role": "system", "content": system_prompt}] + list(history or []) + [
+            {"role": "user", "content": user_prompt}
+        ]
+        
+        completion_params = {
+            "model": self.model_name,
+            "messages": messages,
+        }
+
+        # Enable JSON mode or Structured Output mode
+        if is_json_response:
+            completion_params["response_format"] = {"type": "json_object"}
+
+        cache_key = self.cache.make_key(self.model_name, system_prompt, user_prompt, completion_params.get("response_format"), history)
+        return completion_params, cache_key
+
+    @staticmethod
+    def _completion_content(response, is_json_response: bool):
+        """Extracts (and for JSON responses, parses) the completion content. Returns (content, cacheable)."""
+        content = response.choices[0].message.content
+        if is_json_response:
+            # If json_object mode was successful, OpenAI outputs valid JSON.
+            # If not, parse manually and handle errors.
+            try:
+                return json.loads(content), True
+            except json.JSONDecodeError as e:
+                record_error("openai.json")
+                print(f"Error decoding JSON from OpenAI response: {e}. Response content: {content}")
+                return None, False # Or a default error JSON structure
+        return content, bool(content)
+
+    def _completion_result(self, response, is_json_response: bool, cache_key: str, cache_kind: str):
+        """Extracts the completion content and caches it."""
+        content, cacheable = self._completion_content(response, is_json_response)
+        if cacheable:
+            self.cache.set(cache_key, content, kind=cache_kind)
+        return content
+
+    async def _acompletion_result(self, response, is_json_response: bool, cache_key: str, cache_kind: str):
+        """Async variant of _completion_result."""
+        content, cacheable = self._completion_content(response, is_json_response)
+        if cacheable:
+            await self.cache.aset(cache_key, content, kind=cache_kind)
+        return content
+
+    def _get_openai_response(self, system_prompt: str, user_prompt: str, is_json_response: bool = False, cache_kind: str = "default", stream: bool = False,
+                             history: list = None):
         """
         Helper function to get a response from the OpenAI Chat Completions API.
+        Successful responses are cached; cache_kind selects the TTL (see response_cache.DEFAULT_TTLS).
+        With stream=True (text responses only), returns an iterator of content chunks as they arrive.
+        history (list of chat messages, optional) places the conversation so far before the user prompt.
         """
         if not self.client:
             error_msg = "OpenAI client not initialized. Cannot make API call."
             print(error_msg)
             if is_json_response:
                 return None
-            return error_msg
+            return iter([error_msg]) if stream else error_msg
 
         try:
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
-            
-            completion_params = {
-                "model": self.model_name,
-                "messages": messages,
-            }
-
-            # Enable JSON mode or Structured Output mode
+            completion_params, cache_key = self._completion_request(system_prompt, user_prompt, is_json_response, history)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return iter([cached]) if stream else cached
+
+            if stream:
+                return self._stream_openai_response(completion_params, cache_key, cache_kind)
+
+            # Coalesced within this process (flight) and across worker processes (the shared cache's single writer)
+            return self.flight.do(cache_key, lambda: self.cache.single_writer(cache_key, lambda: self._completion_result(
+                self._create_completion(completion_params, cache_kind), is_json_response, cache_key, cache_kind)))
+        except Exception as e:
+            record_error("openai")
+            print(f"Error getting response from OpenAI: {e}")
             if is_json_response:
-                completion_params["response_format"] = {"type": "json_object"}
+                return None 
+            error_msg = f"Error communicating with OpenAI: {e}"
+            return iter([error_msg]) if stream else error_msg
 
-            response = self.client.chat.completions.create(**completion_params)
-            
-            content = response.choices[0].message.content
+    async def _aget_openai_response(self, system_prompt: str, user_prompt: str, is_json_response: bool = False, cache_kind: str = "default", stream: bool = False,
+                                    history: list = None):
+        """
+        Async variant of _get_openai_response on the pooled AsyncOpenAI client.
+        With stream=True, returns an async iterator of content chunks.
+        """
+        if not self.async_client:
+            error_msg = "OpenAI client not initialized. Cannot make API call."
+            print(error_msg)
             if is_json_response:
-                # If json_object mode was successful, OpenAI outputs valid JSON.
-                # If not, parse manually and handle errors.
-                try:
-                    return json.loads(content)
-                except json.JSONDecodeError as e:
-                    print(f"Error decoding JSON from OpenAI response: {e}. Response content: {content}")
-                    return None # Or a default error JSON structure
-            return content
+                return None
+            return _aiter_once(error_msg) if stream else error_msg
+
+        try:
+            completion_params, cache_key = self._completion_request(system_prompt, user_prompt, is_json_response, history)
+            cached = await self.cache.aget(cache_key)
+            if cached is not None:
+                return _aiter_once(cached) if stream else cached
+
+            if stream:
+                return self._astream_openai_response(completion_params, cache_key, cache_kind)
+
+            async def complete():
+                response = await self._acreate_completion(completion_params, cache_kind)
+                return await self._acompletion_result(response, is_json_response, cache_key, cache_kind)
+
+            return await self.async_flight.do(cache_key, lambda: self.cache.asingle_writer(cache_key, complete))
         except Exception as e:
+            record_error("openai")
             print(f"Error getting response from OpenAI: {e}")
             if is_json_response:
                 return None 
-            return f"Error communicating with OpenAI: {e}"
+            error_msg = f"Error communicating with OpenAI: {e}"
+            return _aiter_once(error_msg) if stream else error_msg
 
-    # Guardrail to identify only relevant intent
-    def parse_query(self, query: str):
-        """Uses OpenAI to parse the user's query to extract intent and entities."""
+    @staticmethod
+    def _record_usage(usage, cache_kind: str):
+        """Adds the completion's token usage to the openai_tokens_total counter."""
+        if usage is None:
+            return
+        help_text = "OpenAI tokens used, by type and kind of call."
+        REGISTRY.inc("openai_tokens_total", usage.prompt_tokens or 0, {"type": "prompt", "kind": cache_kind}, help=help_text)
+        REGISTRY.inc("openai_tokens_total", usage.completion_tokens or 0, {"type": "completion", "kind": cache_kind}, help=help_text)
+        details = getattr(usage, "prompt_tokens_details", None)
+        if details is not None and getattr(details, "cached_tokens", None):
+            REGISTRY.inc("openai_tokens_total", details.cached_tokens, {"type": "cached_prompt", "kind": cache_kind}, help=help_text)
+
+    @staticmethod
+    def _estimate_tokens(completion_params: dict, cache_kind: str):
+        prompt_tokens = sum(count_tokens(message["content"]) for message in completion_params["messages"])
+        return prompt_tokens + EXPECTED_COMPLETION_TOKENS.get(cache_kind, EXPECTED_COMPLETION_TOKENS["default"])
+
+    def _settle_usage(self, usage, estimated_tokens: int, cache_kind: str):
+        """Records the token usage and returns the unused part of the estimate to the rate limiter."""
+        self._record_usage(usage, cache_kind)
+        if self.rate_limiter is not None and usage is not None:
+            self.rate_limiter.settle(estimated_tokens, usage.total_tokens or estimated_tokens)
+
+    @staticmethod
+    def _record_queue_wait(waited: float, cache_kind: str):
+        observe_stage("openai.queue", waited)
+        REGISTRY.observe("openai_queue_wait_seconds", waited, {"kind": cache_kind},
+                         help="Time OpenAI calls waited for rate limit capacity.")
+
+    def _retry_wait(self, error, attempt: int, cache_kind: str):
+        """Returns the backoff before retrying a 429/5xx error (and slows the limiter down on 429)."""
+        retry_after = _retry_after(error)
+        if error.status_code == 429 and self.rate_limiter is not None:
+            self.rate_limiter.throttle(retry_after)
+        REGISTRY.inc("openai_retries_total", 1, {"status": error.status_code, "kind": cache_kind},
+                     help="OpenAI calls retried after a 429 or 5xx response.")
+        delay = backoff_delay(attempt, retry_after=retry_after)
+        print(f"OpenAI returned {error.status_code}, retrying in {delay:.1f}s (attempt {attempt + 1} of {self.max_retries})")
+        return delay
+
+    def _send(self, create, completion_params: dict, cache_kind: str):
+        """
+        Sends a completion request through the rate limiter (in priority order) with bounded retries.
+        Returns (response, estimated_tokens).
+        """
+        estimated = self._estimate_tokens(completion_params, cache_kind)
+        priority = PRIORITIES.get(cache_kind, PRIORITIES["default"])
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self._record_queue_wait(self.rate_limiter.acquire(estimated, priority), cache_kind)
+            try:
+                return create(), estimated
+            except Exception as e:
+                if not _is_retryable(e) or attempt == self.max_retries:
+                    raise
+                time.sleep(self._retry_wait(e, attempt, cache_kind))
+
+    async def _asend(self, create, completion_params: dict, cache_kind: str):
+        """Async variant of _send; create returns an awaitable."""
+        estimated = self._estimate_tokens(completion_params, cache_kind)
+        priority = PRIORITIES.get(cache_kind, PRIORITIES["default"])
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self._record_queue_wait(await self.rate_limiter.aacquire(estimated, priority), cache_kind)
+            try:
+                return await create(), estimated
+            except Exception as e:
+                if not _is_retryable(e) or attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._retry_wait(e, attempt, cache_kind))
+
+    def _create_completion(self, completion_params: dict, cache_kind: str):
+        def create():
+            with timed("openai.completion"):
+                return self.client.chat.completions.create(**completion_params)
+
+        response, estimated = self._send(create, completion_params, cache_kind)
+        self._settle_usage(getattr(response, "usage", None), estimated, cache_kind)
+        return response
+
+    def _stream_openai_response(self, completion_params: dict, cache_key: str, cache_kind: str):
+        """Yields completion content chunks as they arrive; the full text is cached once complete."""
+        parts = []
+        started = time.perf_counter()
+        try:
+            response, estimated = self._send(
+                lambda: self.client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **completion_params),
+                completion_params, cache_kind)
+            for chunk in response:
+                if getattr(chunk, "usage", None):
+                    self._settle_usage(chunk.usage, estimated, cache_kind)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if not parts:
+                        observe_stage("openai.first_token", time.perf_counter() - started)
+                    parts.append(delta)
+                    yield delta
+        except Exception as e:
+            record_error("openai")
+            print(f"Error streaming response from OpenAI: {e}")
+            yield f"Error communicating with OpenAI: {e}"
+            return
+        observe_stage("openai.completion", time.perf_counter() - started)
+        if parts:
+            self.cache.set(cache_key, "".join(parts), kind=cache_kind)
+
+    async def _acreate_completion(self, completion_params: dict, cache_kind: str):
+        async def create():
+            with timed("openai.completion"):
+                return await self.async_client.chat.completions.create(**completion_params)
+
+        response, estimated = await self._asend(create, completion_params, cache_kind)
+        self._settle_usage(getattr(response, "usage", None), estimated, cache_kind)
+        return response
+
+    async def _astream_openai_response(self, completion_params: dict, cache_key: str, cache_kind: str):
+        """Async variant of _stream_openai_response."""
+        parts = []
+        started = time.perf_counter()
+        try:
+            response, estimated = await self._asend(
+                lambda: self.async_client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **completion_params),
+                completion_params, cache_kind)
+            async for chunk in response:
+                if getattr(chunk, "usage", None):
+                    self._settle_usage(chunk.usage, estimated, cache_kind)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if not parts:
+                        observe_stage("openai.first_token", time.perf_counter() - started)
+                    parts.append(delta)
+                    yield delta
+        except Exception as e:
+            record_error("openai")
+            print(f"Error streaming response from OpenAI: {e}")
+            yield f"Error communicating with OpenAI: {e}"
+            return
+        observe_stage("openai.completion", time.perf_counter() - started)
+        if parts:
+            await self.cache.aset(cache_key, "".join(parts), kind=cache_kind)
+
+    @staticmethod
+    def _parse_prompts(query: str, context: dict = None):
+        """Returns (system_prompt, user_prompt) for parse_query."""
         system_prompt = """
             You are an AI assistant helping to parse user queries for a financial research tool.
             Identify the company name (or symbol if provided) and the user's intent.
-            The intent should be one of: 'get_stock_price', 'get_latest_announcements', 'get_stock_movement_reasons'.
+            The intent should be one of: 'get_stock_price', 'get_latest_announcements', 'get_stock_movement_reasons', 'compare_stocks'.
+            Use 'compare_stocks' when the user asks about two or more companies together (e.g. comparing their prices or moves).
             If a company name is identified, also provide its common stock ticker symbol if known (e.g., Apple Inc. -> AAPL, Microsoft -> MSFT, Tesla -> TSLA, Meta -> META, Google -> GOOGL or GOOG).
             If a ticker symbol is directly provided, use that as the symbol.
-            Return the response strictly as a JSON object with keys 'company_name', 'symbol', and 'intent'.
+            If the query refers to the company of an earlier question (e.g. "it", "they", "the stock"), use the conversation context.
+            Return the response strictly as a JSON object with keys 'company_name', 'symbol', 'symbols', and 'intent'.
+            'symbols' lists the ticker symbols of every company mentioned; 'symbol' is the first of them.
             If a company name cannot be reliably identified, return null for company_name and symbol.
             If the intent cannot be reliably identified, return null for intent.
             Your output MUST be a valid JSON object.
             """
         user_prompt = f"User Query: \"{query}\""
-        
-        parsed_response = self._get_openai_response(system_prompt, user_prompt, is_json_response=True)
-        
+        if context and context.get("symbol"):
+            symbols = ", ".join(context.get("symbols") or [context["symbol"]])
+            user_prompt = f"Conversation context: the previous question was about {context.get('company_name') or symbols} ({symbols}).\n" + user_prompt
+        return system_prompt, user_prompt
+
+    @staticmethod
+    def _parsed_or_empty(parsed_response, query: str):
         if parsed_response and isinstance(parsed_response, dict):
             return parsed_response
         else:
             print(f"Failed to get valid JSON parsed response for query: {query}")
             return {"company_name": None, "symbol": None, "intent": None}
 
+    # Guardrail to identify only relevant intent
+    def parse_query(self, query: str, context: dict = None):
+        """
+        Uses OpenAI to parse the user's query to extract intent and entities.
+        context (dict, optional): The previous query of the conversation ('company_name', 'symbol', 'symbols'), for follow-ups.
+        """
+        system_prompt, user_prompt = self._parse_prompts(query, context)
+        parsed_response = self._get_openai_response(system_prompt, user_prompt, is_json_response=True, cache_kind="parse")
+        return self._parsed_or_empty(parsed_response, query)
+
+    async def aparse_query(self, query: str, context: dict = None):
+        """Async variant of parse_query."""
+        system_prompt, user_prompt = self._parse_prompts(query, context)
+        parsed_response = await self._aget_openai_response(system_prompt, user_prompt, is_json_response=True, cache_kind="parse")
+        return self._parsed_or_empty(parsed_response, query)
+
+    def _announcement_sections(self, announcements: dict, news_articles: list):
+        """Deduplicated, truncated announcement/news tables (trimmed first when over budget)."""
+        return [
+            self.prompt_builder.section("Significant developments",
+                                        dedupe(announcements.get('significant_developments', []), ("headline",)),
+                                        ["date", "headline", "summary"], min_items=1, trim_priority=1),
+            self.prompt_builder.section("SEC filings", dedupe(announcements.get('sec_filings', []), ("type", "title")),
+                                        ["date", "type", "title", "description"], trim_priority=2),
+            self.prompt_builder.section("News", dedupe(news_articles, ("title",)), ["date", "title", "snippet"], trim_priority=3),
+        ]
+
+    def _record_prompt_stats(self, stats: dict, cache_kind: str):
+        """Reports prompt size and tokens saved by the compact encoding."""
+        REGISTRY.observe("prompt_tokens", stats["prompt_tokens"], {"kind": cache_kind},
+                         help="Estimated prompt tokens per request (local tokenizer).")
+        if stats["tokens_saved"] is not None:
+            REGISTRY.inc("prompt_tokens_saved_total", stats["tokens_saved"], {"kind": cache_kind},
+                         help="Prompt tokens saved by compact encoding vs. pretty-printed JSON.")
+        if stats["rows_trimmed"]:
+            REGISTRY.inc("prompt_rows_trimmed_total", stats["rows_trimmed"], {"kind": cache_kind},
+                         help="Table rows dropped to fit the prompt token budget.")
+
+    def _movement_prompt(self, symbol: str, price_history, announcements: dict, news_articles: list):
+        """
+        Builds the movement analysis user prompt.
+        The price history (OHLCVFrame or list of dicts) is reduced to summary statistics and flagged days before prompting.
+        """
+        build_started = time.perf_counter()
+        with timed("price_analytics"):
+            price_analysis = analyze_price_moves(price_history)
+        period = price_analysis["period"] or {}
+
+        header_lines = [
+            f"Symbol: {symbol}",
+            f"Period: {period.get('start')} to {period.get('end')} ({period.get('trading_days', 0)} trading days)",
+            f"Price summary: {compact_mapping(price_analysis['summary'])}",
+        ]
+        sections = [
+            self.prompt_builder.section("Days with significant moves", price_analysis['flagged_days'],
+                                        ["date", "close", "return_pct", "gap_pct", "volume_z", "flags"], min_items=1),
+        ] + self._announcement_sections(announcements, news_articles)
+        user_prompt, stats = self.prompt_builder.build(MOVEMENT_SYSTEM_PROMPT, header_lines, sections, legacy_payload={
+            "summary": price_analysis['summary'], "flagged_days": price_analysis['flagged_days'],
+            "significant_developments": announcements.get('significant_developments', []),
+            "sec_filings": announcements.get('sec_filings', []), "news": news_articles,
+        })
+        self._record_prompt_stats(stats, "movement_analysis")
+        observe_stage("prompt_build", time.perf_counter() - build_started)
+        return user_prompt
+
+    def _announcement_prompt(self, symbol: str, announcements: dict, news_articles: list):
+        """Builds the announcement summary user prompt."""
+        build_started = time.perf_counter()
+        user_prompt, stats = self.prompt_builder.build(
+            ANNOUNCEMENT_SYSTEM_PROMPT, [f"Symbol: {symbol}"], self._announcement_sections(announcements, news_articles),
+            legacy_payload={
+                "significant_developments": announcements.get('significant_developments', []),
+                "sec_filings": announcements.get('sec_filings', []), "news": news_articles,
+            },
+        )
+        self._record_prompt_stats(stats, "announcement_summary")
+        observe_stage("prompt_build", time.perf_counter() - build_started)
+        return user_prompt
+
+    def _comparison_prompt(self, price_histories: dict, announcements: dict):
+        """
+        Builds the comparison user prompt: cross-sectional statistics over the common trading days,
+        plus the latest significant developments of each symbol in one table.
+        """
+        build_started = time.perf_counter()
+        with timed("price_analytics"):
+            comparison = compare_price_moves(price_histories)
+        period = comparison["period"] or {}
+
+        developments = sorted((
+            dict(item, symbol=symbol)
+            for symbol, symbol_announcements in announcements.items()
+            for item in dedupe(symbol_announcements.get('significant_developments', []), ("headline",))
+        ), key=lambda item: item.get("date") or "", reverse=True)
+        # Symbols without a usable history (failed fetch, unknown ticker) are named, but not offered as compared
+        analysed_symbols = {row["symbol"] for row in comparison["symbols"]}
+        analysed = [symbol for symbol in price_histories if symbol in analysed_symbols]
+        missing = [symbol for symbol in price_histories if symbol not in analysed_symbols]
+        header_lines = [
+            f"Symbols: {', '.join(analysed) if analysed else 'none'}",
+            f"Period: {period.get('start')} to {period.get('end')} ({period.get('trading_days', 0)} common trading days)",
+        ]
+        if missing:
+            header_lines.append(f"No price data: {', '.join(missing)}")
+        sections = [
+            self.prompt_builder.section("Performance", comparison["symbols"],
+                                        ["symbol", "start_close", "end_close", "total_return_pct", "relative_return_pct",
+                                         "volatility_pct", "max_drawdown_pct", "best_day", "best_day_pct", "worst_day", "worst_day_pct"],
+                                        min_items=len(comparison["symbols"])),
+            self.prompt_builder.section("Daily return correlations", comparison["correlations"], ["pair", "correlation"],
+                                        min_items=1, trim_priority=1),
+            self.prompt_builder.section("Days the stocks diverged most", comparison["divergent_days"],
+                                        ["date", "spread_pct", "leader", "leader_return_pct", "laggard", "laggard_return_pct"],
+                                        trim_priority=1),
+            self.prompt_builder.section("Significant developments", developments, ["symbol", "date", "headline", "summary"],
+                                        trim_priority=2),
+        ]
+        user_prompt, stats = self.prompt_builder.build(COMPARISON_SYSTEM_PROMPT, header_lines, sections, legacy_payload={
+            "comparison": comparison, "significant_developments": developments,
+        })
+        self._record_prompt_stats(stats, "comparison")
+        observe_stage("prompt_build", time.perf_counter() - build_started)
+        return user_prompt
+
+    def compare_stocks(self, price_histories: dict, announcements: dict, stream: bool = False, history: list = None):
+        """
+        Compares several stocks' price movements in a single OpenAI call.
+        Args:
+            price_histories (dict): symbol -> OHLCVFrame.
+            announcements (dict): symbol -> announcements as returned by YahooFinanceService.get_latest_announcements.
+            stream (bool, optional): Return an iterator of text chunks instead of the full comparison.
+            history (list, optional): The session's earlier turns as chat messages.
+        """
+        user_prompt = self._comparison_prompt(price_histories, announcements)
+        if stream:
+            return self._get_openai_response(COMPARISON_SYSTEM_PROMPT, user_prompt, cache_kind="comparison", stream=True, history=history)
+        comparison = self._get_openai_response(COMPARISON_SYSTEM_PROMPT, user_prompt, cache_kind="comparison", history=history)
+        return comparison if comparison else "Could not compare the stocks due to an error with OpenAI."
+
+    async def acompare_stocks(self, price_histories: dict, announcements: dict, stream: bool = False, history: list = None):
+        """Async variant of compare_stocks (with stream=True, returns an async iterator)."""
+        user_prompt = self._comparison_prompt(price_histories, announcements)
+        if stream:
+            return await self._aget_openai_response(COMPARISON_SYSTEM_PROMPT, user_prompt, cache_kind="comparison", stream=True, history=history)
+        comparison = await self._aget_openai_response(COMPARISON_SYSTEM_PROMPT, user_prompt, cache_kind="comparison", history=history)
+        return comparison if comparison else "Could not compare the stocks due to an error with OpenAI."
+
     # Integrate with Yahoo Finance to get price_history
-    def analyze_stock_movement_reasons(self, symbol: str, price_history: list, announcements: dict, news_articles: list):
-        """Analyzes provided data to suggest reasons for stock price movements using OpenAI."""
-        system_prompt = f"""
-            You are an AI Investment Research Assistant. Your task is to analyze the provided data for {symbol} 
-            and explain its stock price movements over the recent period covered by the price history (typically the last 2 weeks).
-            """
-        user_prompt = f"""
-            Analyze the following data for {symbol}:
-            Price History (Date, Open, High, Low, Close, Adjusted Close, Volume):
-            {json.dumps(price_history, indent=2)}
-
-            Recent Announcements (Significant Developments & SEC Filings):
-            Significant Developments: {json.dumps(announcements.get('significant_developments', []), indent=2)}
-            SEC Filings: {json.dumps(announcements.get('sec_filings', []), indent=2)}
-
-            Recent News Articles (Headlines and Snippets):
-            {json.dumps(news_articles, indent=2)}
-
-            Based on this information, provide a concise analysis of the key reasons for {symbol}'s stock price movements. 
-            Identify any significant price changes and correlate them with specific announcements, news, or market events if possible.
-            Focus on the last 2 weeks as reflected in the price history.
-            Present the analysis in a clear, narrative format.
-            """
+    def analyze_stock_movement_reasons(self, symbol: str, price_history, announcements: dict, news_articles: list, stream: bool = False, history: list = None):
+        """
+        Analyzes provided data to suggest reasons for stock price movements using OpenAI.
+        With stream=True, returns an iterator of text chunks instead of the full analysis.
+        history (list of chat messages, optional) is the session's conversation so far.
+        """
+        user_prompt = self._movement_prompt(symbol, price_history, announcements, news_articles)
+        if stream:
+            return self._get_openai_response(MOVEMENT_SYSTEM_PROMPT, user_prompt, cache_kind="movement_analysis", stream=True, history=history)
+        analysis = self._get_openai_response(MOVEMENT_SYSTEM_PROMPT, user_prompt, cache_kind="movement_analysis", history=history)
+        return analysis if analysis else "Could not analyze stock movement reasons due to an error with OpenAI."
 
-        analysis = self._get_openai_response(system_prompt, user_prompt)
+    async def aanalyze_stock_movement_reasons(self, symbol: str, price_history, announcements: dict, news_articles: list, stream: bool = False, history: list = None):
+        """Async variant of analyze_stock_movement_reasons (with stream=True, returns an async iterator)."""
+        user_prompt = self._movement_prompt(symbol, price_history, announcements, news_articles)
+        if stream:
+            return await self._aget_openai_response(MOVEMENT_SYSTEM_PROMPT, user_prompt, cache_kind="movement_analysis", stream=True, history=history)
+        analysis = await self._aget_openai_response(MOVEMENT_SYSTEM_PROMPT, user_prompt, cache_kind="movement_analysis", history=history)
         return analysis if analysis else "Could not analyze stock movement reasons due to an error with OpenAI."
 
     # Currently hardcoded for the MVP
-    def generate_announcement_summary(self, symbol: str, announcements: dict, news_articles: list):
-        """Generates a summary of latest announcements and news using OpenAI."""
-        system_prompt = f"""
-        You are an AI Investment Research Assistant. Your task is to summarize the latest announcements and relevant news for {symbol}.
+    def generate_announcement_summary(self, symbol: str, announcements: dict, news_articles: list, stream: bool = False, history: list = None):
         """
-        
-        user_prompt = f"""
-        Summarize the latest announcements and relevant news for {symbol}.
-        
-        Announcements Data:
-        Significant Developments: {json.dumps(announcements.get('significant_developments', []), indent=2)}
-        SEC Filings: {json.dumps(announcements.get('sec_filings', []), indent=2)}
-
-        Recent News Articles (Headlines and Snippets):
-        {json.dumps(news_articles, indent=2)}
-
-        Provide a concise summary of the most important and recent items. Focus on information relevant to an investment professional.
-        Present the summary in a clear, narrative format.
+        Generates a summary of latest announcements and news using OpenAI.
+        With stream=True, returns an iterator of text chunks instead of the full summary.
+        history (list of chat messages, optional) is the session's conversation so far.
         """
-        
-        summary = self._get_openai_response(system_prompt, user_prompt)
+        user_prompt = self._announcement_prompt(symbol, announcements, news_articles)
+        if stream:
+            return self._get_openai_response(ANNOUNCEMENT_SYSTEM_PROMPT, user_prompt, cache_kind="announcement_summary", stream=True, history=history)
+        summary = self._get_openai_response(ANNOUNCEMENT_SYSTEM_PROMPT, user_prompt, cache_kind="announcement_summary", history=history)
+        return summary if summary else "Could not generate announcement summary due to an error with OpenAI."
+
+    async def agenerate_announcement_summary(self, symbol: str, announcements: dict, news_articles: list, stream: bool = False, history: list = None):
+        """Async variant of generate_announcement_summary (with stream=True, returns an async iterator)."""
+        user_prompt = self._announcement_prompt(symbol, announcements, news_articles)
+        if stream:
+            return await self._aget_openai_response(ANNOUNCEMENT_SYSTEM_PROMPT, user_prompt, cache_kind="announcement_summary", stream=True, history=history)
+        summary = await self._aget_openai_response(ANNOUNCEMENT_SYSTEM_PROMPT, user_prompt, cache_kind="announcement_summary", history=history)
         return summary if summary else "Could not generate announcement summary due to an error with OpenAI."
 
 # # Hardcoded Inputs for Testing only
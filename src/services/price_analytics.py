@@ -0,0 +1,243 @@
+from functools import reduce
+
+import numpy as np
+
+from .ohlcv import OHLCVFrame, market_dates
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def _pct(value):
+    """Converts a ratio to a rounded percentage, mapping NaN to None (JSON friendly)."""
+    return None if value is None or not np.isfinite(value) else round(float(value) * 100, 2)
+
+
+def _round(value, digits=2):
+    return None if value is None or not np.isfinite(value) else round(float(value), digits)
+
+
+def _zscore(values):
+    mean = np.nanmean(values)
+    std = np.nanstd(values)
+    if not np.isfinite(std) or std == 0:
+        return np.zeros_like(values)
+    return (values - mean) / std
+
+
+def compute_price_metrics(open_, high, low, close, volume):
+    """
+    Vectorized per-day metrics over OHLCV arrays (oldest first).
+    Returns a dict of NumPy arrays: 'return', 'gap', 'range', 'volume_z', 'drawdown'.
+    The first day has NaN return/gap since there is no previous close.
+    """
+    open_, high, low, close, volume = (np.asarray(a, dtype=float) for a in (open_, high, low, close, volume))
+
+    prev_close = np.empty_like(close)
+    prev_close[0] = np.nan
+    prev_close[1:] = close[:-1]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        daily_return = close / prev_close - 1
+        gap = open_ / prev_close - 1
+        day_range = (high - low) / open_
+        drawdown = close / np.fmax.accumulate(close) - 1
+
+    return {
+        "return": daily_return,
+        "gap": gap,
+        "range": day_range,
+        "volume_z": _zscore(volume),
+        "drawdown": drawdown,
+    }
+
+
+def analyze_price_moves(price_history, move_sigma: float = 2.0, min_move: float = 0.02,
+                        gap_threshold: float = 0.02, volume_z_threshold: float = 2.0):
+    """
+    Summarizes a price history (an OHLCVFrame, or the list of dicts from YahooFinanceService.get_stock_price_history)
+    into summary statistics plus the days with significant moves.
+    Args:
+        move_sigma (float, optional): A day is a large move if its return is this many standard deviations from the mean...
+        min_move (float, optional): ...and at least this large in absolute terms (e.g. 0.02 = 2%).
+        gap_threshold (float, optional): Absolute open-vs-previous-close gap that flags a day.
+        volume_z_threshold (float, optional): Volume z-score that flags a day as a volume spike.
+    """
+    if price_history is None or len(price_history) == 0:
+        return {"period": None, "summary": None, "flagged_days": []}
+
+    if isinstance(price_history, OHLCVFrame):
+        dates = price_history.dates()
+        columns = {field: getattr(price_history, field) for field in ("open", "high", "low", "close", "volume")}
+    else:
+        dates = [row.get("date") for row in price_history]
+        columns = {
+            field: np.array([row.get(field) for row in price_history], dtype=float)
+            for field in ("open", "high", "low", "close", "volume")
+        }
+    metrics = compute_price_metrics(columns["open"], columns["high"], columns["low"], columns["close"], columns["volume"])
+
+    returns = metrics["return"]
+    return_std = np.nanstd(returns) if np.count_nonzero(np.isfinite(returns)) > 1 else np.nan
+    with np.errstate(invalid="ignore"):
+        return_z = (returns - np.nanmean(returns)) / return_std if np.isfinite(return_std) and return_std > 0 else np.zeros_like(returns)
+        large_move = (np.abs(return_z) >= move_sigma) & (np.abs(returns) >= min_move)
+        gap_flag = np.abs(metrics["gap"]) >= gap_threshold
+        volume_flag = metrics["volume_z"] >= volume_z_threshold
+
+    close = columns["close"]
+    finite_close = close[np.isfinite(close)]
+    summary = {
+        "start_close": _round(finite_close[0]) if finite_close.size else None,
+        "end_close": _round(finite_close[-1]) if finite_close.size else None,
+        "total_return_pct": _pct(finite_close[-1] / finite_close[0] - 1) if finite_close.size > 1 else None,
+        "realized_volatility_pct": _pct(return_std * np.sqrt(TRADING_DAYS_PER_YEAR)),
+        "max_drawdown_pct": _pct(np.nanmin(metrics["drawdown"])) if finite_close.size else None,
+        "average_volume": _round(np.nanmean(columns["volume"]), 0),
+        "up_days": int(np.count_nonzero(returns > 0)),
+        "down_days": int(np.count_nonzero(returns < 0)),
+    }
+    if np.any(np.isfinite(returns)):
+        best, worst = int(np.nanargmax(returns)), int(np.nanargmin(returns))
+        summary["best_day"] = {"date": dates[best], "return_pct": _pct(returns[best])}
+        summary["worst_day"] = {"date": dates[worst], "return_pct": _pct(returns[worst])}
+
+    flagged_days = []
+    for i in np.flatnonzero(large_move | gap_flag | volume_flag):
+        flags = []
+        if large_move[i]:
+            flags.append("large_move")
+        if gap_flag[i]:
+            flags.append("gap")
+        if volume_flag[i]:
+            flags.append("volume_spike")
+        flagged_days.append({
+            "date": dates[i],
+            "close": _round(close[i]),
+            "return_pct": _pct(returns[i]),
+            "gap_pct": _pct(metrics["gap"][i]),
+            "volume_z": _round(metrics["volume_z"][i]),
+            "flags": flags,
+        })
+
+    return {
+        "period": {"start": dates[0], "end": dates[-1], "trading_days": len(dates)},
+        "summary": summary,
+        "flagged_days": flagged_days,
+    }
+
+
+def screen_price_moves(histories: dict, **thresholds):
+    """
+    Batch screening: runs analyze_price_moves over many symbols.
+    Args:
+        histories (dict): symbol -> OHLCVFrame or price history list.
+        thresholds: Passed through to analyze_price_moves.
+    Returns:
+        List of {'symbol', 'summary', 'flagged_days'} sorted by absolute total return, largest first.
+    """
+    results = []
+    for symbol, price_history in histories.items():
+        analysis = analyze_price_moves(price_history, **thresholds)
+        results.append({"symbol": symbol, "summary": analysis["summary"], "flagged_days": analysis["flagged_days"]})
+
+    def sort_key(item):
+        total_return = (item["summary"] or {}).get("total_return_pct")
+        return -abs(total_return) if total_return is not None else float("inf")
+
+    return sorted(results, key=sort_key)
+
+
+def _aligned_closes(histories: dict):
+    """Stacks the closes of several OHLCVFrames on their common trading days. Returns (timestamps, symbols, closes[day, symbol])."""
+    frames = {symbol: frame for symbol, frame in histories.items() if frame is not None and len(frame) > 1}
+    if not frames:
+        return None, [], None
+    common = reduce(np.intersect1d, (frame.timestamps for frame in frames.values()))
+    symbols = list(frames)
+    closes = np.column_stack([
+        frame.close[np.searchsorted(frame.timestamps, common)] for frame in frames.values()
+    ]) if common.size else np.empty((0, len(symbols)))
+    return common, symbols, closes
+
+
+def compare_price_moves(histories: dict, dispersion_sigma: float = 2.0, max_days: int = 5):
+    """
+    Cross-sectional comparison of several symbols over their common trading days, computed on a
+    day x symbol matrix.
+    Args:
+        histories (dict): symbol -> OHLCVFrame.
+        dispersion_sigma (float, optional): A day is divergent if the spread between the best and worst
+            symbol's return is this many standard deviations above its mean.
+        max_days (int, optional): Maximum number of divergent days returned (largest spread first).
+    Returns:
+        {'period', 'symbols': per-symbol rows (total/relative return, volatility, drawdown, best/worst day),
+         'correlations': pairwise daily-return correlations, 'divergent_days': [{'date', 'spread_pct', 'leader', 'laggard', ...}]}
+    """
+    timestamps, symbols, closes = _aligned_closes(histories)
+    if timestamps is None or timestamps.shape[0] < 2:
+        return {"period": None, "symbols": [], "correlations": [], "divergent_days": []}
+    dates = market_dates(timestamps)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = closes[1:] / closes[:-1] - 1                # day x symbol
+        total_return = closes[-1] / closes[0] - 1
+        # Relative to an equal-weighted basket of the compared symbols
+        relative_return = total_return - np.nanmean(total_return)
+        volatility = np.nanstd(returns, axis=0) * np.sqrt(TRADING_DAYS_PER_YEAR)
+        max_drawdown = np.nanmin(closes / np.fmax.accumulate(closes, axis=0) - 1, axis=0)
+    finite_returns = np.where(np.isfinite(returns), returns, np.nan)
+    has_returns = np.any(np.isfinite(finite_returns), axis=0)
+    best = np.nanargmax(np.where(has_returns, finite_returns, 0.0), axis=0)
+    worst = np.nanargmin(np.where(has_returns, finite_returns, 0.0), axis=0)
+
+    rows = []
+    for j, symbol in enumerate(symbols):
+        rows.append({
+            "symbol": symbol,
+            "start_close": _round(closes[0, j]),
+            "end_close": _round(closes[-1, j]),
+            "total_return_pct": _pct(total_return[j]),
+            "relative_return_pct": _pct(relative_return[j]),
+            "volatility_pct": _pct(volatility[j]),
+            "max_drawdown_pct": _pct(max_drawdown[j]),
+            "best_day": dates[best[j] + 1] if has_returns[j] else None,
+            "best_day_pct": _pct(returns[best[j], j]) if has_returns[j] else None,
+            "worst_day": dates[worst[j] + 1] if has_returns[j] else None,
+            "worst_day_pct": _pct(returns[worst[j], j]) if has_returns[j] else None,
+        })
+    rows.sort(key=lambda row: -row["total_return_pct"] if row["total_return_pct"] is not None else float("inf"))
+
+    correlations = []
+    if returns.shape[0] > 2:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            matrix = np.corrcoef(np.nan_to_num(returns), rowvar=False)
+        upper_i, upper_j = np.triu_indices(len(symbols), k=1)
+        correlations = [
+            {"pair": f"{symbols[i]}/{symbols[j]}", "correlation": _round(matrix[i, j])}
+            for i, j in zip(upper_i.tolist(), upper_j.tolist())
+        ]
+
+    # Days where the symbols moved apart the most
+    with np.errstate(invalid="ignore"):
+        spread = np.nanmax(finite_returns, axis=1) - np.nanmin(finite_returns, axis=1)
+    divergent_days = []
+    if np.count_nonzero(np.isfinite(spread)) > 1:
+        spread_z = _zscore(spread)
+        candidates = np.flatnonzero(spread_z >= dispersion_sigma)
+        for i in candidates[np.argsort(-spread[candidates])][:max_days]:
+            day_returns = np.nan_to_num(finite_returns[i], nan=0.0)
+            divergent_days.append({
+                "date": dates[i + 1],
+                "spread_pct": _pct(spread[i]),
+                "leader": symbols[int(np.argmax(day_returns))],
+                "leader_return_pct": _pct(day_returns.max()),
+                "laggard": symbols[int(np.argmin(day_returns))],
+                "laggard_return_pct": _pct(day_returns.min()),
+            })
+
+    return {
+        "period": {"start": dates[0], "end": dates[-1], "trading_days": len(dates)},
+        "symbols": rows,
+        "correlations": correlations,
+        "divergent_days": divergent_days,
+    }
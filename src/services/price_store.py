@@ -0,0 +1,105 @@
+import os
+import time
+import sqlite3
+import threading
+
+import numpy as np
+
+from .ohlcv import OHLCVFrame
+
+DEFAULT_PRICE_STORE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "prices.sqlite3")
+
+# Yahoo ranges from smallest to largest, used to tell whether a stored history is deep enough
+RANGE_ORDER = ("1d", "5d", "1mo", "3mo", "6mo", "1y", "2y", "5y", "10y", "max")
+
+
+class PriceStore:
+    def __init__(self, db_path: str = None):
+        """
+        Local on-disk store of price bars per symbol/interval (SQLite).
+        Args:
+            db_path (str, optional): SQLite file. Defaults to PRICE_STORE_PATH or src/data/prices.sqlite3.
+        """
+        self.db_path = db_path or os.getenv("PRICE_STORE_PATH", DEFAULT_PRICE_STORE_PATH)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS bars (
+                symbol TEXT NOT NULL, interval TEXT NOT NULL, ts INTEGER NOT NULL,
+                open REAL, high REAL, low REAL, close REAL, adj_close REAL, volume REAL,
+                PRIMARY KEY (symbol, interval, ts)
+            );
+            CREATE TABLE IF NOT EXISTS sync_state (
+                symbol TEXT NOT NULL, interval TEXT NOT NULL, range TEXT NOT NULL, synced_at REAL NOT NULL,
+                PRIMARY KEY (symbol, interval)
+            );
+        """)
+        self._db.commit()
+
+    def read(self, symbol: str, interval: str = "1d", start: int = None, end: int = None, limit: int = None):
+        """
+        Returns stored bars as an OHLCVFrame (None if there are none).
+        Args:
+            start (int, optional): First bar timestamp (epoch seconds, inclusive).
+            end (int, optional): Last bar timestamp (epoch seconds, inclusive).
+            limit (int, optional): Keep only the newest N bars of the range.
+        """
+        sql = "SELECT ts, open, high, low, close, adj_close, volume FROM bars WHERE symbol = ? AND interval = ?"
+        params = [symbol.upper(), interval]
+        if start is not None:
+            sql += " AND ts >= ?"
+            params.append(int(start))
+        if end is not None:
+            sql += " AND ts <= ?"
+            params.append(int(end))
+        sql += " ORDER BY ts DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        if not rows:
+            return None
+
+        data = np.array(rows[::-1], dtype=float)
+        frame = OHLCVFrame(symbol.upper(), interval, data[:, 0].astype(np.int64), data[:, 1], data[:, 2], data[:, 3],
+                           data[:, 4], data[:, 6], adj_close=data[:, 5])
+        frame.meta["regularMarketPrice"] = frame.last_close()
+        return frame
+
+    def write(self, frame: OHLCVFrame, replace: bool = False):
+        """Upserts a frame's bars. With replace=True the symbol/interval history is dropped first (re-sync)."""
+        symbol = frame.symbol.upper()
+        columns = (frame.timestamps.tolist(), frame.open.tolist(), frame.high.tolist(), frame.low.tolist(),
+                   frame.close.tolist(), frame.adj_close.tolist(), frame.volume.tolist())
+        rows = [(symbol, frame.interval) + row for row in zip(*columns)]
+        with self._lock:
+            if replace:
+                self._db.execute("DELETE FROM bars WHERE symbol = ? AND interval = ?", (symbol, frame.interval))
+            self._db.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._db.commit()
+
+    def sync_state(self, symbol: str, interval: str = "1d"):
+        """Returns {'range', 'synced_at'} for the last sync, or None if never synced."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT range, synced_at FROM sync_state WHERE symbol = ? AND interval = ?", (symbol.upper(), interval)
+            ).fetchone()
+        return {"range": row[0], "synced_at": row[1]} if row else None
+
+    def mark_synced(self, symbol: str, interval: str, range_: str, synced_at: float = None):
+        """Records a successful sync and the history depth it covers."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+                (symbol.upper(), interval, range_, synced_at if synced_at is not None else time.time()),
+            )
+            self._db.commit()
+
+    @staticmethod
+    def covers_range(stored_range: str, wanted_range: str):
+        """True if a history synced with stored_range is at least as deep as wanted_range."""
+        if stored_range not in RANGE_ORDER or wanted_range not in RANGE_ORDER:
+            return stored_range == wanted_range
+        return RANGE_ORDER.index(stored_range) >= RANGE_ORDER.index(wanted_range)
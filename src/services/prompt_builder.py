@@ -0,0 +1,184 @@
+import io
+import os
+import re
+import csv
+import json
+
+# tiktoken (in requirements.txt) counts tokens locally; without it, or its encoding file, they are estimated
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "o200k_base")
+_encoding = None
+
+# Tokenizers split digits into groups of up to 3 and most punctuation into tokens of its own, so numeric tables
+# take far more tokens per character than prose: the estimate counts those pieces rather than characters
+_ESTIMATE_PATTERN = re.compile(r"[^\W\d_]+|\d{1,3}|\S")
+
+
+def get_encoding():
+    """The tiktoken encoding prompts are counted with, or None if it is unavailable (loaded once)."""
+    global _encoding
+    if _encoding is None:
+        _encoding = False
+        if tiktoken is None:
+            print("tiktoken is not installed; prompt tokens are estimated.")
+        else:
+            try:
+                _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+            except Exception as e:
+                print(f"Token encoding '{TOKEN_ENCODING}' unavailable ({e}); prompt tokens are estimated.")
+    return _encoding or None
+
+
+def estimate_tokens(text: str):
+    """Tokenizer-free token estimate: one token per word (plus one per 8 letters), 3-digit group or symbol."""
+    return sum(1 + len(piece) // 8 if piece[0].isalpha() else 1 for piece in _ESTIMATE_PATTERN.findall(text))
+
+
+def count_tokens(text: str):
+    """Counts tokens with the local tokenizer (tiktoken, TOKEN_ENCODING), or estimates them."""
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return estimate_tokens(text)
+
+
+def _cell(value, max_chars: int):
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        value = "|".join(str(v) for v in value)
+    elif isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = " ".join(str(value).split())
+    return value if len(value) <= max_chars else value[:max_chars - 1].rstrip() + "…"
+
+
+def compact_rows(rows: list, columns: list, max_chars: int = 280):
+    """Encodes dict rows as CSV lines (no header), one string per row."""
+    lines = []
+    for row in rows:
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="").writerow([_cell(row.get(column), max_chars) for column in columns])
+        lines.append(buffer.getvalue())
+    return lines
+
+
+def compact_mapping(mapping: dict):
+    """Encodes a (possibly nested) dict as 'key=value; key.sub=value' on one line."""
+    parts = []
+
+    def walk(prefix, value):
+        if isinstance(value, dict):
+            for key, sub_value in value.items():
+                walk(f"{prefix}.{key}" if prefix else key, sub_value)
+        elif value is not None:
+            parts.append(f"{prefix}={_cell(value, 80)}")
+
+    walk("", mapping or {})
+    return "; ".join(parts)
+
+
+def dedupe(items: list, key_fields: tuple):
+    """Drops items whose normalized key fields (e.g. headline) were already seen, keeping the first."""
+    seen = set()
+    unique = []
+    for item in items or []:
+        key = tuple(" ".join(str(item.get(field) or "").lower().split()) for field in key_fields)
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(item)
+    return unique
+
+
+class PromptSection:
+    __slots__ = ("title", "columns", "lines", "min_items", "trim_priority")
+
+    def __init__(self, title: str, rows: list, columns: list, min_items: int = 0, trim_priority: int = 0, max_chars: int = 280):
+        """
+        A table in the prompt. Rows are expected most-important first; trimming drops from the end.
+        Args:
+            min_items (int, optional): Rows that are never trimmed.
+            trim_priority (int, optional): Sections with higher priority are trimmed first.
+        """
+        self.title = title
+        self.columns = columns
+        self.lines = compact_rows(rows, columns, max_chars=max_chars)
+        self.min_items = min_items
+        self.trim_priority = trim_priority
+
+    def render(self):
+        if not self.lines:
+            return f"{self.title}: none"
+        return "\n".join([f"{self.title}:", ",".join(self.columns)] + self.lines)
+
+
+class PromptBuilder:
+    def __init__(self, token_budget: int = 3000, max_text_chars: int = 280, measure_savings: bool = False):
+        """
+        Builds compact, token-budgeted user prompts.
+        Args:
+            token_budget (int, optional): Upper bound on system + user prompt tokens.
+            max_text_chars (int, optional): Long text fields (summaries, snippets) are truncated to this length.
+            measure_savings (bool, optional): Also tokenize the legacy JSON rendering to report tokens saved
+                (costs a second tokenizer pass over a larger text on every prompt).
+        """
+        self.token_budget = token_budget
+        self.max_text_chars = max_text_chars
+        self.measure_savings = measure_savings
+
+    def section(self, title: str, rows: list, columns: list, min_items: int = 0, trim_priority: int = 0):
+        return PromptSection(title, rows, columns, min_items=min_items, trim_priority=trim_priority, max_chars=self.max_text_chars)
+
+    def build(self, system_prompt: str, header_lines: list, sections: list, legacy_payload=None):
+        """
+        Assembles the user prompt from header lines and table sections, trimming rows until
+        the whole prompt fits the token budget.
+        Args:
+            system_prompt (str): Stable instructions (kept identical across requests so provider-side prompt caching applies).
+            header_lines (list): Request-specific lines placed before the tables.
+            sections (list): PromptSection objects.
+            legacy_payload (optional): Data as previously sent (pretty-printed JSON), to report tokens saved
+                when measure_savings is on.
+        Returns:
+            (user_prompt, stats) where stats has 'prompt_tokens', 'legacy_tokens', 'tokens_saved' (None unless
+            savings are measured) and 'rows_trimmed'.
+        """
+        def render():
+            return "\n".join(list(header_lines) + [section.render() for section in sections])
+
+        system_tokens = count_tokens(system_prompt)
+        user_prompt = render()
+        tokens = system_tokens + count_tokens(user_prompt)
+        rows_trimmed = 0
+
+        while tokens > self.token_budget:
+            # Each row is tokenized once; the rows needed to cover the excess are dropped together and the
+            # prompt is counted again (a row's tokens in context can differ slightly from its own count)
+            excess = tokens - self.token_budget
+            while excess > 0:
+                candidates = [section for section in sections if len(section.lines) > section.min_items]
+                if not candidates:
+                    break
+                excess -= count_tokens(max(candidates, key=lambda s: s.trim_priority).lines.pop() + "\n")
+                rows_trimmed += 1
+            if excess == tokens - self.token_budget:
+                break
+            user_prompt = render()
+            tokens = system_tokens + count_tokens(user_prompt)
+
+        legacy_tokens = None
+        if self.measure_savings and legacy_payload is not None:
+            legacy_tokens = system_tokens + count_tokens(json.dumps(legacy_payload, indent=2, default=str))
+        return user_prompt, {
+            "prompt_tokens": tokens,
+            "legacy_tokens": legacy_tokens,
+            "tokens_saved": max(0, legacy_tokens - tokens) if legacy_tokens is not None else None,
+            "rows_trimmed": rows_trimmed,
+        }
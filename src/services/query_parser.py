@@ -0,0 +1,250 @@
+import os
+import re
+import json
+import threading
+
+DEFAULT_TICKERS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "tickers.json")
+
+# Keyword sets used to classify the user's intent without a round trip to OpenAI
+MOVEMENT_KEYWORDS = {
+    "why", "reason", "reasons", "move", "moved", "moves", "movement", "movements", "moving",
+    "drop", "dropped", "dropping", "fall", "fell", "falling", "rise", "rose", "rising",
+    "rally", "rallied", "surge", "surged", "jump", "jumped", "plunge", "plunged", "spike", "spiked",
+    "decline", "declined", "gain", "gained", "tank", "tanked", "soar", "soared", "crash", "crashed",
+}
+ANNOUNCEMENT_KEYWORDS = {
+    "announcement", "announcements", "announced", "news", "filing", "filings", "press", "release",
+    "releases", "development", "developments", "sec", "8-k", "10-k", "10-q", "disclosure", "disclosures",
+    "headline", "headlines",
+}
+PRICE_KEYWORDS = {"price", "prices", "quote", "quotes", "trading", "worth", "valued", "value"}
+# Words that make a several-company question a price comparison by themselves. Looser ones ("vs", "better",
+# "against") also appear in other questions ("news on Amazon vs Walmart", "is Apple better at AI?"): left to the LLM.
+COMPARE_KEYWORDS = {
+    "compare", "compared", "comparing", "comparison", "outperform", "outperformed", "underperform", "underperformed",
+}
+# Upper bound on the symbols of one comparison query
+MAX_COMPARE_SYMBOLS = 10
+
+# The only other words of a follow-up that asks the previous question about another company: "what about MSFT?",
+# "and Google?", "same for Tesla". Anything else ("tell me about Google's financials") is a new question.
+FOLLOW_UP_WORDS = {"what", "how", "about", "and", "same", "for", "now", "then", "also", "instead", "ok", "okay", "the", "of", "stock", "shares"}
+
+# Words that do not narrow a question down: a query made of these, its company and intent keywords ("what are the
+# reasons for Tesla's stock price movements in the last 2 weeks?") gets the generic answer (see is_generic).
+GENERIC_WORDS = {
+    "what", "why", "did", "does", "do", "is", "are", "was", "were", "has", "have", "been", "the", "a", "an", "for", "of",
+    "in", "to", "about", "me", "tell", "give", "show", "any", "latest", "recent", "recently", "lately", "new", "related",
+    "significant", "stock", "stocks", "share", "shares", "company", "its", "it", "their", "behind", "there", "last", "past",
+    "2", "two", "week", "weeks",
+}
+
+# Upper-case words that look like tickers in a sentence but almost never are
+COMMON_UPPERCASE_WORDS = {"I", "A", "AI", "US", "USA", "CEO", "CFO", "IPO", "ETF", "EPS", "Q1", "Q2", "Q3", "Q4"}
+
+TOKEN_PATTERN = re.compile(r"\$?[A-Za-z0-9][A-Za-z0-9&\-\.']*")
+
+
+class TickerIndex:
+    def __init__(self, entries: list):
+        """
+        Builds an in-memory lookup over a ticker list.
+        Args:
+            entries (list): Dicts with 'symbol', 'name' and optional 'aliases'.
+        """
+        self.symbols = {}   # "AAPL" -> entry
+        self.names = {}     # ("bank", "of", "america") -> entry
+        self.max_name_tokens = 1
+
+        for entry in entries:
+            symbol = entry["symbol"].upper()
+            self.symbols[symbol] = entry
+            for alias in entry.get("aliases", []):
+                key = tuple(alias.lower().split())
+                self.names[key] = entry
+                self.max_name_tokens = max(self.max_name_tokens, len(key))
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_TICKERS_PATH):
+        """Loads the bundled ticker list from a JSON file."""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def lookup_symbol(self, token: str):
+        """Returns the entry for an exact ticker symbol, or None."""
+        return self.symbols.get(token.upper())
+
+    def find_names(self, words: list):
+        """Scans lower-cased words for company names/aliases, preferring the longest match."""
+        found = []
+        i = 0
+        while i < len(words):
+            for n in range(min(self.max_name_tokens, len(words) - i), 0, -1):
+                entry = self.names.get(tuple(words[i:i + n]))
+                if entry:
+                    found.append(entry)
+                    i += n
+                    break
+            else:
+                i += 1
+        return found
+
+
+class LocalQueryParser:
+    def __init__(self, index: TickerIndex = None):
+        """
+        Initializes the local (no LLM) query parser.
+        Args:
+            index (TickerIndex, optional): Symbol/company-name index. Defaults to the bundled ticker list.
+        """
+        self.index = index if index else TickerIndex.from_file()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _tokenize(query: str):
+        raw_tokens = []
+        for token in TOKEN_PATTERN.findall(query):
+            token = token.rstrip(".'")
+            if token.lower().endswith("'s"):
+                token = token[:-2]
+            if token:
+                raw_tokens.append(token)
+        return raw_tokens
+
+    @staticmethod
+    def _entity_words(entry: dict):
+        """The words a company can be named with in a query (lower case)."""
+        return {entry["symbol"].lower()} | {word for alias in entry.get("aliases", []) for word in alias.lower().split()}
+
+    def _find_entities(self, raw_tokens: list):
+        entities = []
+        for token in raw_tokens:
+            is_cashtag = token.startswith("$")
+            candidate = token.lstrip("$")
+            # Bare symbols must be written in upper case (avoids "cat", "shop", "now" ...)
+            if not is_cashtag and (candidate != candidate.upper() or candidate in COMMON_UPPERCASE_WORDS or len(candidate) < 2):
+                continue
+            entry = self.index.lookup_symbol(candidate)
+            if entry:
+                entities.append(entry)
+
+        words = [token.lstrip("$").lower() for token in raw_tokens]
+        entities.extend(self.index.find_names(words))
+
+        unique = {}
+        for entry in entities:
+            unique[entry["symbol"]] = entry
+        return list(unique.values())
+
+    @staticmethod
+    def _classify_intent(words: set):
+        movement = bool(words & MOVEMENT_KEYWORDS)
+        announcements = bool(words & ANNOUNCEMENT_KEYWORDS)
+        price = bool(words & PRICE_KEYWORDS)
+
+        # "reasons for Tesla's stock price movements" mentions price, but is a movement question
+        if movement and not announcements:
+            return "get_stock_movement_reasons"
+        if announcements and not movement and not price:
+            return "get_latest_announcements"
+        if price and not movement and not announcements:
+            return "get_stock_price"
+        return None
+
+    def parse(self, query: str):
+        """
+        Attempts to resolve the query locally.
+        Returns a dict shaped like OpenAIService.parse_query, or None if the query is ambiguous
+        and should fall back to the LLM. Comparison queries also carry the list of 'symbols'.
+        """
+        raw_tokens = self._tokenize(query or "")
+        entities = self._find_entities(raw_tokens)
+        words = {token.lstrip("$").lower() for token in raw_tokens}
+        intent = self._classify_intent(words)
+
+        # Several companies and a comparison or move/price question: "compare AAPL, MSFT and GOOGL moves this month".
+        # Questions about their news are not price comparisons.
+        if 2 <= len(entities) <= MAX_COMPARE_SYMBOLS and not words & ANNOUNCEMENT_KEYWORDS and (
+                words & COMPARE_KEYWORDS or intent in ("get_stock_movement_reasons", "get_stock_price")):
+            with self._lock:
+                self.hits += 1
+            return {
+                "company_name": ", ".join(entry["name"] for entry in entities),
+                "symbol": entities[0]["symbol"],
+                "symbols": [entry["symbol"] for entry in entities],
+                "intent": "compare_stocks",
+            }
+
+        if len(entities) != 1 or not intent:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        entry = entities[0]
+        return {"company_name": entry["name"], "symbol": entry["symbol"], "intent": intent}
+
+    def parse_follow_up(self, query: str, subject: dict):
+        """
+        Resolves a follow-up question against the previous query of the conversation, without the LLM:
+        "why did it move?" or "any announcements?" ask about the previous company (or companies), and
+        "what about MSFT?" (only such short forms, see FOLLOW_UP_WORDS) asks the previous question about another company.
+        Returns a dict shaped like parse(), or None if the query is not such a follow-up.
+        Args:
+            subject (dict): The previous query's 'company_name', 'symbol', 'symbols' and 'intent'.
+        """
+        if not subject or not subject.get("symbol"):
+            return None
+        raw_tokens = self._tokenize(query or "")
+        entities = self._find_entities(raw_tokens)
+        words = {token.lstrip("$").lower() for token in raw_tokens}
+        intent = self._classify_intent(words)
+        symbols = subject.get("symbols") or [subject["symbol"]]
+
+        if not entities and intent:
+            if len(symbols) == 1:
+                return {"company_name": subject.get("company_name"), "symbol": symbols[0], "intent": intent}
+            # "why did they move?" after a comparison compares them again
+            if intent in ("get_stock_movement_reasons", "get_stock_price"):
+                return {"company_name": subject.get("company_name"), "symbol": symbols[0], "symbols": list(symbols), "intent": "compare_stocks"}
+            return None
+
+        previous_intent = subject.get("intent")
+        if len(entities) == 1 and not intent and previous_intent in ("get_stock_price", "get_latest_announcements", "get_stock_movement_reasons"):
+            entry = entities[0]
+            if words - self._entity_words(entry) <= FOLLOW_UP_WORDS:
+                return {"company_name": entry["name"], "symbol": entry["symbol"], "intent": previous_intent}
+        return None
+
+    def is_generic(self, query: str):
+        """
+        True if the query asks nothing beyond its companies and intent ("why did AAPL move?"), so a precomputed answer
+        fits it. Anything more specific ("why did it drop on Tuesday?", "...this month?") is answered live.
+        """
+        raw_tokens = self._tokenize(query or "")
+        words = {token.lstrip("$").lower() for token in raw_tokens}
+        for entry in self._find_entities(raw_tokens):
+            words -= self._entity_words(entry)
+        return words <= GENERIC_WORDS | MOVEMENT_KEYWORDS | ANNOUNCEMENT_KEYWORDS | PRICE_KEYWORDS
+
+    def candidates(self, query: str):
+        """
+        Cheap guess for a query that parse() could not resolve: the symbols it mentions (in order) and the intent
+        its keywords suggest (None if unclear). Used to start data fetches while the LLM parses the query.
+        """
+        raw_tokens = self._tokenize(query or "")
+        words = {token.lstrip("$").lower() for token in raw_tokens}
+        return [entry["symbol"] for entry in self._find_entities(raw_tokens)], self._classify_intent(words)
+
+    def stats(self):
+        """Returns local parse hit/miss counters and the hit rate."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
@@ -0,0 +1,64 @@
+import time
+import threading
+
+
+class QuoteTable:
+    def __init__(self, client, watchlist: list, refresh_seconds: float = 15.0, max_age_seconds: float = None):
+        """
+        In-memory table of latest quotes for a watchlist, kept up to date by a background thread.
+        Args:
+            client (ApiClient): Used for batched quote fetches (get_quotes).
+            watchlist (list): Symbols to keep refreshed.
+            refresh_seconds (float, optional): Seconds between refreshes.
+            max_age_seconds (float, optional): Quotes older than this are not served. Defaults to 2x refresh_seconds.
+        """
+        self.client = client
+        self.watchlist = [symbol.upper() for symbol in watchlist]
+        self.refresh_seconds = refresh_seconds
+        self.max_age_seconds = max_age_seconds if max_age_seconds is not None else 2 * refresh_seconds
+        self._quotes = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self):
+        """Fetches the whole watchlist in one batched call and updates the table."""
+        try:
+            quotes = self.client.get_quotes(self.watchlist)
+        except Exception as e:
+            print(f"Error refreshing watchlist quotes: {e}")
+            return
+        with self._lock:
+            self._quotes.update(quotes)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.refresh_seconds)
+
+    def start(self):
+        """Starts the background refresher (no-op if already running or the watchlist is empty)."""
+        if self._thread or not self.watchlist:
+            return
+        self._thread = threading.Thread(target=self._run, name="quote-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the background refresher."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.refresh_seconds)
+            self._thread = None
+
+    def get(self, symbol: str):
+        """
+        Returns the quote for a symbol with its staleness, or None if it is not tracked or too old.
+        """
+        with self._lock:
+            quote = self._quotes.get(symbol.upper())
+        if not quote:
+            return None
+        staleness = time.time() - quote["fetched_at"]
+        if staleness > self.max_age_seconds:
+            return None
+        return dict(quote, staleness_seconds=round(staleness, 1), source="watchlist")
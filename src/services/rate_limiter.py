@@ -0,0 +1,170 @@
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import threading
+
+# Lower runs first: interactive query parsing goes ahead of long analyses
+PRIORITIES = {"parse": 0, "default": 1, "announcement_summary": 2, "movement_analysis": 2, "comparison": 2}
+
+
+class QueueTimeout(Exception):
+    """Raised when a call waited longer than max_wait for rate limit capacity."""
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute: float = 500, tokens_per_minute: float = 200000, max_wait: float = 30.0,
+                 min_scale: float = 0.1):
+        """
+        Client-side token buckets for requests and tokens per minute, granted in priority order.
+        Rates adapt to the provider: a 429 cuts them (and pauses for Retry-After), successes slowly restore them.
+        Args:
+            requests_per_minute (float, optional): Request quota; also the bucket size (bursts up to a minute's quota).
+                0 or less leaves requests unlimited.
+            tokens_per_minute (float, optional): Token quota (prompt + completion). 0 or less leaves tokens unlimited.
+            max_wait (float, optional): Seconds a call may wait in the queue before QueueTimeout is raised.
+            min_scale (float, optional): Lower bound for the adaptive rate multiplier.
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_wait = max_wait
+        self.min_scale = min_scale
+        self.scale = 1.0
+        self.paused_until = 0.0
+
+        # A quota of 0 (or less) is an unlimited bucket
+        self._requests = float(requests_per_minute) if requests_per_minute > 0 else float("inf")
+        self._tokens = float(tokens_per_minute) if tokens_per_minute > 0 else float("inf")
+        self._refilled_at = time.monotonic()
+        self._waiters = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+
+        self.granted = 0
+        self.timeouts = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+
+    def _refill(self, now):
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        if self.requests_per_minute > 0:
+            self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute * self.scale / 60.0)
+        if self.tokens_per_minute > 0:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute * self.scale / 60.0)
+
+    def _try_acquire(self, ticket, tokens):
+        """Takes capacity if the ticket is first in line and the buckets allow it. Returns 0.0, or seconds to wait."""
+        now = time.monotonic()
+        self._refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self._waiters[0] != ticket:
+            return None
+        if self.tokens_per_minute > 0:
+            tokens = min(tokens, self.tokens_per_minute)
+        if self._requests >= 1 and self._tokens >= tokens:
+            self._requests -= 1
+            self._tokens -= tokens
+            heapq.heappop(self._waiters)
+            return 0.0
+        # Only a limited bucket can be short (an unlimited one holds inf)
+        missing_requests = missing_tokens = 0.0
+        if self._requests < 1:
+            missing_requests = (1 - self._requests) / (self.requests_per_minute * self.scale / 60.0)
+        if self._tokens < tokens:
+            missing_tokens = (tokens - self._tokens) / (self.tokens_per_minute * self.scale / 60.0)
+        return max(missing_requests, missing_tokens)
+
+    def _granted(self, started):
+        waited = time.monotonic() - started
+        self.granted += 1
+        self.total_wait += waited
+        return waited
+
+    def _leave(self, ticket):
+        """Takes a ticket that will not be granted out of the queue, so the calls behind it can go."""
+        if ticket in self._waiters:
+            self._waiters.remove(ticket)
+            heapq.heapify(self._waiters)
+        self._condition.notify_all()
+
+    def _timed_out(self, ticket):
+        self._leave(ticket)
+        self.timeouts += 1
+        return QueueTimeout(f"No rate limit capacity within {self.max_wait:.0f}s ({len(self._waiters)} calls queued)")
+
+    def acquire(self, tokens: int, priority: int = 1):
+        """Blocks until a call of about `tokens` tokens may be sent. Returns the seconds waited."""
+        started = time.monotonic()
+        with self._condition:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiters, ticket)
+            while True:
+                wait = self._try_acquire(ticket, tokens)
+                if wait == 0.0:
+                    # The next in line may be able to go right away
+                    self._condition.notify_all()
+                    return self._granted(started)
+                remaining = started + self.max_wait - time.monotonic()
+                if remaining <= 0:
+                    raise self._timed_out(ticket)
+                self._condition.wait(min(remaining, wait) if wait is not None else remaining)
+
+    async def aacquire(self, tokens: int, priority: int = 1):
+        """Async variant of acquire: waits without blocking the event loop."""
+        started = time.monotonic()
+        with self._condition:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiters, ticket)
+        try:
+            while True:
+                with self._condition:
+                    wait = self._try_acquire(ticket, tokens)
+                    if wait == 0.0:
+                        self._condition.notify_all()
+                        return self._granted(started)
+                    remaining = started + self.max_wait - time.monotonic()
+                    if remaining <= 0:
+                        raise self._timed_out(ticket)
+                # Calls behind another are not told when it is their turn, so they check back shortly
+                await asyncio.sleep(min(remaining, wait if wait is not None else 0.05, 1.0))
+        except BaseException:
+            # A cancelled caller (client disconnect, outer timeout) must not stay at the head of the queue
+            with self._condition:
+                self._leave(ticket)
+            raise
+
+    def settle(self, estimated_tokens: int, actual_tokens: int):
+        """Corrects the token bucket once a call's real usage is known, and lets rates recover after throttling."""
+        with self._condition:
+            if self.tokens_per_minute > 0:
+                self._tokens = min(self.tokens_per_minute, self._tokens + estimated_tokens - actual_tokens)
+            self.scale = min(1.0, self.scale + 0.02)
+            self._condition.notify_all()
+
+    def throttle(self, retry_after: float = None):
+        """Called on a provider 429: cuts the rates and pauses all calls for Retry-After seconds."""
+        with self._condition:
+            self.throttled += 1
+            self.scale = max(self.min_scale, self.scale * 0.7)
+            if retry_after:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+    def stats(self):
+        """Returns queue depth by priority, calls granted, timeouts, throttles, mean wait and the current rate multiplier."""
+        with self._condition:
+            depth = {}
+            for priority, _ in self._waiters:
+                depth[priority] = depth.get(priority, 0) + 1
+            return {
+                "queue_depth": depth, "granted": self.granted, "timeouts": self.timeouts, "throttled": self.throttled,
+                "mean_wait_seconds": self.total_wait / self.granted if self.granted else 0.0, "scale": self.scale,
+            }
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 20.0, retry_after: float = None):
+    """Jittered exponential backoff (full jitter); never shorter than the server's Retry-After."""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    return max(delay, retry_after or 0.0)
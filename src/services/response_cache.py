@@ -0,0 +1,204 @@
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .market_calendar import seconds_until_next_daily_bar
+from .shared_cache import SQLiteSharedCache
+
+
+# TTL (seconds, or a callable returning seconds) per kind of OpenAI call
+DEFAULT_TTLS = {
+    "parse": 3 * 24 * 3600,
+    "announcement_summary": 3600,
+    "movement_analysis": seconds_until_next_daily_bar,
+    "comparison": seconds_until_next_daily_bar,
+    "default": 600,
+}
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 512, db_path: str = None, ttls: dict = None, shared=None, namespace: str = "openai",
+                 lock_wait: float = 30.0):
+        """
+        Two-tier LRU + TTL cache for OpenAI responses: process memory in front of a cache shared by all worker processes.
+        Args:
+            max_entries (int, optional): Size bound of the in-memory LRU tier.
+            db_path (str, optional): SQLite file for the shared tier, if no shared cache is given.
+            ttls (dict, optional): Overrides for DEFAULT_TTLS, keyed by kind.
+            shared (SharedCache, optional): Shared tier. If None (and no db_path), only memory is used.
+            namespace (str, optional): Key prefix in the shared tier.
+            lock_wait (float, optional): Seconds single_writer waits for another process computing the same response.
+        """
+        self.max_entries = max_entries
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.shared = shared if shared is not None else (SQLiteSharedCache(db_path) if db_path else None)
+        self.namespace = namespace
+        self.lock_wait = lock_wait
+        self._memory = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, user_prompt: str, response_format=None, history=None):
+        """Builds a stable cache key from everything that determines the completion (history: earlier chat messages)."""
+        parts = [model, system_prompt, user_prompt, response_format]
+        if history:
+            parts.append(history)
+        payload = json.dumps(parts, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def ttl_for(self, kind: str):
+        """Resolves the TTL (in seconds) for a kind of call."""
+        ttl = self.ttls.get(kind, self.ttls["default"])
+        return ttl() if callable(ttl) else ttl
+
+    def _shared_key(self, key: str):
+        return f"{self.namespace}:{key}"
+
+    def _memory_lookup(self, key: str, now: float):
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    return value
+                del self._memory[key]
+        return None
+
+    def _promote(self, key: str, entry, now: float):
+        """Returns a shared-tier entry's value (copied into memory), or None if it is missing or expired."""
+        if entry is None or entry[0] <= now:
+            return None
+        with self._lock:
+            self._put_memory(key, entry[0], entry[1])
+        return entry[1]
+
+    def _lookup(self, key: str, count_shared: bool = True):
+        """Returns (value, from_shared_tier); value is None on a miss. Shared-tier hits are copied into memory."""
+        now = time.time()
+        value = self._memory_lookup(key, now)
+        if value is not None or self.shared is None:
+            return value, False
+        shared_key = self._shared_key(key)
+        value = self._promote(key, self.shared.get(shared_key) if count_shared else self.shared.peek(shared_key), now)
+        return value, value is not None
+
+    async def _alookup(self, key: str, count_shared: bool = True):
+        """Async variant of _lookup (the shared tier is read off the event loop)."""
+        now = time.time()
+        value = self._memory_lookup(key, now)
+        if value is not None or self.shared is None:
+            return value, False
+        shared_key = self._shared_key(key)
+        value = self._promote(key, await (self.shared.aget(shared_key) if count_shared else self.shared.apeek(shared_key)), now)
+        return value, value is not None
+
+    def _count(self, value, from_shared: bool):
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.shared_hits += from_shared
+        return value
+
+    def get(self, key: str):
+        """Returns the cached value, or None on a miss or expiry."""
+        return self._count(*self._lookup(key))
+
+    async def aget(self, key: str):
+        """Async variant of get."""
+        return self._count(*await self._alookup(key))
+
+    def _set_memory(self, key: str, value, kind: str):
+        """Stores the value in memory. Returns (shared-tier entry, ttl), or (None, None) if the kind is not cached."""
+        ttl = self.ttl_for(kind)
+        if not ttl or ttl <= 0:
+            return None, None
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._put_memory(key, expires_at, value)
+        return [expires_at, value], ttl
+
+    def set(self, key: str, value, kind: str = "default"):
+        """Stores a value with the TTL configured for its kind."""
+        entry, ttl = self._set_memory(key, value, kind)
+        if entry is not None and self.shared is not None:
+            self.shared.set(self._shared_key(key), entry, ttl)
+
+    async def aset(self, key: str, value, kind: str = "default"):
+        """Async variant of set."""
+        entry, ttl = self._set_memory(key, value, kind)
+        if entry is not None and self.shared is not None:
+            await self.shared.aset(self._shared_key(key), entry, ttl)
+
+    def single_writer(self, key: str, compute):
+        """
+        Runs compute() (which caches the response it gets), unless another worker process is computing the same key:
+        then its cached response is returned once it is there. After lock_wait seconds the call computes anyway.
+        """
+        if self.shared is None:
+            return compute()
+        name = self._shared_key(key)
+        token, value = self.shared.acquire(name, ttl=2 * self.lock_wait, wait=self.lock_wait,
+                                           ready=lambda: self._lookup(key, count_shared=False)[0])
+        if value is not None:
+            return value
+        try:
+            # Another process may have cached it between the caller's miss and taking the lock
+            value = self._lookup(key, count_shared=False)[0] if token is not None else None
+            return value if value is not None else compute()
+        finally:
+            if token is not None:
+                self.shared.unlock(name, token)
+
+    async def asingle_writer(self, key: str, compute):
+        """Async variant of single_writer; compute is a coroutine function."""
+        if self.shared is None:
+            return await compute()
+        name = self._shared_key(key)
+
+        async def ready():
+            return (await self._alookup(key, count_shared=False))[0]
+
+        token, value = await self.shared.aacquire(name, ttl=2 * self.lock_wait, wait=self.lock_wait, ready=ready)
+        if value is not None:
+            return value
+        try:
+            value = await ready() if token is not None else None
+            return value if value is not None else await compute()
+        finally:
+            if token is not None:
+                await self.shared.aunlock(name, token)
+
+    def _put_memory(self, key, expires_at, value):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Drops every cached entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        if self.shared is not None:
+            self.shared.clear(f"{self.namespace}:")
+
+    def stats(self):
+        """Returns hit/miss/eviction counters (shared_hits: hits served from the shared tier)."""
+        with self._lock:
+            return {
+                "entries": len(self._memory),
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
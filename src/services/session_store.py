@@ -0,0 +1,179 @@
+import hmac
+import time
+import hashlib
+import secrets
+import threading
+from collections import OrderedDict
+
+from .ohlcv import OHLCVFrame
+
+
+def _complete(value):
+    """False for what a failed fetch returns: None, an empty price frame, or a per-symbol dict with one of those."""
+    if value is None:
+        return False
+    if isinstance(value, OHLCVFrame):
+        return len(value) > 0
+    if isinstance(value, dict):
+        return all(_complete(item) for item in value.values())
+    return True
+
+
+class SessionContext:
+    def __init__(self, store, session_id: str):
+        """One conversation: the company it is about, data already fetched for it and the recent turns. Created by SessionStore.get."""
+        self._store = store
+        self.session_id = session_id
+        self.subject = None  # {'company_name', 'symbol', 'symbols', 'intent'} of the last answered query
+        self.last_used = time.time()
+        self._turns = []  # chat messages: user question, assistant answer, ...
+        self._data = OrderedDict()  # (source name, symbols) -> (fetched_at, value)
+        self._lock = threading.Lock()
+
+    def remember(self, query_info: dict):
+        """Makes a resolved query's company the one follow-ups ("why did it move?") refer to."""
+        with self._lock:
+            self.subject = {key: query_info.get(key) for key in ("company_name", "symbol", "symbols", "intent")}
+
+    def history(self):
+        """The recent turns as chat messages, oldest first."""
+        with self._lock:
+            return list(self._turns)
+
+    def add_turn(self, question: str, answer: str):
+        """
+        Appends a question and its answer to the history. When the history is full, the oldest half is dropped
+        at once rather than one turn per question, so the messages stay an append-only prefix for several turns.
+        """
+        max_messages = 2 * self._store.max_turns
+        if max_messages <= 0:
+            return
+        answer = answer if len(answer) <= self._store.max_answer_chars else answer[:self._store.max_answer_chars - 1].rstrip() + "…"
+        with self._lock:
+            self._turns.extend([{"role": "user", "content": question}, {"role": "assistant", "content": answer}])
+            if len(self._turns) > max_messages:
+                kept_turns = max(1, self._store.max_turns // 2)
+                del self._turns[:len(self._turns) - 2 * kept_turns]
+
+    def cached(self, name: str, symbols, fetch):
+        """
+        Wraps a data fetch so a follow-up about the same symbols reuses the result fetched earlier in the session
+        (for up to data_ttl_seconds). Failed or partial results (see _complete) are returned but not stored, so the
+        next question fetches them again.
+        Args:
+            name (str): Data source name, e.g. "price_history".
+            symbols (list): The symbols the data is for.
+            fetch (callable): Fetches the data.
+        """
+        key = (name, tuple(symbol.upper() for symbol in symbols))
+
+        def fetch_or_reuse():
+            now = time.time()
+            with self._lock:
+                entry = self._data.get(key)
+                if entry is not None and now - entry[0] <= self._store.data_ttl_seconds:
+                    self._data.move_to_end(key)
+                    self._store._record(data_hits=1)
+                    return entry[1]
+            self._store._record(data_misses=1)
+            value = fetch()
+            if not _complete(value):
+                return value
+            with self._lock:
+                self._data[key] = (now, value)
+                self._data.move_to_end(key)
+                while len(self._data) > self._store.max_data_entries:
+                    self._data.popitem(last=False)
+            return value
+
+        return fetch_or_reuse
+
+
+class SessionStore:
+    def __init__(self, max_sessions: int = 1000, idle_seconds: float = 1800.0, max_turns: int = 3,
+                 max_answer_chars: int = 1500, max_data_entries: int = 6, data_ttl_seconds: float = 300.0, secret: str = None):
+        """
+        In-memory conversation contexts, so follow-up questions can be resolved and answered from what the session
+        already established. Memory is bounded by the session count, and per session by the turns and data entries kept.
+        Args:
+            max_sessions (int, optional): Least recently used sessions beyond this are evicted.
+            idle_seconds (float, optional): Sessions unused for this long are evicted.
+            max_turns (int, optional): Question/answer pairs passed to the model as conversation history (0 disables).
+            max_answer_chars (int, optional): Answers are truncated to this length in the history.
+            max_data_entries (int, optional): Fetched data sets kept per session for reuse.
+            data_ttl_seconds (float, optional): How long fetched data is reused by follow-ups.
+            secret (str, optional): Key that session ids are signed with (see new_id). Defaults to a random key per process.
+        """
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.max_turns = max_turns
+        self.max_answer_chars = max_answer_chars
+        self.max_data_entries = max_data_entries
+        self.data_ttl_seconds = data_ttl_seconds
+        self._secret = (secret or secrets.token_hex(32)).encode("utf-8")
+        self._sessions = OrderedDict()  # session id -> SessionContext, least recently used first
+        self._lock = threading.Lock()
+        self.created = 0
+        self.evicted = 0
+        self.follow_ups = 0
+        self.data_hits = 0
+        self.data_misses = 0
+
+    def _sign(self, token: str):
+        return hmac.new(self._secret, token.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+    def new_id(self):
+        """Issues a session id: a random token and its signature, so clients cannot pick (or guess) another session's id."""
+        token = secrets.token_urlsafe(16)
+        return f"{token}.{self._sign(token)}"
+
+    def valid_id(self, session_id: str):
+        """True for ids issued by new_id (with this store's secret)."""
+        if not session_id or len(session_id) > 128 or "." not in session_id:
+            return False
+        token, signature = session_id.rsplit(".", 1)
+        return hmac.compare_digest(signature, self._sign(token))
+
+    def get(self, session_id: str):
+        """Returns the session's context, creating it if it is new (or was evicted)."""
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            context = self._sessions.get(session_id)
+            if context is None:
+                context = SessionContext(self, session_id)
+                self._sessions[session_id] = context
+                self.created += 1
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evicted += 1
+            else:
+                self._sessions.move_to_end(session_id)
+            context.last_used = now
+            return context
+
+    def _evict(self, now: float):
+        # Sessions are ordered by last use, so the idle ones are at the front
+        while self._sessions:
+            context = next(iter(self._sessions.values()))
+            if now - context.last_used <= self.idle_seconds:
+                break
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    def _record(self, follow_ups: int = 0, data_hits: int = 0, data_misses: int = 0):
+        with self._lock:
+            self.follow_ups += follow_ups
+            self.data_hits += data_hits
+            self.data_misses += data_misses
+
+    def record_follow_up(self):
+        """Counts a follow-up question resolved from its session's context (no LLM parse)."""
+        self._record(follow_ups=1)
+
+    def stats(self):
+        """Returns the active session count and the session, follow-up and data reuse counters."""
+        with self._lock:
+            self._evict(time.time())
+            return {"sessions": len(self._sessions), "created": self.created, "evicted": self.evicted, "follow_ups": self.follow_ups,
+                    "data_hits": self.data_hits, "data_misses": self.data_misses}
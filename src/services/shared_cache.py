@@ -0,0 +1,558 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import asyncio
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import urlparse, unquote
+
+from .ohlcv import OHLCVFrame
+
+DEFAULT_SHARED_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "shared_cache.sqlite3")
+
+# Seconds between checks while another worker process holds a lock
+LOCK_POLL_SECONDS = 0.02
+# Backend errors are all counted, but printed at most this often
+ERROR_LOG_INTERVAL_SECONDS = 10.0
+
+# Cached values are one tag byte followed by the encoded value
+_FRAME_TAG = b"F"
+_JSON_TAG = b"J"
+
+
+def pack(value):
+    """Encodes a cache value: OHLCVFrames in their compact binary form (OHLCVFrame.to_bytes), anything else as JSON."""
+    if isinstance(value, OHLCVFrame):
+        return _FRAME_TAG + value.to_bytes()
+    return _JSON_TAG + json.dumps(value, default=str).encode("utf-8")
+
+
+def unpack(data):
+    """Decodes pack() output. Decoded OHLCVFrames are read-only views over data."""
+    data = memoryview(data)
+    tag = bytes(data[:1])
+    if tag == _FRAME_TAG:
+        return OHLCVFrame.from_bytes(data[1:])
+    if tag == _JSON_TAG:
+        return json.loads(bytes(data[1:]))
+    raise ValueError(f"Unknown cache value tag {tag!r}")
+
+
+class SharedCache:
+    """
+    Cache shared by all worker processes, so that a price history or LLM answer fetched by one worker serves the
+    others. Values are stored packed (see pack) with a TTL; locks make one worker compute a missing value while the
+    others wait for it. Backends implement the underscored methods; errors there are counted and treated as misses
+    (the caller then fetches the data itself).
+    """
+    backend = "base"
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.lock_waits = 0
+        self.errors = 0
+        self._error_logged_at = 0.0
+
+    def _get(self, key: str):
+        raise NotImplementedError
+
+    def _set(self, key: str, data: bytes, ttl: float):
+        raise NotImplementedError
+
+    def _delete(self, key: str):
+        raise NotImplementedError
+
+    def _clear(self, prefix: str):
+        raise NotImplementedError
+
+    def _try_lock(self, name: str, token: str, ttl: float):
+        raise NotImplementedError
+
+    def _unlock(self, name: str, token: str):
+        raise NotImplementedError
+
+    def _count(self, field: str):
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _error(self, operation: str, error: Exception):
+        with self._stats_lock:
+            self.errors += 1
+            now = time.monotonic()
+            if now - self._error_logged_at < ERROR_LOG_INTERVAL_SECONDS:
+                return
+            self._error_logged_at = now
+        print(f"Shared cache ({self.backend}) {operation} failed: {error}")
+
+    def peek(self, key: str):
+        """get() without counting a hit or miss."""
+        try:
+            data = self._get(key)
+            return unpack(data) if data is not None else None
+        except Exception as e:
+            self._error("get", e)
+            return None
+
+    def get(self, key: str):
+        """Returns the cached value, or None on a miss or expiry."""
+        value = self.peek(key)
+        self._count("hits" if value is not None else "misses")
+        return value
+
+    def set(self, key: str, value, ttl: float):
+        """Stores a value for ttl seconds (not stored if ttl <= 0)."""
+        if not ttl or ttl <= 0:
+            return
+        try:
+            self._set(key, pack(value), ttl)
+            self._count("sets")
+        except Exception as e:
+            self._error("set", e)
+
+    def delete(self, key: str):
+        try:
+            self._delete(key)
+        except Exception as e:
+            self._error("delete", e)
+
+    def clear(self, prefix: str = ""):
+        """Drops every entry whose key starts with prefix."""
+        try:
+            self._clear(prefix)
+        except Exception as e:
+            self._error("clear", e)
+
+    def try_lock(self, name: str, ttl: float = 30.0):
+        """
+        Takes a cross-process lock without waiting. Returns a token for unlock(), or None if another process holds it.
+        The lock expires after ttl seconds in case its holder dies. If the backend fails, a token is returned anyway
+        (the caller proceeds uncoordinated rather than not at all).
+        """
+        token = uuid.uuid4().hex
+        try:
+            return token if self._try_lock(name, token, ttl) else None
+        except Exception as e:
+            self._error("lock", e)
+            return token
+
+    def unlock(self, name: str, token: str):
+        """Releases a lock taken with try_lock (no-op if it expired and was taken over)."""
+        try:
+            self._unlock(name, token)
+        except Exception as e:
+            self._error("unlock", e)
+
+    def acquire(self, name: str, ttl: float = 30.0, wait: float = 10.0, ready=None):
+        """
+        Waits up to `wait` seconds for a lock. Returns (token, value): the token if the lock was taken, or the value
+        ready() returned while waiting (e.g. the result the lock holder just cached). (None, None) after `wait`.
+        """
+        token = self.try_lock(name, ttl)
+        if token is not None:
+            return token, None
+        self._count("lock_waits")
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_SECONDS)
+            value = ready() if ready else None
+            if value is not None:
+                return None, value
+            token = self.try_lock(name, ttl)
+            if token is not None:
+                return token, None
+        return None, None
+
+    @staticmethod
+    async def _in_thread(fn, *args):
+        # Backend calls block (SQLite busy timeout, Redis socket reads), so async callers run them off the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    async def apeek(self, key: str):
+        """Async variant of peek."""
+        return await self._in_thread(self.peek, key)
+
+    async def aget(self, key: str):
+        """Async variant of get."""
+        return await self._in_thread(self.get, key)
+
+    async def aset(self, key: str, value, ttl: float):
+        """Async variant of set."""
+        if not ttl or ttl <= 0:
+            return
+        await self._in_thread(self.set, key, value, ttl)
+
+    async def atry_lock(self, name: str, ttl: float = 30.0):
+        """Async variant of try_lock."""
+        return await self._in_thread(self.try_lock, name, ttl)
+
+    async def aunlock(self, name: str, token: str):
+        """Async variant of unlock."""
+        await self._in_thread(self.unlock, name, token)
+
+    async def aacquire(self, name: str, ttl: float = 30.0, wait: float = 10.0, ready=None):
+        """
+        Async variant of acquire: backend calls run in a thread and the wait does not block the event loop.
+        ready, if given, is a coroutine function.
+        """
+        token = await self.atry_lock(name, ttl)
+        if token is not None:
+            return token, None
+        self._count("lock_waits")
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_SECONDS)
+            value = await ready() if ready else None
+            if value is not None:
+                return None, value
+            token = await self.atry_lock(name, ttl)
+            if token is not None:
+                return token, None
+        return None, None
+
+    @contextmanager
+    def lock(self, name: str, ttl: float = 30.0, wait: float = 10.0):
+        """Holds a cross-process lock for a block. Yields False if it was not acquired within `wait` seconds."""
+        token, _ = self.acquire(name, ttl, wait)
+        try:
+            yield token is not None
+        finally:
+            if token is not None:
+                self.unlock(name, token)
+
+    def get_or_compute(self, key: str, compute, ttl: float, lock_ttl: float = 30.0, wait: float = 10.0):
+        """
+        Returns the cached value, or computes and caches it. Only one process computes a key at a time; the others
+        wait (up to `wait` seconds) and use its result. compute() returning None is not cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        token, value = self.acquire(key, lock_ttl, wait, ready=lambda: self.peek(key))
+        if value is not None:
+            self._count("hits")
+            return value
+        try:
+            # Another process may have stored it between the miss and taking the lock
+            value = self.peek(key) if token is not None else None
+            if value is None:
+                value = compute()
+                if value is not None:
+                    self.set(key, value, ttl)
+            return value
+        finally:
+            if token is not None:
+                self.unlock(key, token)
+
+    def stats(self):
+        """Returns hit/miss/set counters, lock waits (another process was computing) and backend errors."""
+        with self._stats_lock:
+            return {"hits": self.hits, "misses": self.misses, "sets": self.sets, "lock_waits": self.lock_waits, "errors": self.errors}
+
+
+class MemorySharedCache(SharedCache):
+    backend = "memory"
+
+    def __init__(self, max_entries: int = 4096):
+        """Process-local stand-in with the SharedCache interface (single-process deployments, tests)."""
+        super().__init__()
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, data)
+        self._locks = {}  # name -> (token, expires_at)
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or item[0] <= time.time():
+                return None
+            self._entries.move_to_end(key)
+            return item[1]
+
+    def _set(self, key, data, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _clear(self, prefix):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def _try_lock(self, name, token, ttl):
+        now = time.time()
+        with self._lock:
+            held = self._locks.get(name)
+            if held is not None and held[1] > now:
+                return False
+            self._locks[name] = (token, now + ttl)
+            return True
+
+    def _unlock(self, name, token):
+        with self._lock:
+            if self._locks.get(name, (None,))[0] == token:
+                del self._locks[name]
+
+
+class SQLiteSharedCache(SharedCache):
+    backend = "sqlite"
+
+    def __init__(self, path: str = None, busy_timeout: float = 5.0):
+        """
+        Shared cache in a local SQLite file (WAL mode), for worker processes on one host. Every write is a single
+        atomic statement, so readers never see a partial value, and locks are rows claimed with a conditional upsert.
+        Args:
+            path (str, optional): Database file. Defaults to src/data/shared_cache.sqlite3.
+            busy_timeout (float, optional): Seconds a statement waits for another process's write to finish.
+        """
+        super().__init__()
+        self.path = path or DEFAULT_SHARED_CACHE_PATH
+        self.busy_timeout = busy_timeout
+        self._lock = threading.Lock()
+        self._db = None
+        self._pid = None
+        self._writes = 0
+
+    def _connection(self):
+        # Connections are not carried across fork(): a forked worker opens its own
+        if self._db is None or self._pid != os.getpid():
+            self._db = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, token TEXT NOT NULL, expires_at REAL NOT NULL)")
+            self._pid = os.getpid()
+        return self._db
+
+    def _get(self, key):
+        with self._lock:
+            row = self._connection().execute("SELECT value FROM entries WHERE key = ? AND expires_at > ?", (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key, data, ttl):
+        now = time.time()
+        with self._lock:
+            db = self._connection()
+            db.execute("INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)", (key, sqlite3.Binary(data), now + ttl))
+            self._writes += 1
+            if self._writes % 500 == 0:
+                db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+                db.execute("DELETE FROM locks WHERE expires_at <= ?", (now,))
+
+    def _delete(self, key):
+        with self._lock:
+            self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def _clear(self, prefix):
+        with self._lock:
+            self._connection().execute("DELETE FROM entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+    def _try_lock(self, name, token, ttl):
+        now = time.time()
+        with self._lock:
+            cursor = self._connection().execute(
+                "INSERT INTO locks (name, token, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET token = excluded.token, expires_at = excluded.expires_at WHERE locks.expires_at <= ?",
+                (name, token, now + ttl, now),
+            )
+            return cursor.rowcount == 1
+
+    def _unlock(self, name, token):
+        with self._lock:
+            self._connection().execute("DELETE FROM locks WHERE name = ? AND token = ?", (name, token))
+
+
+class _RespConnection:
+    def __init__(self, host: str, port: int, timeout: float):
+        """One connection speaking the Redis protocol (RESP2)."""
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+
+    @staticmethod
+    def encode(args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.extend([b"$%d\r\n" % len(data), data, b"\r\n"])
+        return b"".join(parts)
+
+    def execute(self, *args):
+        self.sock.sendall(self.encode(args))
+        return self.read_reply()
+
+    def read_reply(self):
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by the cache server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            raise RuntimeError(rest.decode("utf-8"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            return None if length < 0 else self.reader.read(length + 2)[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self.read_reply() for _ in range(length)]
+        raise ConnectionError(f"Unexpected reply from the cache server: {line[:40]!r}")
+
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+# Deletes a lock only if it still holds the caller's token (it may have expired and been taken over)
+_UNLOCK_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+
+class RedisSharedCache(SharedCache):
+    backend = "redis"
+
+    def __init__(self, url: str = "redis://127.0.0.1:6379/0", prefix: str = "analyst:", socket_timeout: float = 2.0, max_idle_connections: int = 16):
+        """
+        Shared cache on a Redis-protocol server, for worker processes on several hosts. Uses a small built-in RESP
+        client (GET, SET with PX/NX, DEL, SCAN, EVAL), so no client library is needed.
+        Args:
+            url (str, optional): redis://[[user]:password@]host[:port][/db]
+            prefix (str, optional): Prepended to every key, so several apps can share a server.
+            socket_timeout (float, optional): Seconds to connect and to wait for a reply.
+            max_idle_connections (int, optional): Connections kept open for reuse.
+        """
+        super().__init__()
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.prefix = prefix
+        self.socket_timeout = socket_timeout
+        self.max_idle_connections = max_idle_connections
+        self._idle = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        # After a failed connection attempt the server is not retried for a few seconds (calls fail fast meanwhile)
+        self.retry_seconds = 5.0
+        self._down_until = 0.0
+
+    def _connect(self):
+        if time.monotonic() < self._down_until:
+            raise ConnectionError(f"{self.host}:{self.port} unavailable")
+        try:
+            connection = _RespConnection(self.host, self.port, self.socket_timeout)
+        except OSError:
+            self._down_until = time.monotonic() + self.retry_seconds
+            raise
+        try:
+            if self.password:
+                connection.execute(*(["AUTH", self.username, self.password] if self.username else ["AUTH", self.password]))
+            if self.db:
+                connection.execute("SELECT", self.db)
+        except Exception:
+            connection.close()
+            raise
+        return connection
+
+    def _command(self, *args):
+        with self._lock:
+            # Connections are not carried across fork(): a forked worker opens its own
+            if self._pid != os.getpid():
+                self._idle, self._pid = [], os.getpid()
+            connection = self._idle.pop() if self._idle else None
+        connection = connection or self._connect()
+        try:
+            reply = connection.execute(*args)
+        except RuntimeError:
+            self._release(connection)  # An error reply leaves the connection usable
+            raise
+        except Exception:
+            connection.close()
+            raise
+        self._release(connection)
+        return reply
+
+    def _release(self, connection):
+        with self._lock:
+            if len(self._idle) < self.max_idle_connections and self._pid == os.getpid():
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def _get(self, key):
+        return self._command("GET", self.prefix + key)
+
+    def _set(self, key, data, ttl):
+        self._command("SET", self.prefix + key, data, "PX", max(1, int(ttl * 1000)))
+
+    def _delete(self, key):
+        self._command("DEL", self.prefix + key)
+
+    def _clear(self, prefix):
+        cursor = "0"
+        while True:
+            cursor, keys = self._command("SCAN", cursor, "MATCH", self.prefix + prefix + "*", "COUNT", 500)
+            if keys:
+                self._command("DEL", *keys)
+            cursor = cursor.decode("utf-8") if isinstance(cursor, bytes) else str(cursor)
+            if cursor == "0":
+                return
+
+    def _try_lock(self, name, token, ttl):
+        return self._command("SET", self.prefix + "lock:" + name, token, "NX", "PX", max(1, int(ttl * 1000))) == "OK"
+
+    def _unlock(self, name, token):
+        self._command("EVAL", _UNLOCK_SCRIPT, 1, self.prefix + "lock:" + name, token)
+
+
+def open_shared_cache(url: str = None):
+    """
+    Opens the shared cache backend configured by url (default: SHARED_CACHE_URL):
+    "sqlite:" (src/data/shared_cache.sqlite3) or "sqlite:///path/to/file.sqlite3", "redis://host:port/db",
+    or "memory" (not shared; for single-process runs).
+    """
+    url = url if url is not None else os.getenv("SHARED_CACHE_URL", "sqlite:")
+    scheme = urlparse(url).scheme or url
+    try:
+        if scheme == "sqlite":
+            cache = SQLiteSharedCache(urlparse(url).path or None)
+            cache._connection()  # Fails early on an unusable path
+            return cache
+        if scheme == "redis":
+            return RedisSharedCache(url)
+        if scheme != "memory":
+            print(f"Unknown SHARED_CACHE_URL '{url}'. Using a process-local cache.")
+    except Exception as e:
+        print(f"Error opening shared cache {url}: {e}. Using a process-local cache.")
+    return MemorySharedCache()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_shared_cache():
+    """The process's shared cache (opened from SHARED_CACHE_URL on first use), used by the services by default."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = open_shared_cache()
+        return _default_cache
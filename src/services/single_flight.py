@@ -0,0 +1,98 @@
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        """
+        Request coalescing: concurrent calls with the same key share one execution and its result.
+        """
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """
+        Runs fn() unless a call with the same key is already in flight, in which case its result
+        (or exception) is shared. Keys must be hashable.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        """Returns how many upstream calls were executed and how many were coalesced into them."""
+        with self._lock:
+            return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+
+class AsyncSingleFlight:
+    def __init__(self):
+        """
+        asyncio variant of SingleFlight: concurrent awaits with the same key share one coroutine execution.
+        Must be used from a single event loop.
+        """
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key, coro_fn):
+        """Awaits coro_fn() unless a call with the same key is already in flight, in which case its result is shared."""
+        future = self._calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        # Mark exceptions as retrieved even if no follower awaited them
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.executed += 1
+        try:
+            result = await coro_fn()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._calls[key]
+
+    def stats(self):
+        """Returns how many upstream calls were executed and how many were coalesced into them."""
+        return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._calls)}
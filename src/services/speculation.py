@@ -0,0 +1,103 @@
+import threading
+
+
+class Speculation:
+    def __init__(self, prefetch, futures: dict):
+        """One query's speculative fetches: (source name, symbol) -> Future. Created by SpeculativePrefetch.start."""
+        self._prefetch = prefetch
+        self._futures = futures
+        self._kept = {}
+        self._taken = set()
+        self._lock = threading.Lock()
+
+    def confirm(self, needed: set):
+        """
+        Settles the guess once the query is parsed: fetches the answer needs are kept, the others are cancelled
+        (if not started yet) or their results discarded.
+        Args:
+            needed (set): (source name, symbol) pairs the parsed query fetches; empty if the query failed to parse.
+        """
+        with self._lock:
+            futures, self._futures = self._futures, {}
+            self._kept = {key: future for key, future in futures.items() if key in needed}
+        discarded = [future for key, future in futures.items() if key not in needed]
+        cancelled = sum(1 for future in discarded if future.cancel())
+        self._prefetch._record(hit=bool(self._kept), cancelled=cancelled, wasted=len(discarded) - cancelled)
+
+    def take(self, name: str, symbol: str):
+        """Returns the kept Future for a source, or None if it was not speculated."""
+        key = (name, symbol.upper())
+        with self._lock:
+            future = self._kept.get(key)
+            if future is not None and key not in self._taken:
+                self._taken.add(key)
+                self._prefetch._record(used=1)
+            return future
+
+    def close(self):
+        """Counts kept fetches the answer did not use after all (e.g. it was precomputed) as wasted."""
+        with self._lock:
+            unused = len(self._kept) - len(self._taken)
+            self._kept = {}
+        if unused:
+            self._prefetch._record(wasted=unused)
+
+
+class SpeculativePrefetch:
+    def __init__(self, submit, fetches: dict, max_symbols: int = 2):
+        """
+        Starts likely data fetches for a query before its (slow) LLM parse has confirmed the symbol and intent.
+        Args:
+            submit (callable): (name, fn) -> Future, e.g. DataFanout.submit.
+            fetches (dict): source name -> callable(symbol) returning that source's data.
+            max_symbols (int, optional): Candidate symbols speculated on per query.
+        """
+        self.submit = submit
+        self.fetches = fetches
+        self.max_symbols = max_symbols
+        self._lock = threading.Lock()
+        self.speculations = 0
+        self.hits = 0
+        self.fetches_started = 0
+        self.fetches_used = 0
+        self.fetches_wasted = 0
+        self.fetches_cancelled = 0
+
+    def start(self, symbols: list, sources: list = None):
+        """
+        Starts the fetches for the candidate symbols. Returns a Speculation, or None if there is nothing to fetch.
+        Args:
+            symbols (list): Candidate symbols, most likely first.
+            sources (list, optional): Source names to fetch (default: all of them).
+        """
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))[:self.max_symbols]
+        names = [name for name in (sources or self.fetches) if name in self.fetches]
+        if not symbols or not names:
+            return None
+        futures = {}
+        for symbol in symbols:
+            for name in names:
+                fetch = self.fetches[name]
+                futures[(name, symbol)] = self.submit(f"speculative.{name}", lambda fetch=fetch, symbol=symbol: fetch(symbol))
+        with self._lock:
+            self.speculations += 1
+            self.fetches_started += len(futures)
+        return Speculation(self, futures)
+
+    def _record(self, hit: bool = None, used: int = 0, wasted: int = 0, cancelled: int = 0):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            self.fetches_used += used
+            self.fetches_wasted += wasted
+            self.fetches_cancelled += cancelled
+
+    def stats(self):
+        """Returns speculation and fetch counters and the hit rate (speculations whose guess the parse confirmed)."""
+        with self._lock:
+            return {
+                "speculations": self.speculations, "hits": self.hits,
+                "hit_rate": self.hits / self.speculations if self.speculations else 0.0,
+                "fetches_started": self.fetches_started, "fetches_used": self.fetches_used,
+                "fetches_wasted": self.fetches_wasted, "fetches_cancelled": self.fetches_cancelled,
+            }
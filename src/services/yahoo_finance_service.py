@@ -1,163 +1,341 @@
 
-import sys
 import os
+import time
+from datetime import datetime
+
+import numpy as np
 
 from .data_api import ApiClient
-import json
-from datetime import datetime, timedelta
+from .announcement_store import AnnouncementStore, CATEGORIES
+from .price_store import PriceStore
+from .quote_table import QuoteTable
+from .single_flight import SingleFlight
+from .shared_cache import default_shared_cache
+from .metrics import timed, record_error
+from .market_calendar import MARKET_TIMEZONE, is_market_open, previous_market_close, seconds_until_next_daily_bar
+
+# Intraday (non-daily) charts fetched by any worker process are reused for this long
+INTRADAY_CACHE_SECONDS = 60
 
 class YahooFinanceService:
-    def __init__(self):
-        self.client = ApiClient()
+    def __init__(self, announcement_store: AnnouncementStore = None, price_store: PriceStore = None, client=None, shared_cache=None):
+        """
+        Args:
+            announcement_store (AnnouncementStore, optional): Defaults to the bundled announcement data.
+            price_store (PriceStore, optional): Local daily price store. Defaults to PRICE_STORE_PATH.
+            client (optional): Market data client with the ApiClient interface. Defaults to ApiClient (yfinance).
+            shared_cache (SharedCache, optional): Cache shared with the other worker processes (quotes, price
+                histories, sync locks). Defaults to the one configured by SHARED_CACHE_URL.
+        """
+        self.client = client if client else ApiClient()
+        self.announcement_store = announcement_store if announcement_store else AnnouncementStore()
+        self.price_store = price_store if price_store else PriceStore()
+        # While the market is open, the stored daily history is refreshed at most this often
+        self.price_refresh_seconds = int(os.getenv("PRICE_REFRESH_SECONDS", "900"))
+        self.quote_table = None
+        # Concurrent identical upstream fetches share one call (see flight.stats()), and across worker processes
+        # one process fetches while the others wait for its result in the shared cache
+        self.flight = SingleFlight()
+        self.shared_cache = shared_cache if shared_cache is not None else default_shared_cache()
+        # Quotes fetched by any worker process are reused for this long (0 disables)
+        self.quote_cache_seconds = float(os.getenv("QUOTE_CACHE_SECONDS", "10"))
 
     # Uses Yahoo Finance API to get the latest stock price for a given symbol
-    def get_latest_stock_price(self, symbol: str, region: str = "US"):
-        """Fetches the latest stock price for a given symbol."""
+    def get_latest_quote(self, symbol: str, region: str = "US"):
+        """
+        Returns the latest quote {'symbol', 'price', 'fetched_at', 'staleness_seconds', 'source'}, or None.
+        Watchlist symbols are served from the background-refreshed quote table; others use a single-bar fetch.
+        """
+        if self.quote_table is not None:
+            quote = self.quote_table.get(symbol)
+            if quote:
+                return quote
         try:
-            response = self.client.call_api(
-                'YahooFinance/get_stock_chart',
-                query={'symbol': symbol, 'region': region, 'interval': '1m', 'range': '1d'}
-            )
-            if response and response.get("chart") and response["chart"].get("result") and len(response["chart"]["result"]) > 0:
-                meta = response["chart"]["result"][0].get("meta")
-                if meta and "regularMarketPrice" in meta:
-                    return meta["regularMarketPrice"]
-                # Fallback if regularMarketPrice is not directly in meta, try to get the last close price
-                elif response["chart"]["result"][0].get("indicators", {}).get("quote") and \
-                     response["chart"]["result"][0]["indicators"]["quote"][0].get("close") and \
-                     len(response["chart"]["result"][0]["indicators"]["quote"][0]["close"]) > 0:
-                    # Get the last available close price from the series
-                    close_prices = [p for p in response["chart"]["result"][0]["indicators"]["quote"][0]["close"] if p is not None]
-                    if close_prices:
-                        return close_prices[-1]
-            return None # Or raise an error
+            started = time.time()
+            with timed("yahoo.quote"):
+                quote = self.flight.do(("quote", symbol.upper()), lambda: self._fetch_quote(symbol))
+            if quote is None:
+                return None # Or raise an error
+            return self._quote_with_source(quote, started)
         except Exception as e:
+            record_error("yahoo")
             print(f"Error fetching stock price for {symbol}: {e}")
             return None
 
-    # Hardcoded placeholder data for MVP, can integrate with a Search API in the future
-    # For MVP, we'll hardcode the data for each symbol, but this can be replaced with a more dynamic approach.
-    def get_latest_announcements(self, symbol: str, region: str = "US"):
-        """
-        Generates a dictionary of placeholder company announcements and SEC filings.
-        Includes various common scenarios.
-        """
-        announcements = {
-            "significant_developments": [
-            # Example: Meta-specific news
-            {
-                "related_symbol": "META",
-                "headline": "Placeholder: Meta Continues Significant Investments in AI, Introduces New Language Model",
-                "date": "2025-05-07", # Note: This date is fixed as per the user's example
-                "summary": "Placeholder: Meta is heavily investing in artificial intelligence, increasing its capital expenditures to support its AI infrastructure and research efforts. The company recently launched its next-generation large language model with multimodal capabilities, aiming to enhance AI agents and competitive positioning in the generative AI space."
-            },
-            # Example: Tesla-specific news
-            {
-                "related_symbol": "TSLA",
-                "headline": "Placeholder: Tesla Stock Soars 5%",
-                "date": (datetime.now() - timedelta(days=5)).strftime("%Y-%m-%d"),
-                "summary": "Placeholder: Recent optimism was fueled by a major announcement impacting Tesla's global market exposure. Despite a rocky start to the year with recent disappointing earnings, investor sentiment has shifted positively, bolstered by confidence in the company's leadership."
-            },
-            # Example: Apple-specific news
-            {
-                "related_symbol": "AAPL",
-                "headline": "Placeholder: Apple shares fall as CEO says ‘very difficult’ to predict tariff costs beyond June",
-                "date": (datetime.now() - timedelta(days=3)).strftime("%Y-%m-%d"),
-                "summary": "Placeholder: The company expects tariffs to add significant costs for the current quarter, assuming no other major changes occur, the CEO said. The CEO told CNBC that Apple is already sourcing products for the U.S. from regions where tariffs are lower."
-            },
-            # Example: Google-specific news
-            {
-                "related_symbol": "GOOGL",
-                "headline": "Placeholder: Alphabet shares drop sharply after Apple executive's testimony on Safari search",
-                "date": "2025-05-07",
-                "summary": "Placeholder: Shares of Alphabet, Google's parent company, fell significantly following testimony from an Apple executive who stated that Google's search traffic on Safari had declined and that Apple was exploring adding other AI search options to its browser. [2, 4, 5, 10, 11] This news raised concerns about potential challenges to Google's dominant search market position. [2, 5, 10]"
-            }
-            ],
-            "financial_results": [ # Added a new category for financial news
-                {
-                    "headline": f"Placeholder: {symbol} Reports QX Financial Results",
-                    "date": (datetime.now() - timedelta(days=3)).strftime("%Y-%m-%d"),
-                    "summary": f"{symbol} announced its financial results for the quarter ending {datetime.now() + timedelta(days=15)}, reporting strong revenue growth and solid earnings per share."
-                },
-                {
-                    "headline": f"Placeholder: {symbol} Raises Full-Year Guidance",
-                    "date": (datetime.now() - timedelta(days=2)).strftime("%Y-%m-%d"),
-                    "summary": f"Following better-than-expected performance, {symbol} has raised its financial guidance for the full fiscal year."
-                }
-                # Add more financial results scenarios here
-            ],
-            "sec_filings": [
-                {
-                    "type": "8-K",
-                    "title": f"Placeholder: Current report for {symbol}",
-                    "filingDate": int((datetime.now() - timedelta(days=2)).timestamp()), 
-                    "description": f"This is a placeholder 8-K filing for {symbol} regarding recent events such as a material agreement or management change."
-                },
-                {
-                    "type": "10-Q", # Quarterly Report
-                    "title": f"Placeholder: Quarterly report for {symbol}",
-                    "filingDate": int((datetime.now() - timedelta(days=4)).timestamp()),
-                    "description": f"This is a placeholder 10-Q filing for {symbol}, containing the company's unaudited financial results and related disclosures for the quarter."
-                },
-                {
-                    "type": "10-K", # Annual Report
-                    "title": f"Placeholder: Annual report for {symbol}",
-                    "filingDate": int((datetime.now() - timedelta(days=30)).timestamp()), 
-                    "description": f"This is a placeholder 10-K filing for {symbol}, containing the company's audited annual financial statements and comprehensive business report."
-                },
-                {
-                    "type": "S-1", # Registration Statement (often for IPOs or new offerings)
-                    "title": f"Placeholder: Registration Statement for {symbol}",
-                    "filingDate": int((datetime.now() - timedelta(days=60)).timestamp()), 
-                    "description": f"This is a placeholder S-1 filing for {symbol} regarding the registration of securities for a public offering."
-                },
-                {
-                    "type": "4", # Statement of Changes in Beneficial Ownership (Insider Trading)
-                    "title": f"Placeholder: Insider Trading Report for {symbol}",
-                    "filingDate": int((datetime.now() - timedelta(days=1)).timestamp()),
-                    "description": f"This is a placeholder Form 4 filing showing insider trading activity for {symbol}."
-                }
-                # Add more SEC filing scenarios here (hardcoded for MVP)
-            ]
-        }
+    def _fetch_quote(self, symbol: str):
+        if self.quote_cache_seconds <= 0:
+            return self.client.get_quote(symbol)
+        return self.shared_cache.get_or_compute(f"yahoo:quote:{symbol.upper()}", lambda: self.client.get_quote(symbol),
+                                                ttl=self.quote_cache_seconds)
+
+    @staticmethod
+    def _quote_with_source(quote: dict, started: float):
+        """Marks a quote as fetched by this call ("live") or by another worker process ("shared")."""
+        if quote["fetched_at"] >= started:
+            return dict(quote, staleness_seconds=0.0, source="live")
+        return dict(quote, staleness_seconds=round(time.time() - quote["fetched_at"], 1), source="shared")
+
+    def get_latest_stock_price(self, symbol: str, region: str = "US"):
+        """Fetches the latest stock price for a given symbol."""
+        quote = self.get_latest_quote(symbol, region=region)
+        return quote["price"] if quote else None
+
+    def get_latest_quotes(self, symbols: list):
+        """
+        Batch variant of get_latest_quote: watchlist quotes from memory, quotes another worker process fetched recently
+        from the shared cache, the rest with one download. Returns symbol -> quote.
+        """
+        quotes = {}
+        missing = []
+        started = time.time()
+        for symbol in dict.fromkeys(symbol.upper() for symbol in symbols):
+            quote = self.quote_table.get(symbol) if self.quote_table is not None else None
+            if not quote and self.quote_cache_seconds > 0:
+                quote = self.shared_cache.get(f"yahoo:quote:{symbol}")
+                quote = self._quote_with_source(quote, started) if quote else None
+            if quote:
+                quotes[symbol] = quote
+            else:
+                missing.append(symbol)
+        if missing:
+            try:
+                with timed("yahoo.quotes"):
+                    fetched = self.client.get_quotes(missing)
+                for symbol, quote in fetched.items():
+                    self.shared_cache.set(f"yahoo:quote:{symbol}", quote, self.quote_cache_seconds)
+                quotes.update({symbol: dict(quote, staleness_seconds=0.0, source="live") for symbol, quote in fetched.items()})
+            except Exception as e:
+                record_error("yahoo")
+                print(f"Error fetching stock prices for {len(missing)} symbols: {e}")
+        return quotes
+
+    def start_quote_refresher(self, watchlist: list, refresh_seconds: float = 15.0):
+        """Keeps quotes for the watchlist in memory, refreshed in the background."""
+        if self.quote_table is not None:
+            self.quote_table.stop()
+        self.quote_table = QuoteTable(self.client, watchlist, refresh_seconds=refresh_seconds)
+        self.quote_table.start()
+
+    def warm_up(self, symbol: str = "SPY"):
+        """
+        Runs one quote fetch ahead of the first request, so that it does not pay for importing the market data
+        client's dependencies and opening its session. Returns True if the fetch succeeded.
+        """
+        try:
+            with timed("yahoo.warm_up"):
+                return self.client.get_quote(symbol) is not None
+        except Exception as e:
+            record_error("yahoo")
+            print(f"Market data warm-up for {symbol} failed: {e}")
+            return False
+
+    # Announcements are served from a local store (placeholder data for MVP, see src/data/announcements),
+    # which can be fed by a real news/filings source in the future.
+    def get_latest_announcements(self, symbol: str, region: str = "US", limit: int = 10, since: str = None):
+        """
+        Returns the latest company announcements and SEC filings for a given symbol.
+        Args:
+            limit (int, optional): Maximum number of items per category.
+            since (str, optional): Only items dated on/after this YYYY-MM-DD date.
+        """
+        announcements = {}
+        with timed("announcements"):
+            for category in CATEGORIES:
+                records = self.announcement_store.latest(symbol, category, limit=limit, since=since)
+                # symbol/category are implied by the query, so keep them out of the LLM prompt
+                announcements[category] = [
+                    {key: value for key, value in record.items() if key not in ("symbol", "category")}
+                    for record in records
+                ]
         return announcements
 
-    def get_stock_price_history(self, symbol: str, days: int = 14, region: str = "US"):
-        """Fetches stock price history for the last N days."""
+    @staticmethod
+    def _history_range_for(days: int):
+        """Smallest Yahoo range that covers N trading days."""
+        for range_, trading_days in (('1mo', 20), ('3mo', 62), ('6mo', 125), ('1y', 250), ('2y', 500), ('5y', 1250)):
+            if days <= trading_days:
+                return range_
+        return 'max'
+
+    def _is_fresh(self, synced_at: float):
+        """A daily history is fresh if synced after the last close, or recently while the market is open."""
+        now = datetime.now(MARKET_TIMEZONE)
+        if is_market_open(now):
+            return now.timestamp() - synced_at < self.price_refresh_seconds
+        return synced_at >= previous_market_close(now).timestamp()
+
+    def _plan_sync(self, symbol: str, range_: str):
+        """
+        Decides how to bring a symbol's stored daily history up to date.
+        Returns None (fresh), ("full", range_) or ("tail", start_date, anchor_ts, anchor_close, stored_range).
+        """
+        store = self.price_store
+        state = store.sync_state(symbol, "1d")
+        deep_enough = state is not None and store.covers_range(state["range"], range_)
+        if deep_enough and self._is_fresh(state["synced_at"]):
+            return None
+
+        # The older of the last two stored bars is complete, so it anchors the comparison with upstream
+        stored_tail = store.read(symbol, "1d", limit=2) if deep_enough else None
+        if stored_tail is not None and len(stored_tail) == 2:
+            anchor_ts, anchor_close = stored_tail.timestamps[0], stored_tail.close[0]
+            start_date = datetime.fromtimestamp(int(anchor_ts), MARKET_TIMEZONE).strftime("%Y-%m-%d")
+            return ("tail", start_date, anchor_ts, anchor_close, state["range"])
+        return ("full", range_)
+
+    def _apply_tail(self, symbol: str, tail, plan):
+        """
+        Appends a fetched tail if it still matches the stored anchor bar.
+        Returns the range to re-sync in full when upstream re-adjusted past prices, else None.
+        """
+        _, _, anchor_ts, anchor_close, stored_range = plan
+        if tail is None:
+            return None
+        anchor = np.flatnonzero(tail.timestamps == anchor_ts)
+        if anchor.size and np.isclose(tail.close[anchor[0]], anchor_close, rtol=1e-6):
+            self.price_store.write(tail)
+            self.price_store.mark_synced(symbol, "1d", stored_range)
+            return None
+        print(f"Price history for {symbol} was re-adjusted upstream; re-syncing.")
+        return stored_range
+
+    def _replace_history(self, symbol: str, frame, range_: str):
+        if frame is not None:
+            self.price_store.write(frame, replace=True)
+            self.price_store.mark_synced(symbol, "1d", range_)
+
+    def _sync_daily_history(self, symbol: str, range_: str):
+        """
+        Brings the local price store up to date for a symbol, fetching only the missing tail.
+        Falls back to a full re-sync when the stored history is too short or no longer matches
+        upstream (splits/dividends re-adjust past prices).
+        """
+        plan = self._plan_sync(symbol, range_)
+        if plan is None:
+            return
+        if plan[0] == "tail":
+            range_ = self._apply_tail(symbol, self.client.get_chart(symbol, interval="1d", start=plan[1]), plan)
+            if range_ is None:
+                return
+        self._replace_history(symbol, self.client.get_chart(symbol, interval="1d", range_=range_), range_)
+
+    def sync_price_histories(self, symbols: list, days: int = 14, batch_size: int = 100):
+        """
+        Batch variant of the daily history sync for many symbols (e.g. bulk screens): stale tails are fetched
+        with one multi-symbol download per batch, and missing histories with one per batch and range.
+        Returns the number of upstream downloads made.
+        """
+        range_ = self._history_range_for(days)
+        tails = {}
+        full = {}
+        for symbol in dict.fromkeys(symbol.upper() for symbol in symbols):
+            plan = self._plan_sync(symbol, range_)
+            if plan is None:
+                continue
+            if plan[0] == "tail":
+                tails[symbol] = plan
+            else:
+                full.setdefault(plan[1], []).append(symbol)
+
+        downloads = 0
+        tail_symbols = list(tails)
+        for i in range(0, len(tail_symbols), batch_size):
+            batch = tail_symbols[i:i + batch_size]
+            # One download from the oldest anchor; newer anchors just get a few extra bars
+            start_date = min(tails[symbol][1] for symbol in batch)
+            with timed("yahoo.charts"):
+                frames = self.client.get_charts(batch, interval="1d", start=start_date)
+            downloads += 1
+            for symbol in batch:
+                resync_range = self._apply_tail(symbol, frames.get(symbol), tails[symbol])
+                if resync_range is not None:
+                    full.setdefault(resync_range, []).append(symbol)
+
+        for full_range, range_symbols in full.items():
+            for i in range(0, len(range_symbols), batch_size):
+                batch = range_symbols[i:i + batch_size]
+                with timed("yahoo.charts"):
+                    frames = self.client.get_charts(batch, interval="1d", range_=full_range)
+                downloads += 1
+                for symbol in batch:
+                    self._replace_history(symbol, frames.get(symbol), full_range)
+        return downloads
+
+    def _sync(self, symbol: str, range_: str):
+        """
+        Coalesced _sync_daily_history: concurrent requests for one symbol share a single sync, and worker processes
+        sync a symbol one at a time (the next one then finds the shared price store fresh).
+        """
+        def locked_sync():
+            with self.shared_cache.lock(f"yahoo:sync:{symbol.upper()}", ttl=60.0, wait=15.0):
+                self._sync_daily_history(symbol, range_)
+
+        with timed("yahoo.sync"):
+            self.flight.do(("sync", symbol.upper(), range_), locked_sync)
+
+    def _daily_frame_ttl(self):
+        """A daily history read from the store is shared until it could need a sync again."""
+        return min(self.price_refresh_seconds, seconds_until_next_daily_bar())
+
+    def get_price_frame(self, symbol: str, days: int = 14, interval: str = "1d", region: str = "US"):
+        """
+        Returns the last N bars as a columnar OHLCVFrame (None on error or no data).
+        Daily bars are served from the local price store, which is synced incrementally.
+        """
         try:
-            response = self.client.call_api(
-                'YahooFinance/get_stock_chart',
-                query={'symbol': symbol, 'region': region, 'interval': '1d', 'range': '1mo', 'includeAdjustedClose': 'true'}
-            )
-            
-            if response and response.get("chart") and response["chart"].get("result") and len(response["chart"]["result"]) > 0:
-                chart_result = response["chart"]["result"][0]
-                timestamps = chart_result.get("timestamp", [])
-                indicators = chart_result.get("indicators", {})
-                quote = indicators.get("quote", [{}])[0]
-                adjclose = indicators.get("adjclose", [{}])[0].get("adjclose", []) if indicators.get("adjclose") else [] 
-
-                if not (timestamps and quote.get("open") and quote.get("high") and quote.get("low") and quote.get("close") and quote.get("volume")):
-                    return [] # Not enough data
-
-                price_data = []
-                
-                num_entries = len(timestamps)
-                start_index = max(0, num_entries - days)
-
-                for i in range(start_index, num_entries):
-                    dt_object = datetime.fromtimestamp(timestamps[i])
-                    price_data.append({
-                        "date": dt_object.strftime("%Y-%m-%d"),
-                        "open": quote["open"][i],
-                        "high": quote["high"][i],
-                        "low": quote["low"][i],
-                        "close": quote["close"][i],
-                        "adj_close": adjclose[i] if i < len(adjclose) else quote["close"][i],
-                        "volume": quote["volume"][i]
-                    })
-                return price_data
-            return []
+            if interval == "1d" and self.price_store is not None:
+                def read_synced():
+                    self._sync(symbol, self._history_range_for(days))
+                    return self.price_store.read(symbol, "1d", limit=days)
+
+                return self.shared_cache.get_or_compute(f"yahoo:frame:1d:{symbol.upper()}:{days}", read_synced, ttl=self._daily_frame_ttl())
+            range_ = self._history_range_for(days)
+            with timed("yahoo.chart"):
+                frame = self.flight.do(
+                    ("chart", symbol.upper(), interval, range_),
+                    lambda: self.shared_cache.get_or_compute(
+                        f"yahoo:frame:{interval}:{symbol.upper()}:{range_}",
+                        lambda: self.client.get_chart(symbol, interval=interval, range_=range_), ttl=INTRADAY_CACHE_SECONDS),
+                )
+            return frame.tail(days) if frame is not None else None
         except Exception as e:
+            record_error("yahoo")
             print(f"Error fetching stock price history for {symbol}: {e}")
-            return []
\ No newline at end of file
+            return None
+
+    def get_price_frames(self, symbols: list, days: int = 14):
+        """
+        Batch variant of get_price_frame for daily bars: the store is synced for all symbols with
+        multi-symbol downloads, then each history is read locally. Returns symbol -> OHLCVFrame (None on error).
+        """
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        try:
+            with timed("yahoo.sync"):
+                self.flight.do(("sync", tuple(sorted(symbols)), days), lambda: self.sync_price_histories(symbols, days=days))
+        except Exception as e:
+            record_error("yahoo")
+            print(f"Error syncing price histories for {', '.join(symbols)}: {e}")
+        return {symbol: self.price_store.read(symbol, "1d", limit=days) for symbol in symbols}
+
+    def get_price_range(self, symbol: str, start: str, end: str = None):
+        """
+        Returns daily bars between two YYYY-MM-DD dates (inclusive) from the local price store.
+        """
+        try:
+            start_dt = datetime.strptime(start, "%Y-%m-%d").replace(tzinfo=MARKET_TIMEZONE)
+            end_dt = datetime.strptime(end, "%Y-%m-%d").replace(tzinfo=MARKET_TIMEZONE) if end else None
+            # Approximate trading days back to the start date, to pick a deep enough range
+            calendar_days = (datetime.now(MARKET_TIMEZONE) - start_dt).days
+            self._sync(symbol, self._history_range_for(int(calendar_days * 5 / 7) + 1))
+            return self.price_store.read(
+                symbol, "1d", start=start_dt.timestamp(), end=end_dt.timestamp() if end_dt else None
+            )
+        except Exception as e:
+            record_error("yahoo")
+            print(f"Error fetching stock price range for {symbol}: {e}")
+            return None
+
+    def get_stock_price_history(self, symbol: str, days: int = 14, region: str = "US"):
+        """Fetches stock price history for the last N trading days (list of per-day dicts)."""
+        frame = self.get_price_frame(symbol, days=days, region=region)
+        return frame.to_records() if frame is not None else []
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The app imports its modules as top-level packages (services.x), as when run from src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("SHARED_CACHE_URL", "memory")
+os.environ.setdefault("WARM_UP_ON_START", "off")
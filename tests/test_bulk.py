@@ -0,0 +1,63 @@
+import sys
+import json
+
+import pytest
+
+import bulk
+import main
+
+
+def read_ids(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line)["id"] for line in f]
+
+
+@pytest.fixture
+def queries(tmp_path):
+    path = tmp_path / "queries.jsonl"
+    path.write_text("".join(json.dumps({"id": f"q{i}", "query": f"latest announcements for AAPL #{i}"}) + "\n" for i in range(1, 7)))
+    return path
+
+
+def run_cli(monkeypatch, input_path, answer):
+    monkeypatch.setattr(main, "resolve_query", lambda query, session=None: (
+        {"query": query, "symbol": "AAPL", "symbols": ["AAPL"], "intent": "get_latest_announcements", "parsed_by": "local"}, None))
+    monkeypatch.setattr(main, "answer_query", answer)
+    monkeypatch.setattr(sys, "argv", ["bulk.py", str(input_path), "--workers", "1", "--batch-size", "2"])
+    return bulk.main_cli()
+
+
+def test_interrupted_run_resumes_without_duplicates_and_retries_failures(monkeypatch, queries):
+    def first_run(query_info, stream=False):
+        number = query_info["query"].rsplit("#", 1)[1]
+        if number == "2":
+            raise RuntimeError("upstream timeout")
+        if number == "3":
+            return "Error communicating with OpenAI: 503", []
+        if number == "5":
+            raise KeyboardInterrupt
+        return f"answer {number}", []
+
+    assert run_cli(monkeypatch, queries, first_run) == 130
+    output = queries.parent / "queries.results.jsonl"
+    assert sorted(read_ids(output)) == ["q1", "q4"]
+    assert sorted(read_ids(queries.parent / "queries.results.errors.jsonl")) == ["q2", "q3"]
+
+    answered = []
+
+    def second_run(query_info, stream=False):
+        answered.append(query_info["query"].rsplit("#", 1)[1])
+        return "answer", []
+
+    assert run_cli(monkeypatch, queries, second_run) == 0
+    assert sorted(answered) == ["2", "3", "5", "6"]
+    assert sorted(read_ids(output)) == ["q1", "q2", "q3", "q4", "q5", "q6"]
+    assert read_ids(queries.parent / "queries.results.errors.jsonl") == []
+
+
+def test_checkpoint_retries_error_records_and_cuts_a_partial_line(tmp_path):
+    output = tmp_path / "results.jsonl"
+    output.write_text('{"id": "q1", "response": "ok"}\n{"id": "q2", "error": "timeout"}\n{"id": "q3", "resp')
+
+    assert bulk.load_checkpoint(str(output)) == {"q1"}
+    assert output.read_text().endswith('"error": "timeout"}\n')
@@ -0,0 +1,19 @@
+from services.ohlcv import OHLCVFrame
+from services.openai_service import OpenAIService
+
+
+def make_frame(symbol, closes):
+    timestamps = [1746057600 + 86400 * i for i in range(len(closes))]
+    return OHLCVFrame(symbol, "1d", timestamps, closes, closes, closes, closes, [1000] * len(closes))
+
+
+def test_header_lists_only_the_symbols_with_price_data():
+    service = OpenAIService(api_key="sk-test", base_url="http://127.0.0.1:9")
+    histories = {"AAPL": make_frame("AAPL", [100.0, 102.0, 101.0]), "MSFT": make_frame("MSFT", [300.0, 297.0, 303.0]),
+                 "ZZZZ": None}
+
+    header = service._comparison_prompt(histories, {}).splitlines()
+
+    assert header[0] == "Symbols: AAPL, MSFT"
+    assert "No price data: ZZZZ" in header
+    assert "ZZZZ" not in "\n".join(line for line in header if not line.startswith("No price data"))
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+import pytest
+
+import main
+from services.insight_cache import content_hash
+from services.market_calendar import MARKET_TIMEZONE, completed_daily_bars_cutoff
+from services.ohlcv import OHLCVFrame
+from services.query_parser import LocalQueryParser
+from services.session_store import SessionStore
+
+# Mon 2025-05-05 .. Wed 2025-05-07, stamped at the 09:30 ET open like Yahoo's daily bars
+DAILY_TIMESTAMPS = [int(datetime(2025, 5, day, 9, 30, tzinfo=MARKET_TIMEZONE).timestamp()) for day in (5, 6, 7)]
+
+
+def daily_frame(last_close):
+    closes = [100.0, 101.0, last_close]
+    return OHLCVFrame("AAPL", "1d", DAILY_TIMESTAMPS, closes, closes, closes, closes, [1000, 1000, 1000])
+
+
+@pytest.mark.parametrize("query", ["Why did AAPL move?", "What are the reasons for Tesla's stock price movements in the last 2 weeks?",
+                                   "What are the latest related announcements for Apple?"])
+def test_generic_questions(query):
+    assert LocalQueryParser().is_generic(query)
+
+
+@pytest.mark.parametrize("query", ["Why did Apple drop on Tuesday?", "Why did AAPL move this month?", "Did Apple fall after the iPhone event?"])
+def test_specific_questions(query):
+    assert not LocalQueryParser().is_generic(query)
+
+
+def test_forming_daily_bar_does_not_change_the_content_hash():
+    during_session = datetime(2025, 5, 7, 11, 0, tzinfo=MARKET_TIMEZONE)
+    cutoff = completed_daily_bars_cutoff(during_session)
+
+    morning, noon = daily_frame(102.0).before(cutoff), daily_frame(99.5).before(cutoff)
+
+    assert len(morning) == 2
+    assert content_hash({"price_history": morning}) == content_hash({"price_history": noon})
+    after_close = completed_daily_bars_cutoff(datetime(2025, 5, 7, 16, 30, tzinfo=MARKET_TIMEZONE))
+    assert len(daily_frame(99.5).before(after_close)) == 3
+
+
+def test_precomputed_answer_only_for_generic_questions_without_history(monkeypatch):
+    monkeypatch.setattr(main, "insight_cache", main.InsightCache())
+    main.insight_cache.put("movement_analysis", "AAPL", "hash", "Precomputed analysis")
+    query_info = {"intent": "get_stock_movement_reasons", "symbol": "AAPL", "symbols": ["AAPL"]}
+
+    assert main.precomputed_answer(dict(query_info, query="Why did Apple move?")) == "Precomputed analysis"
+    assert main.precomputed_answer(dict(query_info, query="Why did Apple drop on Tuesday?")) is None
+
+    session = SessionStore().get("s1")
+    session.add_turn("What is Apple's price?", "The latest stock price for AAPL is $201.00.")
+    assert main.precomputed_answer(dict(query_info, query="Why did Apple move?", session=session)) is None
@@ -0,0 +1,34 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+from services.ohlcv import OHLCVFrame, market_dates
+
+
+def epoch(*args):
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp())
+
+
+def make_frame(timestamps, volume):
+    prices = np.linspace(100.0, 101.0, len(timestamps))
+    return OHLCVFrame("AAPL", "1h", timestamps, prices, prices + 1, prices - 1, prices, volume)
+
+
+def test_dates_use_the_exchange_time_zone():
+    # 22:00 New York time is already the next day in UTC, in both summer (EDT) and winter (EST)
+    timestamps = [epoch(2025, 7, 2, 2, 0), epoch(2025, 1, 16, 3, 0), epoch(2025, 7, 1, 14, 30)]
+    frame = make_frame(timestamps, [1, 2, 3])
+
+    assert frame.dates() == ["2025-07-01", "2025-01-15", "2025-07-01"]
+    assert market_dates([]) == []
+
+
+def test_volume_stays_integer():
+    frame = make_frame([epoch(2025, 7, 1, 14), epoch(2025, 7, 1, 15)], [1234567.0, float("nan")])
+    assert frame.volume.dtype == np.int64
+    assert frame.volume.tolist() == [1234567, 0]
+
+    restored = OHLCVFrame.from_bytes(frame.to_bytes())
+    assert restored.volume.dtype == np.int64
+    assert restored.volume.tolist() == [1234567, 0]
+    assert [type(record["volume"]) for record in restored.to_records()] == [int, int]
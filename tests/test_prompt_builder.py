@@ -0,0 +1,75 @@
+import pytest
+
+from services import prompt_builder
+from services.prompt_builder import PromptBuilder, count_tokens, estimate_tokens
+
+SYSTEM_PROMPT = "You are a financial analyst. Explain the stock's moves using the price table and the announcements."
+PRICE_COLUMNS = ["date", "open", "high", "low", "close", "volume"]
+
+
+def price_rows(days):
+    return [{"date": f"2025-{1 + day // 28:02d}-{1 + day % 28:02d}", "open": 200 + day * 1.37, "high": 203.25 + day,
+             "low": 198.5 + day, "close": 201.13 + day, "volume": 51234567 + day * 1111} for day in range(days)]
+
+
+@pytest.fixture
+def encoding():
+    if prompt_builder.get_encoding() is None:
+        pytest.skip(f"tiktoken encoding '{prompt_builder.TOKEN_ENCODING}' is not available (no cached file, no network)")
+    return prompt_builder.get_encoding()
+
+
+def test_count_tokens_uses_the_encoder(encoding):
+    text = "date,close\n2025-05-01,201.37\n"
+    assert count_tokens(text) == len(encoding.encode(text))
+
+
+def test_budget_trims_a_numeric_table_with_the_real_encoder(encoding):
+    builder = PromptBuilder(token_budget=600)
+    section = builder.section("Daily prices", price_rows(60), PRICE_COLUMNS, min_items=5)
+
+    user_prompt, stats = builder.build(SYSTEM_PROMPT, ["Symbol: AAPL"], [section])
+
+    real_tokens = len(encoding.encode(SYSTEM_PROMPT)) + len(encoding.encode(user_prompt))
+    assert stats["rows_trimmed"] > 0
+    assert stats["prompt_tokens"] == real_tokens
+    assert real_tokens <= 600
+
+
+def test_estimate_does_not_undercount_numeric_tables():
+    table = "date,open,high,low,close,volume\n" + "\n".join(
+        ",".join(str(row[column]) for column in PRICE_COLUMNS) for row in price_rows(30))
+    # BPE tokenizers spend a token per 3-digit group and per separator: about 2-2.5 characters per token here
+    assert estimate_tokens(table) >= len(table) / 2.6
+
+
+def test_estimate_is_used_without_the_encoder(monkeypatch):
+    monkeypatch.setattr(prompt_builder, "_encoding", False)
+    assert count_tokens("Apple beat estimates, up 3.5%") == estimate_tokens("Apple beat estimates, up 3.5%")
+
+
+def test_trimming_tokenizes_each_row_once(monkeypatch):
+    counted = []
+    monkeypatch.setattr(prompt_builder, "_encoding", False)
+    monkeypatch.setattr(prompt_builder, "estimate_tokens", lambda text: counted.append(text) or estimate_tokens(text))
+    builder = PromptBuilder(token_budget=600)
+    section = builder.section("Daily prices", price_rows(200), PRICE_COLUMNS, min_items=5)
+
+    user_prompt, stats = builder.build(SYSTEM_PROMPT, ["Symbol: AAPL"], [section], legacy_payload={"prices": price_rows(200)})
+
+    assert stats["rows_trimmed"] > 100
+    assert stats["prompt_tokens"] == estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(user_prompt) <= 600
+    # The system prompt, a few full renders and one count per dropped row; the legacy JSON is not tokenized
+    assert len(counted) <= stats["rows_trimmed"] + 5
+    assert stats["tokens_saved"] is None
+
+
+def test_savings_are_measured_when_enabled(monkeypatch):
+    monkeypatch.setattr(prompt_builder, "_encoding", False)
+    builder = PromptBuilder(token_budget=600, measure_savings=True)
+    section = builder.section("Daily prices", price_rows(10), PRICE_COLUMNS)
+
+    _, stats = builder.build(SYSTEM_PROMPT, ["Symbol: AAPL"], [section], legacy_payload={"prices": price_rows(10)})
+
+    assert stats["tokens_saved"] > 0
+    assert stats["legacy_tokens"] == stats["prompt_tokens"] + stats["tokens_saved"]
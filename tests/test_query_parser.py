@@ -0,0 +1,38 @@
+import pytest
+
+from services.query_parser import LocalQueryParser
+
+PRICE_SUBJECT = {"company_name": "Apple Inc.", "symbol": "AAPL", "symbols": ["AAPL"], "intent": "get_stock_price"}
+
+
+@pytest.fixture(scope="module")
+def parser():
+    return LocalQueryParser()
+
+
+@pytest.mark.parametrize("query", ["what about MSFT?", "and Microsoft?", "How about $MSFT", "same for microsoft", "MSFT?"])
+def test_short_follow_up_repeats_the_previous_question(parser, query):
+    assert parser.parse_follow_up(query, PRICE_SUBJECT) == {
+        "company_name": "Microsoft Corporation", "symbol": "MSFT", "intent": "get_stock_price"}
+
+
+@pytest.mark.parametrize("query", ["Tell me about Google's financials", "What does Google's management think about AI?"])
+def test_other_single_company_question_is_left_to_the_llm(parser, query):
+    assert parser.parse(query) is None
+    assert parser.parse_follow_up(query, PRICE_SUBJECT) is None
+
+
+def test_follow_up_without_company_uses_the_previous_one(parser):
+    assert parser.parse_follow_up("why did it move?", PRICE_SUBJECT)["symbol"] == "AAPL"
+
+
+@pytest.mark.parametrize("query", ["compare AAPL, MSFT and GOOGL moves this month", "Why did Apple and Microsoft drop?",
+                                   "Did Nvidia outperform AMD?", "price of AAPL and MSFT"])
+def test_price_comparisons_are_parsed_locally(parser, query):
+    assert parser.parse(query)["intent"] == "compare_stocks"
+
+
+@pytest.mark.parametrize("query", ["news on Amazon vs Walmart", "Is Apple better than Microsoft at AI?",
+                                   "compare the latest announcements of Apple and Microsoft"])
+def test_other_multi_company_questions_are_left_to_the_llm(parser, query):
+    assert parser.parse(query) is None
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from services.rate_limiter import RateLimiter
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=0, max_wait=3.0)
+        limiter._requests = 0.0  # the next request is a second away
+        waiter = asyncio.ensure_future(limiter.aacquire(10))
+        await asyncio.sleep(0.05)
+        assert limiter.stats()["queue_depth"] == {1: 1}
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter._waiters == []
+
+        limiter._requests = 1.0
+        waited = await asyncio.wait_for(limiter.aacquire(10), timeout=1.0)
+        assert waited < 0.5
+        assert limiter.stats()["timeouts"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_zero_token_quota_is_unlimited():
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=0, max_wait=3.0)
+    limiter.acquire(100)
+    # An under-estimated call would drive a limited token bucket negative
+    limiter.settle(100, 5000)
+    limiter.acquire(100000)
+    # A short request bucket is waited for (about 10ms here), not divided by the zero token rate
+    limiter._requests = 0.99
+    assert limiter.acquire(100) < 2.0
+
+
+def test_zero_request_quota_is_unlimited():
+    limiter = RateLimiter(requests_per_minute=0, tokens_per_minute=6000, max_wait=3.0)
+    for _ in range(100):
+        limiter.acquire(1)
+    # A short token bucket is waited for (about 0.5s here), not divided by the zero request rate
+    limiter.settle(0, limiter._tokens + 50)
+    assert limiter.acquire(1) < 2.0
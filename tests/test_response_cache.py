@@ -0,0 +1,57 @@
+import time
+import asyncio
+
+from services.shared_cache import MemorySharedCache
+from services.response_cache import ResponseCache
+
+
+class SlowSharedCache(MemorySharedCache):
+    """Shared tier whose backend calls block, like SQLite waiting on a lock or a slow Redis round trip."""
+
+    def _get(self, key):
+        time.sleep(0.2)
+        return super()._get(key)
+
+    def _try_lock(self, name, token, ttl):
+        time.sleep(0.2)
+        return super()._try_lock(name, token, ttl)
+
+
+def test_async_shared_tier_calls_do_not_block_the_event_loop():
+    cache = ResponseCache(shared=SlowSharedCache())
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        async def compute():
+            await cache.aset("key", "answer")
+            return "answer"
+
+        task = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        miss = await cache.aget("key")
+        value = await cache.asingle_writer("key", compute)
+        elapsed = time.perf_counter() - started
+        task.cancel()
+        return miss, value, ticks, elapsed
+
+    miss, value, ticks, elapsed = asyncio.run(scenario())
+    assert miss is None and value == "answer"
+    # The ticker keeps running while the backend calls block their threads
+    assert ticks >= 0.5 * elapsed / 0.01
+
+
+def test_shared_tier_entries_are_promoted_into_memory():
+    shared = MemorySharedCache()
+    ResponseCache(shared=shared).set("key", {"intent": "get_stock_price"}, kind="parse")
+
+    other_worker = ResponseCache(shared=shared)
+    assert asyncio.run(other_worker.aget("key")) == {"intent": "get_stock_price"}
+    assert other_worker.get("key") == {"intent": "get_stock_price"}
+    assert other_worker.stats()["shared_hits"] == 1
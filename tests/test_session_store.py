@@ -0,0 +1,69 @@
+from services.ohlcv import OHLCVFrame
+from services.session_store import SessionStore
+
+
+def make_frame(symbol="AAPL", bars=3):
+    timestamps = [1700000000 + 86400 * i for i in range(bars)]
+    prices = [100.0 + i for i in range(bars)]
+    return OHLCVFrame(symbol, "1d", timestamps, prices, prices, prices, prices, [1000] * bars)
+
+
+class FlakyFetch:
+    """Returns each of `results` in turn, counting calls."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.results.pop(0)
+
+
+def test_failed_fetch_is_not_reused_by_the_next_question():
+    session = SessionStore().get("s1")
+    fetch = FlakyFetch(None, make_frame(), make_frame())
+
+    assert session.cached("price_history", ["AAPL"], fetch)() is None
+    second = session.cached("price_history", ["AAPL"], fetch)()
+    third = session.cached("price_history", ["AAPL"], fetch)()
+
+    assert len(second) == 3
+    assert third is second
+    assert fetch.calls == 2
+
+
+def test_partial_comparison_data_is_not_stored():
+    store = SessionStore()
+    session = store.get("s1")
+    fetch = FlakyFetch({"AAPL": make_frame(), "MSFT": None}, {"AAPL": make_frame(), "MSFT": make_frame("MSFT")})
+
+    first = session.cached("price_histories", ["AAPL", "MSFT"], fetch)()
+    second = session.cached("price_histories", ["AAPL", "MSFT"], fetch)()
+
+    assert first["MSFT"] is None
+    assert second["MSFT"] is not None
+    assert fetch.calls == 2
+    assert store.stats()["data_hits"] == 0
+
+
+def test_empty_announcement_lists_are_reused():
+    session = SessionStore().get("s1")
+    fetch = FlakyFetch({"significant_developments": [], "financial_results": [], "sec_filings": []})
+
+    session.cached("announcements", ["AAPL"], fetch)()
+    session.cached("announcements", ["AAPL"], fetch)()
+
+    assert fetch.calls == 1
+
+
+def test_only_issued_session_ids_are_valid():
+    store = SessionStore(secret="test-secret")
+    session_id = store.new_id()
+
+    assert store.valid_id(session_id)
+    assert SessionStore(secret="test-secret").valid_id(session_id)
+    assert not SessionStore(secret="other-secret").valid_id(session_id)
+    assert not store.valid_id("victim-chosen-id")
+    assert not store.valid_id(session_id.split(".")[0] + ".0123456789abcdef0123456789abcdef")
+    assert not store.valid_id(None)
@@ -0,0 +1,45 @@
+import main
+
+
+def test_client_chosen_session_ids_are_ignored():
+    before = main.session_store.stats()["created"]
+
+    assert main.session_for({"session_id": "guessed"}, {}, {}) is None
+    assert main.session_for({}, {"X-Session-ID": "guessed"}, {}) is None
+    assert main.session_for({}, {}, {main.SESSION_COOKIE: "guessed"}) is None
+    assert main.session_store.stats()["created"] == before
+
+
+def test_issued_session_id_selects_the_conversation():
+    client = main.create_app(warm="off").test_client()
+    session_id = client.post("/session").get_json()["session_id"]
+
+    session = main.session_for({}, {"X-Session-ID": session_id}, {})
+    assert session is not None
+    assert main.session_for({"session_id": session_id}, {}, {}) is session
+
+
+def test_index_replaces_an_unsigned_cookie():
+    client = main.create_app(warm="off").test_client()
+    client.set_cookie(main.SESSION_COOKIE, "guessed")
+
+    cookie = client.get("/").headers.get("Set-Cookie", "")
+
+    assert cookie.startswith(main.SESSION_COOKIE + "=")
+    assert main.session_store.valid_id(cookie.split(";")[0].split("=", 1)[1])
+
+
+def test_missing_secret_is_reported_for_several_workers(monkeypatch):
+    monkeypatch.delenv("SESSION_SECRET", raising=False)
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+
+    assert main.configured_workers(["main:create_app()", "--workers", "4"]) == 4
+    assert main.configured_workers(["-w4", "asgi:app"]) == 4
+    assert main.configured_workers(["asgi:app", "--workers=2"]) == 2
+    assert "4 workers" in main.session_secret_warning(["main:create_app()", "-w", "4"])
+    assert main.session_secret_warning(["asgi:app"]) is None
+
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    assert "3 workers" in main.session_secret_warning(["main:create_app()"])
+    monkeypatch.setenv("SESSION_SECRET", "shared")
+    assert main.session_secret_warning(["main:create_app()"]) is None
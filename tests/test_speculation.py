@@ -0,0 +1,45 @@
+import threading
+
+import main
+from services.fanout import DataFanout
+
+
+class KeptFetches:
+    """Stands in for a Speculation whose fetches the parsed query kept."""
+
+    def __init__(self, futures):
+        self.futures = futures
+
+    def take(self, name, symbol):
+        return self.futures.get((name, symbol))
+
+
+def test_queued_speculative_fetch_is_run_instead_of_waited_for(monkeypatch):
+    fanout = DataFanout(max_workers=1, default_timeout=5.0)
+    monkeypatch.setattr(main, "data_fanout", fanout)
+    release = threading.Event()
+    fanout.submit("blocker", release.wait)
+    queued = fanout.submit("quote", lambda: "speculative")
+    query_info = {"symbol": "AAPL", "prefetch": KeptFetches({("quote", "AAPL"): queued})}
+
+    try:
+        # The pool's only worker is busy: waiting for the queued fetch would never return
+        assert main.prefetched(query_info, "quote", lambda: "fetched")() == "fetched"
+        assert queued.cancelled()
+    finally:
+        release.set()
+        fanout.executor.shutdown(wait=True)
+
+
+def test_started_speculative_fetch_is_reused(monkeypatch):
+    fanout = DataFanout(max_workers=2, default_timeout=5.0)
+    monkeypatch.setattr(main, "data_fanout", fanout)
+    started, release = threading.Event(), threading.Event()
+    running = fanout.submit("quote", lambda: started.set() or release.wait() and "speculative")
+    started.wait(1.0)
+    query_info = {"symbol": "AAPL", "prefetch": KeptFetches({("quote", "AAPL"): running})}
+
+    source = main.prefetched(query_info, "quote", lambda: "fetched")
+    release.set()
+    assert source() == "speculative"
+    fanout.executor.shutdown(wait=True)